@@ -0,0 +1,74 @@
+"""
+Compares bulk import time against row count for the per-row upsert and the set-based import.
+
+Needs the Postgres configured by the usual POSTGRES_* variables. Topics are written to a scratch guild
+which is removed afterwards.
+
+    python -m benchmarks.bulk_import [row counts...]
+"""
+import sys
+import time
+
+from pony.orm import commit, db_session, delete
+
+from bot import db
+
+GUILD_ID = "bench-bulk-import"
+ROW_COUNTS = [10, 100, 500, 2000]
+
+
+def make_rows(count: int) -> list[list[str]]:
+    return [[f"group{i % 20}", f"key{i}", f"Topic {i}", f"https://example.com/{i}", ""] for i in range(count)]
+
+
+def per_row_import(rows: list[list[str]]):
+    for row in rows:
+        db.upsert_topic(GUILD_ID, row[0], row[1], row[2], row[3], row[4])
+    commit()
+
+
+def set_based_import(rows: list[list[str]]):
+    db.import_topics(GUILD_ID, rows)
+
+
+def timed(func, rows: list[list[str]]) -> float:
+    with db_session:
+        started = time.perf_counter()
+        func(rows)
+        elapsed = time.perf_counter() - started
+
+    clear_topics()
+    return elapsed
+
+
+@db_session
+def clear_topics():
+    delete(t for t in db.Topic if t.guild.id == GUILD_ID)
+
+
+@db_session
+def cleanup():
+    clear_topics()
+    guild = db.Guild.get(id=GUILD_ID)
+    if guild is not None:
+        guild.delete()
+
+
+def main(counts: list[int]):
+    db.setup()
+    with db_session:
+        db.upsert_guild(GUILD_ID, "Bulk import benchmark")
+
+    try:
+        print(f"{'rows':>8} {'per-row (ms)':>14} {'set-based (ms)':>16} {'speedup':>8}")
+        for count in counts:
+            rows = make_rows(count)
+            per_row = timed(per_row_import, rows)
+            set_based = timed(set_based_import, rows)
+            print(f"{count:>8} {per_row * 1000:>14.1f} {set_based * 1000:>16.1f} {per_row / set_based:>7.1f}x")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or ROW_COUNTS)
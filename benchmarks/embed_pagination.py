@@ -0,0 +1,55 @@
+"""
+Measures help embed pagination time against the number of topics and checks every page against Discord limits.
+
+Doesn't need a database, topics are generated in memory.
+
+    python -m benchmarks.embed_pagination [topic counts...]
+"""
+import random
+import sys
+import time
+
+from bot.embed_paginator import MAX_EMBED_LENGTH, MAX_FIELD_NAME, MAX_FIELD_VALUE, MAX_FIELDS, PaginatedEmbed
+
+TOPIC_COUNTS = [100, 1000, 10000, 50000]
+REPEAT = 5
+
+
+def topic_lines(count: int) -> list[str]:
+    rnd = random.Random(count)
+    return [f"`/wiki group{i % 25} key{i}`: {'Topic description ' * rnd.randint(1, 6)}" for i in range(count)]
+
+
+def paginate(lines: list[str]) -> list:
+    embed = PaginatedEmbed(title="Help for Benchmark")
+    embed.set_footer(text="WikiBot")
+    embed.add_field(name=":information_source: General", value="`/wiki <group> <key>`: Get wiki content", inline=False)
+    embed.add_field(name=":grey_question: Available /wiki commands", value="\n".join(lines), inline=False)
+    return embed.pages()
+
+
+def check(pages: list):
+    for page in pages:
+        assert len(page) <= MAX_EMBED_LENGTH, f"page is {len(page)} characters long"
+        assert len(page.fields) <= MAX_FIELDS, f"page has {len(page.fields)} fields"
+        for field in page.fields:
+            assert len(field.name) <= MAX_FIELD_NAME, f"field name is {len(field.name)} characters long"
+            assert len(field.value) <= MAX_FIELD_VALUE, f"field value is {len(field.value)} characters long"
+
+
+def main(counts: list[int]):
+    print(f"{'topics':>8} {'pages':>6} {'time (ms)':>10} {'us/topic':>9}")
+    for count in counts:
+        lines = topic_lines(count)
+        pages = paginate(lines)
+        check(pages)
+
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            paginate(lines)
+        elapsed = (time.perf_counter() - started) / REPEAT
+        print(f"{count:>8} {len(pages):>6} {elapsed * 1000:>10.2f} {elapsed / count * 1000000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(c) for c in sys.argv[1:]] or TOPIC_COUNTS)
@@ -0,0 +1,72 @@
+"""
+Measures peak Python memory of the streaming CSV export against the number of exported topics.
+
+Needs the Postgres configured by the usual POSTGRES_* variables. Topics are written to a scratch guild
+which is removed afterwards.
+
+    python -m benchmarks.export_memory [topic counts...]
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pony.orm import db_session, delete
+
+from bot import db
+from bot.cache import TopicRecord
+
+GUILD_ID = "bench-export"
+TOPIC_COUNTS = [1000, 10000, 50000]
+CONTENT = "x" * 400
+
+
+@db_session
+def seed(count: int):
+    delete(t for t in db.Topic if t.guild.id == GUILD_ID)
+    db.bulk_upsert_topics(
+        [TopicRecord(GUILD_ID, f"group{i % 20}", f"key{i}", f"Topic {i}", CONTENT, "") for i in range(count)]
+    )
+
+
+@db_session
+def export(compress: bool) -> tuple[int, int, float]:
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        started = time.perf_counter()
+        db.export_topics(GUILD_ID, out, compress)
+        elapsed = time.perf_counter() - started
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return (out.tell(), peak, elapsed)
+
+
+@db_session
+def cleanup():
+    delete(t for t in db.Topic if t.guild.id == GUILD_ID)
+    guild = db.Guild.get(id=GUILD_ID)
+    if guild is not None:
+        guild.delete()
+
+
+def main(counts: list[int]):
+    db.setup()
+    with db_session:
+        db.upsert_guild(GUILD_ID, "Export benchmark")
+
+    try:
+        print(f"{'topics':>8} {'gzip':>5} {'size (KiB)':>11} {'peak (KiB)':>11} {'time (ms)':>10}")
+        for count in counts:
+            seed(count)
+            for compress in (False, True):
+                (size, peak, elapsed) = export(compress)
+                print(
+                    f"{count:>8} {str(compress):>5} {size / 1024:>11.1f} {peak / 1024:>11.1f} {elapsed * 1000:>10.1f}"
+                )
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or TOPIC_COUNTS)
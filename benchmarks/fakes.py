@@ -0,0 +1,165 @@
+"""
+In-process stand-ins for Discord and Redis, so bot code paths can be driven without any network.
+
+FakeHTTP replaces discord.py's HTTPClient of a real, never connected Bot, so discord.py and discord_slash
+code runs unchanged up to the point where a request would be sent.
+"""
+import asyncio
+import itertools
+import typing
+from collections import Counter
+
+import discord
+from discord.ext import commands
+
+APPLICATION_ID = 800000000000000000
+BOT_USER = {"id": str(APPLICATION_ID), "username": "WikiBot", "discriminator": "0001", "avatar": None, "bot": True}
+TIMESTAMP = "2021-01-01T00:00:00+00:00"
+
+_snowflakes = itertools.count(900000000000000000)
+
+
+def snowflake() -> str:
+    return str(next(_snowflakes))
+
+
+def user_payload(user_id: int) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0001", "avatar": None}
+
+
+def message_payload(channel_id, content: str = "", author: dict = BOT_USER) -> dict:
+    return {
+        "id": snowflake(),
+        "channel_id": str(channel_id),
+        "type": 0,
+        "content": content,
+        "author": author,
+        "attachments": [],
+        "embeds": [],
+        "mentions": [],
+        "mention_roles": [],
+        "mention_everyone": False,
+        "pinned": False,
+        "tts": False,
+        "timestamp": TIMESTAMP,
+        "edited_timestamp": None,
+        "flags": 0,
+    }
+
+
+class FakeHTTP:
+    """Answers discord.py REST requests in-process, optionally after a simulated latency, and counts them"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()
+        # set to an exception to make matching routes fail, e.g. {"POST /interactions/...": discord.NotFound}
+        self.errors: dict[str, Exception] = {}
+        # called with every route before it's answered
+        self.listeners: list[typing.Callable] = []
+
+    async def request(self, route, **kwargs):
+        key = f"{route.method} {route.path}"
+        self.requests[key] += 1
+        for listener in self.listeners:
+            listener(route)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        error = self.errors.get(key)
+        if error is not None:
+            self.failures[key] += 1
+            raise error
+
+        if route.method in ("POST", "PATCH") and (route.path.startswith("/webhooks/") or "/messages" in route.path):
+            data = kwargs.get("json") or {}
+            return message_payload(route.channel_id or 0, data.get("content") or "")
+        if route.method == "GET" and route.path.endswith("/messages"):
+            return []
+        if route.method == "POST" and route.path == "/users/@me/channels":
+            recipient = (kwargs.get("json") or {}).get("recipient_id", 0)
+            return {"id": snowflake(), "type": 1, "recipients": [user_payload(recipient)]}
+        return {}
+
+    async def close(self):
+        pass
+
+
+def guild_payload(guild_id: int, channel_ids: typing.Iterable[int]) -> dict:
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {guild_id}",
+        "owner_id": str(APPLICATION_ID),
+        "member_count": 2,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": str(discord.Permissions.all().value)}],
+        "channels": [
+            {"id": str(c), "type": 0, "name": f"channel-{c}", "position": i, "permission_overwrites": []}
+            for (i, c) in enumerate(channel_ids)
+        ],
+        "members": [],
+    }
+
+
+def create_bot(guilds: dict[int, list[int]], latency: float = 0.0) -> commands.Bot:
+    """Creates an unconnected bot which knows the given {guild_id: [channel_id, ...]} and talks to FakeHTTP"""
+    intents = discord.Intents()
+    intents.messages = True
+    intents.guilds = True
+    bot = commands.Bot("$", intents=intents, allowed_mentions=discord.AllowedMentions(everyone=False))
+
+    bot.http = FakeHTTP(latency)
+    state = bot._connection
+    state.http = bot.http
+    state.user = discord.ClientUser(state=state, data=BOT_USER)
+    for (guild_id, channel_ids) in guilds.items():
+        state._add_guild(discord.Guild(data=guild_payload(guild_id, channel_ids), state=state))
+
+    return bot
+
+
+def interaction_payload(
+    guild_id: int, channel_id: int, user_id: int, name: str, options: list = None, interaction_type: int = 2
+) -> dict:
+    """Gateway INTERACTION_CREATE event, as dispatched with socket_response"""
+    return {
+        "op": 0,
+        "t": "INTERACTION_CREATE",
+        "s": 1,
+        "d": {
+            "id": snowflake(),
+            "application_id": str(APPLICATION_ID),
+            "type": interaction_type,
+            "token": "token-" + snowflake(),
+            "version": 1,
+            "guild_id": str(guild_id),
+            "channel_id": str(channel_id),
+            "member": {
+                "user": user_payload(user_id),
+                "roles": [],
+                "joined_at": TIMESTAMP,
+                "deaf": False,
+                "mute": False,
+                "permissions": str(discord.Permissions.all().value),
+            },
+            "data": {"id": snowflake(), "name": name, "options": options or []},
+        },
+    }
+
+
+def wiki_topic_options(group: str, key: str, **args) -> list:
+    """Options of a /wiki <group> <key> subcommand interaction"""
+    return [
+        {
+            "name": group,
+            "type": 2,
+            "options": [{"name": key, "type": 1, "options": [{"name": k, "value": v} for (k, v) in args.items()]}],
+        }
+    ]
+
+
+def fake_redis():
+    # only benchmarks need fakeredis, see benchmarks/requirements.txt
+    import fakeredis.aioredis
+
+    return fakeredis.aioredis.FakeRedis()
@@ -0,0 +1,182 @@
+"""
+Gateway event throughput of the bot with realistic event mixes.
+
+Events go the same way as from the gateway: the socket_response event first, then discord.py's parser
+which fires on_message and friends. Most events the bot receives aren't interactions, so how cheaply those
+are passed over matters as much as how fast /wiki interactions are answered. Every mix is dispatched as
+fast as possible and reported in events per second, including the time until all handlers finished.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.gateway_events [--events N] [--repeat N] [--mix NAME]
+"""
+import argparse
+import asyncio
+import random
+import time
+import typing
+
+from benchmarks import fakes
+from benchmarks.hot_paths import CHANNEL_ID, GUILD_ID, USER_ID, create_cog, seed, setup_database
+
+# share of each event kind
+MIXES = {
+    # a chatty guild where a few messages ask for a topic
+    "chat": {
+        "message": 0.55,
+        "typing": 0.25,
+        "reaction": 0.1,
+        "message_update": 0.08,
+        "wiki": 0.01,
+        "other_command": 0.01,
+    },
+    # a support guild which mostly uses /wiki
+    "support": {
+        "message": 0.35,
+        "typing": 0.15,
+        "reaction": 0.05,
+        "wiki": 0.3,
+        "autocomplete": 0.1,
+        "other_command": 0.05,
+    },
+    "wiki_only": {"wiki": 1.0},
+}
+USERS = 50
+
+
+def member_payload(user_id: int) -> dict:
+    return {
+        "user": fakes.user_payload(user_id),
+        "roles": [],
+        "joined_at": fakes.TIMESTAMP,
+        "deaf": False,
+        "mute": False,
+    }
+
+
+def event(t: str, d: dict) -> dict:
+    return {"op": 0, "t": t, "s": 1, "d": d}
+
+
+def make_event(kind: str, i: int) -> dict:
+    user_id = USER_ID + i % USERS
+    if kind == "message":
+        d = fakes.message_payload(CHANNEL_ID, f"message {i}", fakes.user_payload(user_id))
+        d["guild_id"] = str(GUILD_ID)
+        d["member"] = member_payload(user_id)
+        return event("MESSAGE_CREATE", d)
+    if kind == "message_update":
+        return event(
+            "MESSAGE_UPDATE",
+            {"id": fakes.snowflake(), "channel_id": str(CHANNEL_ID), "guild_id": str(GUILD_ID), "content": f"edit {i}"},
+        )
+    if kind == "typing":
+        return event(
+            "TYPING_START",
+            {
+                "channel_id": str(CHANNEL_ID),
+                "guild_id": str(GUILD_ID),
+                "user_id": str(user_id),
+                "timestamp": int(time.time()),
+                "member": member_payload(user_id),
+            },
+        )
+    if kind == "reaction":
+        return event(
+            "MESSAGE_REACTION_ADD",
+            {
+                "user_id": str(user_id),
+                "channel_id": str(CHANNEL_ID),
+                "message_id": fakes.snowflake(),
+                "guild_id": str(GUILD_ID),
+                "emoji": {"id": None, "name": "\N{THUMBS UP SIGN}"},
+                "member": member_payload(user_id),
+            },
+        )
+    if kind == "wiki":
+        options = fakes.wiki_topic_options(f"group{i % 25}", f"key{i % 25}")
+        return fakes.interaction_payload(GUILD_ID, CHANNEL_ID, user_id, "wiki", options)
+    if kind == "autocomplete":
+        options = [{"name": "topic", "type": 3, "value": f"group{i % 25}/", "focused": True}]
+        return fakes.interaction_payload(GUILD_ID, CHANNEL_ID, user_id, "wiki", options, interaction_type=4)
+    if kind == "other_command":
+        return fakes.interaction_payload(GUILD_ID, CHANNEL_ID, user_id, "other-bot-command")
+    raise ValueError(kind)
+
+
+def make_events(mix: dict[str, float], count: int) -> list[dict]:
+    rng = random.Random(count)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [make_event(kind, i) for (i, kind) in enumerate(kinds)]
+
+
+async def drain(background: int):
+    while len(asyncio.all_tasks()) > background:
+        await asyncio.sleep(0)
+
+
+async def dispatch(bot, events: list[dict], background: int) -> float:
+    parsers = bot._connection.parsers
+    started = time.perf_counter()
+    for (i, msg) in enumerate(events):
+        bot.dispatch("socket_response", msg)
+        parser = parsers.get(msg["t"])
+        if parser is not None:
+            parser(msg["d"])
+        if i % 100 == 99:
+            # like the gateway, which yields to handlers between received messages
+            await asyncio.sleep(0)
+    await drain(background)
+    return time.perf_counter() - started
+
+
+async def run(args, bot, db) -> dict[str, dict]:
+    seed(db)
+    cog = create_cog(bot)
+    bot.add_cog(cog)
+    # let the cog start its background tasks, which keep running during the benchmark
+    await asyncio.sleep(0.1)
+    background = len(asyncio.all_tasks())
+
+    results = {}
+    try:
+        for (name, mix) in MIXES.items():
+            if args.mix and name not in args.mix:
+                continue
+            # warm up caches and the topic index
+            await dispatch(bot, make_events(mix, max(args.events // 10, 1)), background)
+            events = make_events(mix, args.events)
+            # the best of several runs, the handlers share the loop with the cog's background tasks
+            elapsed = min([await dispatch(bot, events, background) for _ in range(args.repeat)])
+            interactions = sum(1 for e in events if e["t"] == "INTERACTION_CREATE")
+            results[name] = {
+                "events": len(events),
+                "interactions": interactions,
+                "events_per_sec": len(events) / elapsed,
+                "us_per_event": elapsed / len(events) * 1e6,
+            }
+    finally:
+        cog.cog_unload()
+        await cog.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway event throughput with realistic event mixes")
+    parser.add_argument("--events", type=int, default=20000, help="events per mix")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per mix, the fastest is reported")
+    parser.add_argument("--mix", action="append", choices=list(MIXES), help="only run these mixes")
+    args = parser.parse_args()
+
+    db = setup_database("sqlite")
+    bot = fakes.create_bot({GUILD_ID: [CHANNEL_ID]})
+    results = bot.loop.run_until_complete(run(args, bot, db))
+
+    print(f"{'mix':>12} {'events':>8} {'interactions':>13} {'events/s':>10} {'us/event':>9}")
+    for (name, r) in results.items():
+        print(
+            f"{name:>12} {r['events']:>8} {r['interactions']:>13} {r['events_per_sec']:>10.0f} {r['us_per_event']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares rendering /wiki-help pages against serving them from the help pages cache.
+
+Doesn't need a database, topics are generated in memory.
+
+    python -m benchmarks.help_pages [topic counts...]
+"""
+import sys
+import time
+
+from bot.cache import TopicRecord
+from bot.help_pages import HelpPages, render_help_pages
+
+GUILD_ID = "bench-help"
+TOPIC_COUNTS = [10, 100, 1000, 5000]
+REPEAT = 20
+
+
+def render(topics: list[TopicRecord]):
+    return render_help_pages(
+        "Help for Benchmark",
+        {"text": "WikiBot"},
+        [(":information_source: General", "`/wiki <group> <key>`: Get wiki content of the specified topic")],
+        ":grey_question: Available /wiki commands",
+        (f"`/wiki {t.group} {t.key}`: {t.desc}" for t in topics),
+    )
+
+
+def timed(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main(counts: list[int]):
+    print(f"{'topics':>8} {'pages':>6} {'render (ms)':>12} {'cached (us)':>12}")
+    for count in counts:
+        topics = [TopicRecord(GUILD_ID, f"group{i % 20}", f"key{i}", f"Topic number {i}", "", "") for i in range(count)]
+        help_pages = HelpPages(1)
+        pages = render(topics)
+        help_pages.put(GUILD_ID, "Benchmark", False, pages, help_pages.version(GUILD_ID))
+
+        rendered = timed(lambda: render(topics), REPEAT)
+        cached = timed(lambda: help_pages.get(GUILD_ID, "Benchmark", False), REPEAT * 1000)
+        print(f"{count:>8} {len(pages):>6} {rendered * 1000:>12.2f} {cached * 1000000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main([int(c) for c in sys.argv[1:]] or TOPIC_COUNTS)
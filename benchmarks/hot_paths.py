@@ -0,0 +1,255 @@
+"""
+Micro-benchmarks of the bot's hot paths against in-process fakes of Discord and Redis.
+
+Every scenario is run for a number of iterations and reported with its throughput and p50/p99 latency.
+Results are written as JSON, pass an earlier result file with --compare to see the change.
+
+By default topics live in a scratch SQLite file. With --db postgres the Postgres configured by the usual
+POSTGRES_* variables is used and the scratch guild is removed afterwards.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.hot_paths [--db sqlite|postgres] [--iterations N] [--output FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+from benchmarks import fakes
+
+GUILD_ID = 810000000000000000
+CHANNEL_ID = 820000000000000000
+USER_ID = 830000000000000000
+GROUPS = 25
+KEYS = 25
+HELP_TOPICS = 1000
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Scenario(typing.NamedTuple):
+    name: str
+    func: typing.Callable
+    # some scenarios are orders of magnitude slower than others
+    weight: float = 1.0
+
+
+def percentile(latencies: list[float], p: int) -> float:
+    return statistics.quantiles(latencies, n=100)[p - 1] if len(latencies) > 1 else latencies[0]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "mean_us": statistics.mean(latencies) * 1e6,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+    }
+
+
+async def measure(func: typing.Callable, iterations: int) -> dict:
+    is_async = asyncio.iscoroutinefunction(func)
+    for i in range(max(iterations // 10, 1)):
+        await func(i) if is_async else func(i)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        op_started = time.perf_counter()
+        if is_async:
+            await func(i)
+        else:
+            func(i)
+        latencies.append(time.perf_counter() - op_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def scenarios(cog, db, topics: list) -> list[Scenario]:
+    # imported here, after the database was chosen
+    from pony.orm import commit, db_session
+
+    from bot.cache import topic_cache
+    from bot.help_pages import render_help_pages
+    from bot.slash import build_wiki_command, command_fingerprint, parse_command_args
+
+    guild_id = str(GUILD_ID)
+    help_lines = [f"`/wiki group{i % GROUPS} key{i}`: Topic number {i}" for i in range(HELP_TOPICS)]
+
+    def parse_args(i):
+        parse_command_args(["hidden:true", f"reply_to:{USER_ID}"])
+
+    def sync_payload(i):
+        command_fingerprint(build_wiki_command(topics))
+
+    def help_pages(i):
+        render_help_pages("Help for Benchmark", {"text": "WikiBot"}, [], "Available commands", help_lines)
+
+    def upsert_topic(i):
+        with db_session:
+            db.upsert_topic(guild_id, f"group{i % GROUPS}", f"key{i % KEYS}", f"Topic {i}", f"Content {i}", "")
+            commit()
+
+    async def topic_cached(i):
+        await cog.router.route(
+            fakes.interaction_payload(
+                GUILD_ID, CHANNEL_ID, USER_ID, "wiki", fakes.wiki_topic_options(f"group{i % GROUPS}", "key0")
+            )
+        )
+
+    async def topic_uncached(i):
+        topic_cache.clear()
+        await topic_cached(i)
+
+    async def analytics_flush(i):
+        for j in range(100):
+            cog.analytics.view(GUILD_ID, f"group{j % GROUPS}/key{j % KEYS}")
+        await cog.analytics.flush()
+
+    return [
+        Scenario("parse_command_args", parse_args, 10),
+        Scenario("sync_payload_625_topics", sync_payload, 0.1),
+        Scenario(f"help_pages_{HELP_TOPICS}_topics", help_pages, 0.1),
+        Scenario("db_upsert_topic", upsert_topic, 0.2),
+        Scenario("topic_handler_cached", topic_cached),
+        Scenario("topic_handler_uncached", topic_uncached, 0.5),
+        Scenario("analytics_flush_100_views", analytics_flush, 0.5),
+    ]
+
+
+def setup_database(kind: str):
+    if kind == "sqlite":
+        os.environ["WIKIBOT_DB_SQLITE"] = os.path.join(tempfile.mkdtemp(prefix="wikibot-bench-"), "wikibot.sqlite")
+
+    from bot import db
+
+    if kind == "sqlite":
+        # migrations are Postgres only
+        db.db.generate_mapping(create_tables=True)
+    else:
+        db.setup()
+    return db
+
+
+def seed(db) -> list:
+    from pony.orm import db_session, delete
+
+    from bot.cache import TopicRecord
+
+    guild_id = str(GUILD_ID)
+    topics = [
+        TopicRecord(guild_id, f"group{g}", f"key{k}", f"Topic {g}/{k}", f"https://example.com/{g}/{k}", "")
+        for g in range(GROUPS)
+        for k in range(KEYS)
+    ]
+    with db_session:
+        delete(t for t in db.Topic if t.guild.id == guild_id)
+        db.upsert_guild(guild_id, "Benchmark")
+    with db_session:
+        for t in topics:
+            db.upsert_topic(t.guild_id, t.group, t.key, t.desc, t.content, t.alias)
+    return topics
+
+
+def cleanup(db):
+    from pony.orm import db_session, delete
+
+    guild_id = str(GUILD_ID)
+    with db_session:
+        delete(t for t in db.Topic if t.guild.id == guild_id)
+        delete(g for g in db.Guild if g.id == guild_id)
+
+
+def create_cog(bot):
+    from discord_slash import SlashCommand
+
+    from bot.slash import Slash
+
+    SlashCommand(bot)
+    cog = Slash(bot)
+    # Slash's background tasks only start talking to Redis once the loop runs, so they get the fakes too
+    cog.analytics._r = fakes.fake_redis()
+    cog.invalidator._r = fakes.fake_redis()
+    return cog
+
+
+def git_commit() -> typing.Union[str, None]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: typing.Union[dict, None]):
+    print(f"{'scenario':>28} {'ops/s':>11} {'p50 (us)':>10} {'p99 (us)':>10} {'vs baseline':>12}")
+    for (name, r) in results.items():
+        change = ""
+        if baseline is not None and name in baseline["scenarios"]:
+            before = baseline["scenarios"][name]["ops_per_sec"]
+            change = f"{(r['ops_per_sec'] - before) / before * 100:+.1f}%"
+        print(f"{name:>28} {r['ops_per_sec']:>11.0f} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {change:>12}")
+
+
+async def run(args, db, bot) -> dict:
+    topics = seed(db)
+    cog = create_cog(bot)
+    results = {}
+    try:
+        for scenario in scenarios(cog, db, topics):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            results[scenario.name] = await measure(scenario.func, max(int(args.iterations * scenario.weight), 1))
+    finally:
+        cog.cog_unload()
+        await cog.close()
+        cleanup(db)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot path micro-benchmarks")
+    parser.add_argument("--db", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--iterations", type=int, default=2000, help="iterations of a scenario with weight 1")
+    parser.add_argument("--scenario", action="append", help="only run these scenarios")
+    parser.add_argument("--output", help="result file, by default a new file in benchmarks/results")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    db = setup_database(args.db)
+    bot = fakes.create_bot({GUILD_ID: [CHANNEL_ID]})
+    results = bot.loop.run_until_complete(run(args, db, bot))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "db": args.db,
+        "scenarios": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"hot_paths-{(commit or 'unknown')[:8]}-{datetime.datetime.utcnow():%Y%m%d%H%M%S}.json"
+        )
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Replays a gateway recording made with WIKIBOT_RECORD_GATEWAY against a bot whose Discord HTTP client and
+Redis are in-process fakes, to see how much production-shaped load one replica sustains.
+
+Events are dispatched the same way the gateway does: the socket_response event first, then discord.py's
+parser which fires on_message and friends. Topics used by recorded /wiki interactions are seeded into a
+scratch SQLite database. Interaction latency is the time from dispatching the event to the interaction
+callback request. Interactions which never got a callback and handler exceptions count as errors.
+
+    python -m benchmarks.replay recording.jsonl.gz [--speed 10 | --qps 500] [--latency 0.05] [--output FILE]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import sys
+import time
+import typing
+
+from benchmarks import fakes
+from benchmarks.hot_paths import create_cog, percentile, setup_database
+
+# time to wait for handlers still running after the last event was dispatched
+DRAIN_TIMEOUT = 10
+INTERACTION_CALLBACK = re.compile(r"/interactions/(\d+)/")
+
+Event = tuple[int, str, dict]
+
+
+def load(path: str) -> list[Event]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [tuple(json.loads(line)) for line in f if line.strip()]
+
+
+def wiki_topic(d: dict) -> typing.Union[tuple[str, str], None]:
+    """Returns (group, key) of a recorded /wiki interaction in either /wiki mode"""
+    options = d.get("data", {}).get("options") or []
+    if not options:
+        return None
+
+    topic = next((o for o in options if o["name"] == "topic" and "value" in o), None)
+    if topic is not None:
+        (group, _, key) = str(topic["value"]).partition("/")
+        return (group, key) if key else None
+    option = options[0]
+    if "value" not in option and option.get("options"):
+        return (option["name"], option["options"][0]["name"])
+    return None
+
+
+def guild_channels(events: list[Event]) -> dict[int, set[int]]:
+    guilds: dict[int, set[int]] = {}
+    for (_, _, d) in events:
+        if "guild_id" in d:
+            channels = guilds.setdefault(int(d["guild_id"]), set())
+            if "channel_id" in d:
+                channels.add(int(d["channel_id"]))
+    return guilds
+
+
+def seed(db, events: list[Event], guilds: typing.Iterable[int]):
+    from pony.orm import db_session
+
+    from bot.slash import WIKI_COMMAND
+
+    topics = set()
+    for (_, event, d) in events:
+        if event == "INTERACTION_CREATE" and d.get("data", {}).get("name") == WIKI_COMMAND and "guild_id" in d:
+            topic = wiki_topic(d)
+            if topic is not None:
+                topics.add((d["guild_id"], *topic))
+
+    with db_session:
+        for guild_id in guilds:
+            db.upsert_guild(str(guild_id), f"Guild {guild_id}")
+    with db_session:
+        for (guild_id, group, key) in topics:
+            db.upsert_topic(guild_id, group, key, f"Replayed {group}/{key}", f"Content of {group}/{key}", "")
+
+
+class Replayer:
+    def __init__(self, bot, events: list[Event], speed: float, qps: float):
+        self.bot = bot
+        self.events = events
+        self.speed = speed
+        self.qps = qps
+
+        self.pending: dict[str, float] = {}
+        self.latencies: list[float] = []
+        self.parse_errors = 0
+        self.max_lag = 0.0
+        bot.http.listeners.append(self._on_request)
+
+    def _on_request(self, route):
+        match = INTERACTION_CALLBACK.search(route.url)
+        if match is not None:
+            started = self.pending.pop(match.group(1), None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+
+    def schedule(self, i: int, offset: int) -> float:
+        if self.qps:
+            return i / self.qps
+        return offset / 1000 / self.speed if self.speed else 0.0
+
+    async def run(self) -> float:
+        """Dispatches all events on schedule, returns how long it took"""
+        parsers = self.bot._connection.parsers
+        started = time.perf_counter()
+        first = self.events[0][0] if self.events else 0
+
+        for (i, (offset, event, d)) in enumerate(self.events):
+            delay = started + self.schedule(i, offset - first) - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_lag = max(self.max_lag, -delay)
+                if i % 100 == 0:
+                    # let handlers run even when we're behind schedule
+                    await asyncio.sleep(0)
+
+            if event == "INTERACTION_CREATE":
+                self.pending[d["id"]] = time.perf_counter()
+            self.bot.dispatch("socket_response", {"op": 0, "t": event, "d": d})
+            parser = parsers.get(event)
+            if parser is not None:
+                try:
+                    parser(d)
+                except Exception:
+                    self.parse_errors += 1
+
+        return time.perf_counter() - started
+
+    async def drain(self):
+        deadline = time.perf_counter() + DRAIN_TIMEOUT
+        while self.pending and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+
+async def replay(args, events: list[Event]) -> dict:
+    from bot import metrics
+
+    guilds = guild_channels(events)
+    db = setup_database("sqlite")
+    seed(db, events, guilds)
+
+    bot = fakes.create_bot({g: sorted(c) for (g, c) in guilds.items()}, args.latency)
+    cog = create_cog(bot)
+    bot.add_cog(cog)
+
+    errors_before = sum(v for (_, _, v) in metrics.HANDLER_ERRORS.samples())
+    replayer = Replayer(bot, events, args.speed, args.qps)
+    elapsed = await replayer.run()
+    await replayer.drain()
+    handler_errors = sum(v for (_, _, v) in metrics.HANDLER_ERRORS.samples()) - errors_before
+    cog.cog_unload()
+    await cog.close()
+
+    interactions = sum(1 for (_, event, _) in events if event == "INTERACTION_CREATE")
+    unanswered = len(replayer.pending)
+    latencies = replayer.latencies or [0.0]
+    return {
+        "events": len(events),
+        "interactions": interactions,
+        "seconds": elapsed,
+        "events_per_sec": len(events) / elapsed if elapsed else 0.0,
+        "interactions_per_sec": len(replayer.latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "unanswered": unanswered,
+        "handler_errors": handler_errors,
+        "parse_errors": replayer.parse_errors,
+        "error_rate": (unanswered + handler_errors) / interactions if interactions else 0.0,
+        "max_schedule_lag_ms": replayer.max_lag * 1000,
+        "requests": dict(bot.http.requests.most_common(10)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a gateway recording against a bot with faked I/O")
+    parser.add_argument("recording")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 replays without pauses")
+    pacing.add_argument("--qps", type=float, default=0.0, help="dispatch events at a fixed rate instead")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Discord REST latency in seconds")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    events = load(args.recording)
+    if not events:
+        sys.exit(f"{args.recording} has no events")
+
+    # the bot created by the fakes runs on the default loop
+    loop = asyncio.get_event_loop()
+    report = loop.run_until_complete(replay(args, events))
+
+    for (name, value) in report.items():
+        if name != "requests":
+            print(f"{name:>22}: {value:.2f}" if isinstance(value, float) else f"{name:>22}: {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
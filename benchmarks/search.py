@@ -0,0 +1,86 @@
+"""
+Measures /wiki-search query latency on a guild seeded with synthetic topics.
+
+Needs the Postgres configured by the usual POSTGRES_* variables. Topics are written to a scratch guild
+which is removed afterwards.
+
+    python -m benchmarks.search [topic count] [queries per term]
+"""
+import random
+import statistics
+import sys
+import time
+
+from pony.orm import db_session, delete
+
+from bot import db
+from bot.cache import TopicRecord
+
+GUILD_ID = "bench-search"
+TOPIC_COUNT = 20000
+QUERIES = 50
+
+WORDS = (
+    "espresso grinder burr flat conical dial shot ratio roast bean light dark medium milk steam pitcher "
+    + "temperature pressure profile puck channel distribution tamp basket portafilter water scale timer "
+    + "pour over filter kettle brew bloom extraction yield taste sour bitter sweet body acidity machine"
+).split()
+TERMS = ["espresso", "grinder burr", "dial shot", "milk steam pitcher", "sour OR bitter", "light roast -dark"]
+
+
+def sentence(rnd: random.Random, length: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(length))
+
+
+@db_session
+def seed(count: int):
+    rnd = random.Random(42)
+    delete(t for t in db.Topic if t.guild.id == GUILD_ID)
+    db.bulk_upsert_topics(
+        [
+            TopicRecord(GUILD_ID, f"group{i % 50}", f"{rnd.choice(WORDS)}{i}", sentence(rnd, 6), sentence(rnd, 60), "")
+            for i in range(count)
+        ]
+    )
+
+
+@db_session
+def search(term: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    (_, total) = db.search_topics(GUILD_ID, term)
+    return (time.perf_counter() - started, total)
+
+
+@db_session
+def cleanup():
+    delete(t for t in db.Topic if t.guild.id == GUILD_ID)
+    guild = db.Guild.get(id=GUILD_ID)
+    if guild is not None:
+        guild.delete()
+
+
+def main(count: int, queries: int):
+    db.setup()
+    with db_session:
+        db.upsert_guild(GUILD_ID, "Search benchmark")
+
+    try:
+        seed(count)
+        print(f"{count} topics")
+        print(f"{'query':>20} {'matches':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        for term in TERMS:
+            timings = []
+            for _ in range(queries):
+                (elapsed, total) = search(term)
+                timings.append(elapsed * 1000)
+            p = statistics.quantiles(timings, n=100)
+            print(f"{term:>20} {total:>8} {statistics.median(timings):>9.2f} {p[98]:>9.2f}")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else TOPIC_COUNT,
+        int(sys.argv[2]) if len(sys.argv) > 2 else QUERIES,
+    )
@@ -0,0 +1,55 @@
+import typing
+
+from bot.cache import TopicRecord
+
+
+class AliasIndex:
+    """
+    Maps (guild_id, alias) to topic content, so aliases of different guilds never collide.
+
+    Several topics of a guild may share an alias. The most recently updated one answers it, and removing a
+    topic hands the alias back to the others.
+    """
+
+    def __init__(self):
+        # topics having an alias by (group, key), in the order they were updated
+        self._owners: dict[tuple[str, str], dict[tuple[str, str], str]] = {}
+        self._aliases: dict[str, dict[tuple[str, str], str]] = {}
+
+    def resolve(self, guild_id: str, alias: str) -> typing.Union[str, None]:
+        owners = self._owners.get((guild_id, alias))
+        return next(reversed(owners.values())) if owners else None
+
+    def update(self, topic: TopicRecord):
+        self.remove(topic.guild_id, topic.group, topic.key)
+        if topic.alias:
+            self._owners.setdefault((topic.guild_id, topic.alias), {})[(topic.group, topic.key)] = topic.content
+            self._aliases.setdefault(topic.guild_id, {})[(topic.group, topic.key)] = topic.alias
+
+    def remove(self, guild_id: str, group: str, key: str):
+        aliases = self._aliases.get(guild_id)
+        if aliases is None:
+            return
+
+        alias = aliases.pop((group, key), None)
+        if alias is not None:
+            self._disown(guild_id, alias, (group, key))
+        if not aliases:
+            del self._aliases[guild_id]
+
+    def replace_guild(self, guild_id: str, topics: typing.Iterable[TopicRecord]):
+        for (topic, alias) in self._aliases.pop(guild_id, {}).items():
+            self._disown(guild_id, alias, topic)
+
+        for topic in topics:
+            self.update(topic)
+
+    def _disown(self, guild_id: str, alias: str, topic: tuple[str, str]):
+        owners = self._owners.get((guild_id, alias))
+        if owners is not None:
+            owners.pop(topic, None)
+            if not owners:
+                del self._owners[(guild_id, alias)]
+
+    def __len__(self):
+        return len(self._owners)
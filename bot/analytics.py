@@ -1,18 +1,163 @@
-import redis
+import asyncio
+import logging
+import time
+from collections import Counter
 
+import redis.asyncio as redis
+
+from . import metrics
 from .config import config
 
 VIEW_FIELD = "view"
 
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# hourly buckets only have to cover the 24h window, daily ones the 30d window
+HOURLY_TTL = 2 * DAY
+DAILY_TTL = 32 * DAY
+WINDOW_TTL = 60
+
+WINDOWS = {
+    "24h": ("h", 24),
+    "7d": ("d", 7),
+    "30d": ("d", 30),
+}
+ALL_TIME = "all"
+
+DEFAULT_TOP = 25
+
+
+def _key(guild_id: str, *parts) -> str:
+    return ":".join([VIEW_FIELD + "_" + guild_id, *map(str, parts)])
+
 
 class Analytics:
-    def __init__(self):
-        self._r = redis.Redis(host=config.redis.host, port=6379, db=0)
+    """
+    Collects topic views in memory and writes them to Redis in pipelined batches,
+    so recording a view never waits on the network.
+
+    Every view is counted in a lifetime sorted set plus hourly and daily bucket sorted sets.
+    Buckets expire on their own, so only the lifetime totals grow with time.
+    """
+
+    def __init__(self, client: redis.Redis = None):
+        self._r = client or redis.Redis(
+            connection_pool=redis.ConnectionPool(
+                host=config.redis.host, port=6379, db=0, max_connections=config.redis.max_connections
+            )
+        )
+        self.logger = logging.getLogger("wikibot.analytics")
+        self.flush_interval = config.redis.flush_interval
+        self.flush_size = config.redis.flush_size
+
+        self._buffer: Counter[tuple[str, str, int]] = Counter()
+        self._buffered = 0
+        self._flusher: asyncio.Task = None
+        self._flushing: asyncio.Task = None
+        self._migrated: set[str] = set()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._flusher = loop.create_task(self._flush_periodically())
 
     def view(self, guild_id, command_name):
-        self._r.hincrby(VIEW_FIELD + "_" + str(guild_id), command_name, 1)
+        self._buffer[(str(guild_id), command_name, int(time.time()) // HOUR)] += 1
+        self._buffered += 1
+
+        if self._buffered >= self.flush_size and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.get_event_loop().create_task(self.flush())
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        buffer, self._buffer = self._buffer, Counter()
+        self._buffered = 0
+
+        try:
+            async with self._r.pipeline(transaction=False) as pipe:
+                expiring = {}
+                for (guild_id, command_name, hour), count in buffer.items():
+                    hourly = _key(guild_id, "h", hour)
+                    daily = _key(guild_id, "d", hour * HOUR // DAY)
+
+                    pipe.zincrby(_key(guild_id, ALL_TIME), count, command_name)
+                    pipe.zincrby(hourly, count, command_name)
+                    pipe.zincrby(daily, count, command_name)
+                    expiring[hourly] = HOURLY_TTL
+                    expiring[daily] = DAILY_TTL
+
+                for (key, ttl) in expiring.items():
+                    pipe.expire(key, ttl)
+                with metrics.REDIS_SECONDS.time("analytics_flush"):
+                    await pipe.execute()
+        except redis.RedisError as e:
+            self.logger.warning("Failed to flush %d analytics entries: %s", len(buffer), e, exc_info=True)
+            # keep the views for the next flush instead of dropping them
+            self._buffer.update(buffer)
+            self._buffered += sum(buffer.values())
+
+    async def retreive(self, guild_id, window: str = ALL_TIME, top: int = DEFAULT_TOP) -> list[tuple[str, int]]:
+        """Returns the `top` most viewed topics of the guild within the window, most viewed first"""
+        guild_id = str(guild_id)
+        await self._migrate_legacy(guild_id)
+        await self.flush()
+
+        if window == ALL_TIME:
+            with metrics.REDIS_SECONDS.time("analytics_top"):
+                resp = await self._r.zrevrange(_key(guild_id, ALL_TIME), 0, top - 1, withscores=True)
+        else:
+            resp = await self._window(guild_id, window, top)
+
+        return [(k.decode("utf-8"), int(v)) for (k, v) in resp]
+
+    async def _window(self, guild_id: str, window: str, top: int):
+        (bucket, count) = WINDOWS[window]
+        size = HOUR if bucket == "h" else DAY
+        current = int(time.time()) // size
+
+        dest = _key(guild_id, "w", window)
+        async with self._r.pipeline(transaction=False) as pipe:
+            pipe.zunionstore(dest, [_key(guild_id, bucket, current - i) for i in range(count)])
+            pipe.expire(dest, WINDOW_TTL)
+            pipe.zrevrange(dest, 0, top - 1, withscores=True)
+            with metrics.REDIS_SECONDS.time("analytics_window"):
+                (_, _, resp) = await pipe.execute()
+
+        return resp
+
+    async def _migrate_legacy(self, guild_id: str):
+        """Moves lifetime counters from the old `view_<guild_id>` hash into the lifetime sorted set"""
+        if guild_id in self._migrated:
+            return
+
+        legacy = VIEW_FIELD + "_" + guild_id
+        moving = _key(guild_id, "legacy")
+        try:
+            # only one replica wins the rename, so views are never migrated twice
+            await self._r.rename(legacy, moving)
+        except redis.ResponseError:
+            self._migrated.add(guild_id)
+            return
+
+        views = await self._r.hgetall(moving)
+        async with self._r.pipeline(transaction=True) as pipe:
+            for (command_name, count) in views.items():
+                pipe.zincrby(_key(guild_id, ALL_TIME), int(count), command_name)
+            pipe.delete(moving)
+            await pipe.execute()
+
+        self._migrated.add(guild_id)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+
+        await self.flush()
+        await self._r.close()
+        await self._r.connection_pool.disconnect()
 
-    def retreive(self, guild_id):
-        resp = self._r.hgetall(VIEW_FIELD + "_" + str(guild_id))
-        views = [(k.decode("utf-8"), int(v.decode("utf-8"))) for (k, v) in resp.items()]
-        return sorted(views, key=lambda r: r[1], reverse=True)
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
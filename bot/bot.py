@@ -1,25 +1,33 @@
 import logging
+import time
+import typing
 
 import discord
 from discord.ext import commands
 from discord_slash import SlashCommand, SlashContext, cog_ext
 from discord_slash.error import RequestFailure
 from discord_slash.utils import manage_commands
-from pony.orm import db_session, select, ObjectNotFound
 
-from bot import db
+from bot import db, metrics
 from bot.config import config
 from bot.db import Guild, Topic
+from bot.gateway_recorder import GatewayRecorder
+from bot.slash import WIKI_COMMAND
 
 logger = logging.getLogger("wikibot.bot")
 
 logging.getLogger("wikibot").setLevel(logging.DEBUG)
 
 
-def setup():
+def setup(create_schema: bool = True):
     logging.basicConfig(level=logging.INFO)
     # logging.getLogger("discord_slash").setLevel(logging.DEBUG)
 
+    if not create_schema:
+        # the cluster launcher already created tables and ran migrations
+        db.setup(create_tables=False)
+        return
+
     logger.info("Runing DB setup")
     db.setup()
 
@@ -28,42 +36,98 @@ def setup():
         db.populate_database()
 
 
-class HelpBot(commands.Bot):
-    @db_session
+class HelpBotEvents:
+    recorder: typing.Union[GatewayRecorder, None] = None
+
+    async def close(self):
+        # discord.py cancels all remaining tasks once the connection is closed, so flushes have to finish first
+        slash = self.get_cog("Slash")
+        if slash is not None:
+            await slash.close()
+        if self.recorder is not None:
+            await self.recorder.close()
+        await super().close()
+
     async def on_ready(self):
-        for guild in self.guilds:
-            db.upsert_guild(str(guild.id), guild.name)
-            print(f"{guild.name}: id: {guild.id}")
+        # shard_ids is None when this process runs all shards
+        shards = (self.shard_count, self.shard_ids) if getattr(self, "shard_ids", None) is not None else ()
+
+        started = time.perf_counter()
+        (changed, disabled) = await db.run(
+            db.reconcile_guilds, [(str(guild.id), guild.name) for guild in self.guilds], *shards
+        )
+        logger.info(
+            "Reconciled %d guilds in %.1fms: %d added or changed, %d disabled",
+            len(self.guilds),
+            (time.perf_counter() - started) * 1000,
+            changed,
+            disabled,
+        )
 
-    @db_session
     async def on_guild_join(self, guild: discord.Guild):
         logger.info(f"We have been added to a new guild! Hi: f{guild.id}: f{guild.name}")
-        try:
-            guild = db.Guild[str(guild.id)]
-            guild.disabled = False
-        except ObjectNotFound:
-            db.upsert_guild(str(guild.id), guild.name)
+        await db.run(db.join_guild, str(guild.id), guild.name)
 
-    @db_session
     async def on_guild_remove(self, guild: discord.Guild):
         logger.info(f"We have been removed from the guild guild! Bye: f{guild.id}: f{guild.name}")
-        db.mark_guild_disabled(str(guild.id))
-
+        await db.run(db.mark_guild_disabled, str(guild.id))
+
+
+class HelpBot(HelpBotEvents, commands.Bot):
+    pass
+
+
+class ShardedHelpBot(HelpBotEvents, commands.AutoShardedBot):
+    pass
+
+
+def create_bot(shard_ids: typing.Union[list[int], None] = None, shard_count: int = 0) -> commands.Bot:
+    """Creates the bot with the slash extension loaded. With shard_count it only runs the given shards."""
+    intents = discord.Intents()
+    intents.messages = True
+    intents.guilds = True
+
+    options = dict(
+        intents=intents,
+        allowed_mentions=discord.AllowedMentions(everyone=False),
+        help_command=commands.DefaultHelpCommand(),
+    )
+    if shard_count:
+        bot = ShardedHelpBot("$", shard_ids=shard_ids, shard_count=shard_count, **options)
+    else:
+        bot = HelpBot("$", **options)
+
+    metrics.instrument_http(bot.http)
+    if config.recording.path:
+        bot.recorder = GatewayRecorder(
+            config.recording.path, config.recording.sample_rate, [bot.command_prefix], WIKI_COMMAND
+        )
+        bot.recorder.start(bot.loop)
+        bot.add_listener(bot.recorder.on_socket_response)
+    metrics.GUILDS.set_function(lambda: len(bot.guilds))
+
+    SlashCommand(bot)
+    bot.load_extension("bot.slash")
+    return bot
+
+
+def main(
+    shard_ids: typing.Union[list[int], None] = None,
+    shard_count: int = 0,
+    metrics_port: typing.Union[int, None] = None,
+    create_schema: bool = True,
+):
+    setup(create_schema)
+    if shard_count:
+        logger.info("Running shards %s of %d", shard_ids, shard_count)
+
+    bot = create_bot(shard_ids, shard_count)
+    metrics_port = config.metrics.port if metrics_port is None else metrics_port
+    if metrics_port:
+        bot.loop.create_task(metrics.serve(config.metrics.host, metrics_port, config.metrics.lag_interval))
 
-setup()
-
-intents = discord.Intents()
-intents.messages = True
-intents.guilds = True
+    bot.run(config.discord_token)
 
-bot = HelpBot(
-    "$",
-    intents=intents,
-    allowed_mentions=discord.AllowedMentions(everyone=False),
-    help_command=commands.DefaultHelpCommand(),
-)
-slash = SlashCommand(bot)
-bot.load_extension("bot.slash")
 
 if __name__ == "__main__":
-    bot.run(config.discord_token)
+    main()
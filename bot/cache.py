@@ -0,0 +1,153 @@
+import sys
+import threading
+import typing
+from collections import OrderedDict, namedtuple
+
+from bot.config import config
+
+_TopicRecord = namedtuple("TopicRecord", ["guild_id", "group", "key", "desc", "content", "alias"])
+
+
+class TopicRecord(_TopicRecord):
+    """Immutable snapshot of a topic which is safe to use outside of a db_session"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_entity(cls, topic) -> "TopicRecord":
+        return cls(
+            guild_id=topic.guild.id,
+            group=topic.group,
+            key=topic.key,
+            desc=topic.desc,
+            content=topic.content,
+            alias=topic.alias,
+        )
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + sum(sys.getsizeof(f) for f in self)
+
+
+# Marker for topics which are known to be absent, so repeated lookups of
+# unknown topics don't hit the database either.
+MISSING = object()
+_MISSING_SIZE = 64
+
+CacheKey = tuple[str, str, str]
+
+
+class TopicCache:
+    """
+    LRU cache of topics keyed by (guild_id, group, key) bounded by an approximate memory budget in bytes.
+
+    Loads racing an invalidation are not cached: every guild has a version which is bumped on invalidation,
+    and a loaded topic is only stored if the version read before the query didn't change meanwhile.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[CacheKey, tuple[object, int]]" = OrderedDict()
+        self._guild_keys: dict[str, set[CacheKey]] = {}
+        self._versions: dict[str, int] = {}
+        # bumped by clear(), which invalidates every guild at once
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, guild_id: str, group: str, key: str):
+        """Returns cached TopicRecord, MISSING for known absent topics or None if nothing is cached"""
+        cache_key = (guild_id, group, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[0]
+
+    def version(self, guild_id: str) -> tuple[int, int]:
+        return (self._epoch, self._versions.get(guild_id, 0))
+
+    def put(
+        self,
+        guild_id: str,
+        group: str,
+        key: str,
+        record: typing.Union[TopicRecord, None],
+        version: typing.Union[tuple[int, int], None] = None,
+    ):
+        """Caches the topic, unless `version` is given and the guild was invalidated since it was read"""
+        cache_key = (guild_id, group, key)
+        value = record if record is not None else MISSING
+        size = record.size() if record is not None else _MISSING_SIZE
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if version is not None and version != self.version(guild_id):
+                return
+
+            self._remove(cache_key)
+            self._entries[cache_key] = (value, size)
+            self._guild_keys.setdefault(guild_id, set()).add(cache_key)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, guild_id: str, group: str, key: str):
+        with self._lock:
+            self._bump(guild_id)
+            self._remove((guild_id, group, key))
+
+    def invalidate_guild(self, guild_id: str):
+        with self._lock:
+            self._bump(guild_id)
+            for cache_key in list(self._guild_keys.get(guild_id, ())):
+                self._remove(cache_key)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._versions.clear()
+            self._entries.clear()
+            self._guild_keys.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+    def _bump(self, guild_id: str):
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+
+    def _remove(self, cache_key: CacheKey):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+
+        self._size -= entry[1]
+        keys = self._guild_keys.get(cache_key[0])
+        if keys is not None:
+            keys.discard(cache_key)
+            if not keys:
+                del self._guild_keys[cache_key[0]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+topic_cache = TopicCache(config.cache.topic_bytes)
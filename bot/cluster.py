@@ -0,0 +1,116 @@
+"""
+Runs the bot as a group of clusters, each in its own process with its own event loop.
+
+Every cluster runs an AutoShardedBot for the shards `index, index + count, index + 2 * count, ...`,
+so it only handles, caches and syncs commands for guilds of those shards.
+
+WIKIBOT_SHARD_COUNT sets the total number of shards and WIKIBOT_CLUSTER_COUNT the number of clusters.
+When WIKIBOT_CLUSTER_INDEX is set only that cluster is run, otherwise all of them are run side by side.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from bot.config import config
+
+logger = logging.getLogger("wikibot.cluster")
+
+# Discord allows one IDENTIFY per 5 seconds for regular bots
+IDENTIFY_INTERVAL = 5
+RESTART_DELAY = 10
+
+
+def cluster_shards(index: int, count: int, shard_count: int) -> list[int]:
+    return list(range(index, shard_count, count))
+
+
+def run_cluster(index: int, metrics_port: int):
+    # imported here, so that every process sets up its own DB connections
+    from bot import bot
+
+    bot.main(
+        cluster_shards(index, config.cluster.count, config.cluster.shard_count),
+        config.cluster.shard_count,
+        metrics_port,
+        create_schema=False,
+    )
+
+
+class Launcher:
+    def __init__(self, indexes: list[int]):
+        self.indexes = indexes
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._stopping = False
+
+    def start(self, index: int):
+        # clusters in one container can't share the metrics port
+        metrics_port = config.metrics.port + self.indexes.index(index) if config.metrics.port else 0
+        process = self._context.Process(target=run_cluster, args=(index, metrics_port), name=f"wikibot-cluster-{index}")
+        process.start()
+        self.processes[index] = process
+        logger.info("Started cluster %d with pid %d", index, process.pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.profile)
+
+        for index in self.indexes:
+            if self._stopping:
+                break
+            self.start(index)
+            # let the cluster identify all its shards before the next one starts
+            shards = len(cluster_shards(index, config.cluster.count, config.cluster.shard_count))
+            time.sleep(shards * IDENTIFY_INTERVAL)
+
+        while not self._stopping:
+            for (index, process) in list(self.processes.items()):
+                if not process.is_alive() and not self._stopping:
+                    logger.error("Cluster %d exited with %s, restarting", index, process.exitcode)
+                    time.sleep(RESTART_DELAY)
+                    self.start(index)
+            time.sleep(1)
+
+        for process in self.processes.values():
+            process.join()
+
+    def profile(self, signum, frame):
+        # every cluster profiles its own event loop
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGUSR1)
+
+    def stop(self, signum, frame):
+        self._stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    if not config.cluster.shard_count:
+        logger.info("WIKIBOT_SHARD_COUNT isn't set, running a single unsharded bot")
+        from bot import bot
+
+        return bot.main()
+
+    if config.cluster.index is not None:
+        indexes = [config.cluster.index]
+    else:
+        indexes = list(range(config.cluster.count))
+
+    # create tables and run migrations once, instead of racing in every cluster
+    from bot import bot
+
+    bot.setup()
+
+    Launcher(indexes).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import typing
+
+import aiohttp
+import discord
+
+from bot import metrics
+from bot.config import config
+
+# Lower value is synced first
+PRIORITY_JOINED = 0
+PRIORITY_EDITED = 1
+PRIORITY_STARTUP = 2
+
+# a debounced sync is postponed by at most this many debounce delays
+DEBOUNCE_MAX_FACTOR = 4
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+def backoff(attempt: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+class TokenBucket:
+    """Classic token bucket used for the global request rate which Discord doesn't report in headers"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def block(self, retry_after: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+class RateLimitBucket:
+    """Per-route rate limit state learned from X-RateLimit-* response headers"""
+
+    def __init__(self):
+        self.remaining = 1
+        self.reset_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self.remaining <= 0 and self.reset_at > now:
+                await asyncio.sleep(self.reset_at - now)
+            if time.monotonic() >= self.reset_at:
+                # the window has passed, the next response tells us the real state
+                self.remaining = max(self.remaining, 1)
+            self.remaining -= 1
+
+    def update(self, headers: typing.Mapping[str, str]):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if reset_after is not None:
+            self.reset_at = time.monotonic() + float(reset_after)
+
+    def block(self, retry_after: float):
+        self.remaining = 0
+        self.reset_at = time.monotonic() + retry_after
+
+
+class CommandRegistrar:
+    """
+    Minimal Discord REST client for registering guild commands.
+    Unlike discord.py's HTTP client it exposes rate limit state, so the scheduler can pace requests
+    instead of running into 429s.
+    """
+
+    def __init__(self, token: str, api_base: str = None, max_retries: int = None, global_rate: float = None):
+        self.token = token
+        self.api_base = api_base or config.sync.api_base
+        self.max_retries = config.sync.max_retries if max_retries is None else max_retries
+        self.global_bucket = TokenBucket(global_rate or config.sync.global_rate)
+        self.logger = logging.getLogger("wikibot.command_sync")
+        self.rate_limited = 0
+
+        self._routes: dict[str, str] = {}
+        self._buckets: dict[str, RateLimitBucket] = {}
+        self._session: aiohttp.ClientSession = None
+
+    async def add_slash_command(
+        self, application_id: int, guild_id: int, cmd_name: str, description: str, options: list = None
+    ):
+        base = {"name": cmd_name, "description": description, "options": options or []}
+        return await self.request(
+            "POST",
+            f"/applications/{application_id}/guilds/{guild_id}/commands",
+            base,
+            guild_id,
+            "/applications/{application_id}/guilds/{guild_id}/commands",
+        )
+
+    async def request(
+        self, method: str, path: str, payload=None, major: typing.Union[int, None] = None, template: str = None
+    ):
+        """Sends a request with retries. `template` is the path without IDs, used to label metrics."""
+        route = f"{method} {path}"
+        metric_route = f"{method} {template or path}"
+        resp = None
+        error = None
+        for attempt in range(self.max_retries + 1):
+            bucket = self._bucket(route, major)
+            await self.global_bucket.acquire()
+            await bucket.acquire()
+
+            try:
+                with metrics.DISCORD_SECONDS.time(metric_route):
+                    async with self._get_session().request(
+                        method,
+                        self.api_base + path,
+                        json=payload,
+                        headers={"Authorization": f"Bot {self.token}"},
+                    ) as resp:
+                        text = await resp.text()
+                        data = json.loads(text) if text and resp.content_type == "application/json" else text
+                        self._learn(route, major, resp.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                self.logger.warning("%s failed: %s, retrying", route, e)
+                await asyncio.sleep(backoff(attempt))
+                continue
+
+            if 200 <= resp.status < 300:
+                return data
+
+            if resp.status == 429:
+                self.rate_limited += 1
+                retry_after = data.get("retry_after") if isinstance(data, dict) else None
+                retry_after = float(retry_after or resp.headers.get("Retry-After", 1))
+                if resp.headers.get("X-RateLimit-Global") or (isinstance(data, dict) and data.get("global")):
+                    self.logger.warning("Hit global rate limit, retrying in %.2fs", retry_after)
+                    metrics.RATE_LIMITS.inc("global")
+                    self.global_bucket.block(retry_after)
+                else:
+                    self.logger.info("Hit rate limit on %s, retrying in %.2fs", route, retry_after)
+                    metrics.RATE_LIMITS.inc("route")
+                    self._bucket(route, major).block(retry_after)
+                continue
+
+            if resp.status == 403:
+                raise discord.Forbidden(resp, data)
+            if resp.status == 404:
+                raise discord.NotFound(resp, data)
+            if resp.status >= 500:
+                await asyncio.sleep(backoff(attempt))
+                continue
+
+            raise discord.HTTPException(resp, data)
+
+        if resp is None:
+            raise error
+        raise discord.HTTPException(resp, f"Gave up on {route} after {self.max_retries + 1} attempts")
+
+    def _bucket(self, route: str, major) -> RateLimitBucket:
+        key = f"{self._routes[route]}:{major}" if route in self._routes else route
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = RateLimitBucket()
+        return bucket
+
+    def _learn(self, route: str, major, headers: typing.Mapping[str, str]):
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is not None and self._routes.get(route) != bucket_hash:
+            self._routes[route] = bucket_hash
+        self._bucket(route, major).update(headers)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class SyncScheduler:
+    """
+    Runs guild command syncs on a bounded pool of workers ordered by priority.
+    A guild is queued at most once; scheduling it again only raises its priority.
+
+    Delayed schedules are debounced per guild, so a burst of edits results in a single sync.
+    Only one sync per guild runs at a time; a schedule arriving mid-flight runs once it finishes.
+    """
+
+    def __init__(self, sync: typing.Callable[[int], typing.Awaitable], workers: int = None):
+        self._sync = sync
+        self._workers_count = workers or config.sync.workers
+        self._loop: asyncio.AbstractEventLoop = None
+        self._queue: asyncio.PriorityQueue = None
+        self._queued: dict[int, int] = {}
+        self._debounced: dict[int, tuple[asyncio.TimerHandle, int, float]] = {}
+        self._in_flight: set[int] = set()
+        self._trailing: dict[int, int] = {}
+        self._seq = itertools.count()
+        self._workers: list[asyncio.Task] = []
+        self.logger = logging.getLogger("wikibot.command_sync")
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [loop.create_task(self._work()) for _ in range(self._workers_count)]
+
+    def schedule(self, guild_id: int, priority: int = PRIORITY_EDITED, delay: float = 0):
+        if delay > 0:
+            self._debounce(guild_id, priority, delay)
+        else:
+            self._enqueue(guild_id, priority)
+
+    async def join(self):
+        await self._queue.join()
+
+    async def close(self):
+        for (timer, _, _) in self._debounced.values():
+            timer.cancel()
+        self._debounced.clear()
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def _debounce(self, guild_id: int, priority: int, delay: float):
+        now = self._loop.time()
+        # keep postponing while edits keep coming, but not forever
+        deadline = now + delay * DEBOUNCE_MAX_FACTOR
+
+        pending = self._debounced.pop(guild_id, None)
+        if pending is not None:
+            (timer, pending_priority, deadline) = pending
+            timer.cancel()
+            priority = min(priority, pending_priority)
+
+        timer = self._loop.call_at(min(now + delay, deadline), self._fire, guild_id)
+        self._debounced[guild_id] = (timer, priority, deadline)
+
+    def _fire(self, guild_id: int):
+        (_, priority, _) = self._debounced.pop(guild_id)
+        self._enqueue(guild_id, priority)
+
+    def _enqueue(self, guild_id: int, priority: int):
+        if guild_id in self._in_flight:
+            self._trailing[guild_id] = min(priority, self._trailing.get(guild_id, priority))
+            return
+
+        queued = self._queued.get(guild_id)
+        if queued is not None and queued <= priority:
+            return
+
+        self._queued[guild_id] = priority
+        self._queue.put_nowait((priority, next(self._seq), guild_id))
+
+    async def _work(self):
+        while True:
+            (priority, _, guild_id) = await self._queue.get()
+            try:
+                # a guild rescheduled with a higher priority leaves a stale entry behind
+                if self._queued.get(guild_id) != priority:
+                    continue
+                del self._queued[guild_id]
+
+                self._in_flight.add(guild_id)
+                try:
+                    await self._sync(guild_id)
+                finally:
+                    self._in_flight.discard(guild_id)
+                    trailing = self._trailing.pop(guild_id, None)
+                    if trailing is not None:
+                        self._enqueue(guild_id, trailing)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Failed to sync wiki commands for guild %s: %s", guild_id, e, exc_info=True)
+                metrics.COMMAND_SYNCS.inc("failed")
+            finally:
+                self._queue.task_done()
@@ -1,17 +1,41 @@
 import os
+import tempfile
 from collections import namedtuple
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DB = namedtuple("DB", ["user", "password", "host", "database", "populate"])
-Redis = namedtuple("Redis", ["host"])
-SMTP = namedtuple("SMTP", ["host", "email", "password", "from_email"])
+DB = namedtuple("DB", ["user", "password", "host", "database", "populate", "pool_size", "sqlite"])
+Redis = namedtuple("Redis", ["host", "max_connections", "flush_interval", "flush_size"])
+SMTP = namedtuple(
+    "SMTP",
+    ["host", "email", "password", "from_email", "port", "starttls", "digest_size", "interval", "max_attempts"],
+)
+Cache = namedtuple("Cache", ["topic_bytes", "recent_channels", "recent_authors", "recent_ttl", "help_guilds"])
+Sync = namedtuple("Sync", ["workers", "max_retries", "global_rate", "api_base", "debounce"])
+Cluster = namedtuple("Cluster", ["shard_count", "count", "index"])
+Metrics = namedtuple("Metrics", ["host", "port", "lag_interval"])
+Recording = namedtuple("Recording", ["path", "sample_rate"])
+Profiling = namedtuple("Profiling", ["directory", "interval", "signal_seconds"])
 Config = namedtuple(
     "Config",
-    ["db", "redis", "discord_token", "dev_guild_ids", "smtp", "command_prefix"],
-    defaults=[None, None, "", None, None, ""],
+    [
+        "db",
+        "redis",
+        "discord_token",
+        "dev_guild_ids",
+        "smtp",
+        "command_prefix",
+        "cache",
+        "sync",
+        "cluster",
+        "wiki_mode",
+        "metrics",
+        "recording",
+        "profiling",
+    ],
+    defaults=[None, None, "", None, None, "", None, None, None, "subcommands", None, None, None],
 )
 
 config = Config(
@@ -21,9 +45,14 @@ config = Config(
         host=os.getenv("POSTGRES_HOST"),
         database=os.getenv("POSTGRES_DB"),
         populate=os.getenv("POSTGRES_POPULATE") == "1",
+        pool_size=int(os.getenv("WIKIBOT_DB_POOL_SIZE") or 4),
+        sqlite=os.getenv("WIKIBOT_DB_SQLITE"),
     ),
     redis=Redis(
         host=os.getenv("REDIS_HOST"),
+        max_connections=int(os.getenv("WIKIBOT_REDIS_MAX_CONNECTIONS") or 10),
+        flush_interval=float(os.getenv("WIKIBOT_ANALYTICS_FLUSH_INTERVAL") or 10),
+        flush_size=int(os.getenv("WIKIBOT_ANALYTICS_FLUSH_SIZE") or 1000),
     ),
     discord_token=os.getenv("DISCORD_TOKEN"),
     dev_guild_ids=[int(s) for s in os.getenv("DISCORD_DEV_GUILD_IDS").split(",")]
@@ -34,6 +63,50 @@ config = Config(
         email=os.getenv("WIKIBOT_SMTP_EMAIL"),
         from_email=os.getenv("WIKIBOT_SMTP_FROM_EMAIL"),
         password=os.getenv("WIKIBOT_SMTP_PASSWORD"),
+        port=int(os.getenv("WIKIBOT_SMTP_PORT") or 587),
+        starttls=os.getenv("WIKIBOT_SMTP_STARTTLS") != "0",
+        # with more than 1, feedback is collected for `interval` seconds and sent in digests of this size
+        digest_size=int(os.getenv("WIKIBOT_FEEDBACK_DIGEST_SIZE") or 1),
+        interval=float(os.getenv("WIKIBOT_FEEDBACK_INTERVAL") or 60),
+        max_attempts=int(os.getenv("WIKIBOT_FEEDBACK_MAX_ATTEMPTS") or 5),
     ),
     command_prefix=os.getenv("WIKIBOT_COMMAND_PREFIX") or "",
+    # "subcommands" registers every topic as /wiki <group> <key>, "autocomplete" a single /wiki topic:<group/key>
+    wiki_mode=os.getenv("WIKIBOT_WIKI_MODE") or "subcommands",
+    cache=Cache(
+        topic_bytes=int(os.getenv("WIKIBOT_TOPIC_CACHE_BYTES") or 16 * 1024 * 1024),
+        recent_channels=int(os.getenv("WIKIBOT_RECENT_CHANNELS") or 5000),
+        recent_authors=int(os.getenv("WIKIBOT_RECENT_AUTHORS") or 50),
+        recent_ttl=float(os.getenv("WIKIBOT_RECENT_TTL") or 60 * 60),
+        help_guilds=int(os.getenv("WIKIBOT_HELP_CACHE_GUILDS") or 1000),
+    ),
+    sync=Sync(
+        workers=int(os.getenv("WIKIBOT_SYNC_WORKERS") or 4),
+        max_retries=int(os.getenv("WIKIBOT_SYNC_MAX_RETRIES") or 5),
+        global_rate=float(os.getenv("WIKIBOT_SYNC_GLOBAL_RATE") or 40),
+        api_base=os.getenv("WIKIBOT_DISCORD_API_BASE") or "https://discord.com/api/v8",
+        debounce=float(os.getenv("WIKIBOT_SYNC_DEBOUNCE") or 5),
+    ),
+    cluster=Cluster(
+        shard_count=int(os.getenv("WIKIBOT_SHARD_COUNT") or 0),
+        count=int(os.getenv("WIKIBOT_CLUSTER_COUNT") or 1),
+        index=int(os.getenv("WIKIBOT_CLUSTER_INDEX")) if os.getenv("WIKIBOT_CLUSTER_INDEX") else None,
+    ),
+    metrics=Metrics(
+        host=os.getenv("WIKIBOT_METRICS_HOST") or "0.0.0.0",
+        # 0 disables the metrics endpoint
+        port=int(os.getenv("WIKIBOT_METRICS_PORT") or 9100),
+        lag_interval=float(os.getenv("WIKIBOT_METRICS_LAG_INTERVAL") or 1),
+    ),
+    # gateway events are recorded for benchmarks/replay.py only when a path is set
+    recording=Recording(
+        path=os.getenv("WIKIBOT_RECORD_GATEWAY"),
+        sample_rate=float(os.getenv("WIKIBOT_RECORD_SAMPLE_RATE") or 1),
+    ),
+    profiling=Profiling(
+        directory=os.getenv("WIKIBOT_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "wikibot-profiles"),
+        interval=float(os.getenv("WIKIBOT_PROFILE_INTERVAL") or 0.005),
+        # length of profiles started with SIGUSR1
+        signal_seconds=float(os.getenv("WIKIBOT_PROFILE_SIGNAL_SECONDS") or 30),
+    ),
 )
@@ -1,19 +1,32 @@
+import asyncio
+import functools
+import gzip
+import io
 import typing
 import csv
 import sys
 from collections.abc import Iterable
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from pony.orm import *
 
+from bot import metrics
+from bot.cache import MISSING, TopicRecord, topic_cache
 from bot.config import config
-
-db = Database(
-    provider="postgres",
-    user=config.db.user,
-    password=config.db.password,
-    host=config.db.host,
-    database=config.db.database,
-)
+from bot.importer import ImportDiff, diff_topics, parse_rows
+
+if config.db.sqlite:
+    # only for benchmarks and local experiments, migrations, search and export need Postgres
+    db = Database(provider="sqlite", filename=config.db.sqlite, create_db=True)
+else:
+    db = Database(
+        provider="postgres",
+        user=config.db.user,
+        password=config.db.password,
+        host=config.db.host,
+        database=config.db.database,
+    )
 
 
 class Guild(db.Entity):
@@ -22,6 +35,7 @@ class Guild(db.Entity):
     topics = Set("Topic")
     feedbacks = Set("Feedback")
     disabled = Optional(bool, index=True, default=False)
+    commands_hash = Optional(str, nullable=True)
 
 
 class Topic(db.Entity):
@@ -35,11 +49,22 @@ class Topic(db.Entity):
     composite_key(guild, group, key)
 
 
+FEEDBACK_PENDING = "pending"
+FEEDBACK_SENT = "sent"
+FEEDBACK_FAILED = "failed"
+
+
 class Feedback(db.Entity):
     user_id = Required(str)
     user_name = Required(str)
     guild = Required(Guild)
     message = Required(str)
+    guild_name = Optional(str, nullable=True)
+    status = Required(str, default=FEEDBACK_PENDING, index=True)
+    attempts = Required(int, default=0)
+    created_at = Required(datetime, default=datetime.utcnow)
+    sent_at = Optional(datetime)
+    last_error = Optional(str, nullable=True)
 
 
 def upsert_topic(
@@ -69,6 +94,92 @@ def upsert_topic(
     return (topic, new)
 
 
+def save_topic(
+    guild_id: str, group: str, key: str, desc: str, content: str, alias: typing.Union[str, None]
+) -> tuple[TopicRecord, bool]:
+    topic, new = upsert_topic(guild_id, group, key, desc, content, alias)
+    commit()
+
+    record = TopicRecord.from_entity(topic)
+    topic_cache.invalidate(guild_id, record.group, record.key)
+    return (record, new)
+
+
+def delete_topic(guild_id: str, group: str, key: str) -> bool:
+    group = str.lower(group)
+    key = str.lower(key)
+
+    topic = Topic.select(lambda t: t.guild.id == guild_id and t.group == group and t.key == key).first()
+    if topic is None:
+        return False
+
+    topic.delete()
+    commit()
+    topic_cache.invalidate(guild_id, group, key)
+    return True
+
+
+def import_topics(guild_id: str, rows: Iterable[list[str]], dry_run: bool = False) -> ImportDiff:
+    """Writes only added and changed topics from the uploaded rows. With dry_run nothing is written."""
+    diff = diff_topics(guild_topic_records(guild_id), parse_rows(guild_id, rows))
+    if dry_run:
+        return diff
+
+    writes = diff.writes
+    if writes:
+        bulk_upsert_topics(writes)
+        commit()
+        for t in writes:
+            topic_cache.invalidate(guild_id, t.group, t.key)
+
+    return diff
+
+
+# Keeps statements well below the Postgres limit of 65535 bind parameters
+UPSERT_BATCH_SIZE = 1000
+
+
+def bulk_upsert_topics(records: list[TopicRecord]):
+    """Writes topics with a multi-row INSERT ... ON CONFLICT instead of a lookup per topic"""
+    for start in range(0, len(records), UPSERT_BATCH_SIZE):
+        batch = records[start : start + UPSERT_BATCH_SIZE]
+        params = {}
+        values = []
+        for (i, record) in enumerate(batch):
+            names = [f"{field}{i}" for field in TopicRecord._fields]
+            params.update(zip(names, record))
+            values.append("(" + ", ".join(f"${name}" for name in names) + ")")
+
+        db.execute(
+            'INSERT INTO "topic" ("guild", "group", "key", "desc", "content", "alias") VALUES '
+            + ", ".join(values)
+            + ' ON CONFLICT ("guild", "group", "key") DO UPDATE'
+            + ' SET "desc" = EXCLUDED."desc", "content" = EXCLUDED."content", "alias" = EXCLUDED."alias"',
+            {},
+            params,
+        )
+
+
+def load_topic(guild_id: str, group: str, key: str) -> typing.Union[TopicRecord, None]:
+    # a save committed while we read invalidates the guild, and the record we read may be stale then
+    version = topic_cache.version(guild_id)
+    topic = Topic.select(guild=guild_id, group=group, key=key).first()
+    record = TopicRecord.from_entity(topic) if topic is not None else None
+    topic_cache.put(guild_id, group, key, record, version)
+
+    return record
+
+
+async def fetch_topic(guild_id: str, group: str, key: str) -> typing.Union[TopicRecord, None]:
+    cached = topic_cache.get(guild_id, group, key)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached
+
+    return await run(load_topic, guild_id, group, key)
+
+
 def upsert_guild(guild_id: str, guild_name: str) -> tuple[Guild, bool]:
     try:
         guild = Guild[guild_id]
@@ -86,10 +197,80 @@ def guild_topics(guild_id: str) -> Iterable[Topic]:
     return Topic.select(lambda t: t.guild.id == str(guild_id)).order_by(Topic.group, Topic.key)
 
 
+def guild_topic_records(guild_id: str) -> list[TopicRecord]:
+    return [TopicRecord.from_entity(t) for t in guild_topics(guild_id)]
+
+
+EXPORT_COLUMNS = ["group", "key", "desc", "content", "alias"]
+EXPORT_FETCH_SIZE = 500
+
+
+def export_topics(guild_id: str, out: typing.BinaryIO, compress: bool = False) -> int:
+    """
+    Streams the guild's topics as CSV into out and returns the number of exported topics.
+    Rows come from a server-side cursor, so memory use doesn't grow with the number of topics.
+    """
+    gzipped = gzip.GzipFile(fileobj=out, mode="wb") if compress else None
+    text = io.TextIOWrapper(gzipped or out, encoding="utf-8", newline="")
+    writer = csv.writer(text, quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(EXPORT_COLUMNS)
+
+    count = 0
+    cursor = db.get_connection().cursor(name=f"export_{guild_id}")
+    try:
+        cursor.itersize = EXPORT_FETCH_SIZE
+        cursor.execute(
+            'SELECT "group", "key", "desc", "content", "alias" FROM "topic" WHERE "guild" = %s ORDER BY "group", "key"',
+            (guild_id,),
+        )
+        for row in cursor:
+            writer.writerow(row)
+            count += 1
+    finally:
+        cursor.close()
+
+    text.flush()
+    # leave out open for the caller
+    text.detach()
+    if gzipped is not None:
+        gzipped.close()
+
+    return count
+
+
+SEARCH_PAGE_SIZE = 10
+
+
+def search_topics(
+    guild_id: str, query: str, page: int = 0, page_size: int = SEARCH_PAGE_SIZE
+) -> tuple[list[TopicRecord], int]:
+    """Returns a page of the guild's topics matching the query, best matches first, and the total number of matches"""
+    limit = page_size
+    offset = page * page_size
+    rows = db.select(
+        'SELECT "group", "key", "desc", "content", "alias", count(*) OVER () FROM "topic", '
+        + "websearch_to_tsquery('english', $query) AS q "
+        + 'WHERE "guild" = $guild_id AND "search" @@ q '
+        + 'ORDER BY ts_rank("search", q) DESC, "group", "key" '
+        + "LIMIT $limit OFFSET $offset",
+        {},
+        {"query": query, "guild_id": guild_id, "limit": limit, "offset": offset},
+    )
+
+    total = rows[0][5] if rows else 0
+    return ([TopicRecord(guild_id, *row[:5]) for row in rows], total)
+
+
+def enabled_guild_ids() -> list[str]:
+    return [g.id for g in Guild.select(disabled=False)]
+
+
 def mark_guild_disabled(guild_id: str):
     try:
         guild = Guild[guild_id]
         guild.disabled = True
+        # Discord drops guild commands once the bot leaves
+        guild.commands_hash = None
     except ObjectNotFound:
         guild = None
 
@@ -106,9 +287,146 @@ def mark_guild_enabled(guild_id: str):
     return guild
 
 
-def setup():
+def guild_commands_hash(guild_id: str) -> typing.Union[str, None]:
+    guild = Guild.get(id=guild_id)
+    return guild.commands_hash if guild is not None else None
+
+
+def set_guild_commands_hash(guild_id: str, commands_hash: typing.Union[str, None]):
+    guild = Guild.get(id=guild_id)
+    if guild is not None:
+        guild.commands_hash = commands_hash
+
+
+def join_guild(guild_id: str, guild_name: str):
+    guild = mark_guild_enabled(guild_id)
+    if guild is None:
+        guild, _ = upsert_guild(guild_id, guild_name)
+
+    return guild
+
+
+def reconcile_guilds(
+    guilds: list[tuple[str, str]], shard_count: int = 0, shard_ids: typing.Union[list[int], None] = None
+) -> tuple[int, int]:
+    """
+    Brings the guild table in line with the guilds the bot is in using a few set-based statements.
+    Present guilds are inserted, renamed or re-enabled and the rest is disabled. With shard_ids only guilds
+    of those shards are disabled, the others belong to other processes.
+    Returns the number of changed and disabled guilds.
+
+    Unavailable guilds have no name, they keep their stored name or get an empty one.
+    """
+    # an empty name never replaces a stored one
+    new_name = """COALESCE(NULLIF(EXCLUDED."name", ''), "guild"."name")"""
+    changed = 0
+    for start in range(0, len(guilds), UPSERT_BATCH_SIZE):
+        batch = guilds[start : start + UPSERT_BATCH_SIZE]
+        params = {}
+        values = []
+        for (i, (guild_id, name)) in enumerate(batch):
+            params[f"id{i}"] = guild_id
+            params[f"name{i}"] = name
+            values.append(f"($id{i}, COALESCE($name{i}, ''), false)")
+
+        changed += db.execute(
+            'INSERT INTO "guild" ("id", "name", "disabled") VALUES '
+            + ", ".join(values)
+            + f' ON CONFLICT ("id") DO UPDATE SET "name" = {new_name}, "disabled" = false'
+            + f' WHERE "guild"."name" IS DISTINCT FROM {new_name} OR "guild"."disabled"',
+            {},
+            params,
+        ).rowcount
+
+    params = {"ids": [guild_id for (guild_id, _) in guilds]}
+    shard_filter = ""
+    if shard_count and shard_ids is not None:
+        shard_filter = ' AND ((CAST("id" AS bigint) >> 22) % $shard_count) = ANY($shard_ids)'
+        params.update(shard_count=shard_count, shard_ids=list(shard_ids))
+
+    # Discord drops guild commands once the bot leaves, same as mark_guild_disabled
+    disabled = db.execute(
+        'UPDATE "guild" SET "disabled" = true, "commands_hash" = NULL'
+        + ' WHERE NOT "disabled" AND "id" <> ALL(CAST($ids AS text[]))'
+        + shard_filter,
+        {},
+        params,
+    ).rowcount
+
+    return (changed, disabled)
+
+
+def add_feedback(user_id: str, user_name: str, guild_id: str, guild_name: str, message: str) -> int:
+    feedback = Feedback(user_id=user_id, user_name=user_name, guild=guild_id, guild_name=guild_name, message=message)
+    commit()
+    return feedback.id
+
+
+def pending_feedback(limit: int) -> list[Feedback]:
+    """Locks up to limit pending feedbacks until the session ends. Feedbacks locked by other replicas are skipped."""
+    return (
+        Feedback.select(lambda f: f.status == FEEDBACK_PENDING)
+        .order_by(Feedback.id)
+        .for_update(skip_locked=True)
+        .limit(limit)
+    )
+
+
+_executor = ThreadPoolExecutor(max_workers=config.db.pool_size, thread_name_prefix="wikibot-db")
+
+
+def _run_in_session(func, *args, **kwargs):
+    with db_session:
+        return func(*args, **kwargs)
+
+
+async def run(func, *args, **kwargs):
+    """
+    Runs blocking DB code on the bounded DB thread pool so it never blocks the event loop.
+    Every call gets its own db_session, so results must not be lazy Pony queries.
+    """
+    loop = asyncio.get_running_loop()
+    with metrics.DB_SECONDS.time(func.__name__):
+        return await loop.run_in_executor(_executor, functools.partial(_run_in_session, func, *args, **kwargs))
+
+
+# Pony only creates missing tables, so columns added to existing entities have to be added here.
+# Every statement must be idempotent since it runs on each startup.
+MIGRATIONS = [
+    'ALTER TABLE "guild" ADD COLUMN IF NOT EXISTS "commands_hash" TEXT',
+    # Full-text search over key, description and content, ranked in that order
+    'ALTER TABLE "topic" ADD COLUMN IF NOT EXISTS "search" tsvector GENERATED ALWAYS AS ('
+    + "setweight(to_tsvector('english', coalesce(\"key\", '')), 'A')"
+    + " || setweight(to_tsvector('english', coalesce(\"desc\", '')), 'B')"
+    + " || setweight(to_tsvector('english', coalesce(\"content\", '')), 'C')"
+    + ") STORED",
+    'CREATE INDEX IF NOT EXISTS "idx_topic__search" ON "topic" USING GIN ("search")',
+    # Feedback is an outbox delivered by the feedback worker, older feedback was sent right away
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "guild_name" TEXT',
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "status" TEXT NOT NULL DEFAULT \'sent\'',
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "attempts" INTEGER NOT NULL DEFAULT 0',
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "created_at" TIMESTAMP NOT NULL DEFAULT now()',
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "sent_at" TIMESTAMP',
+    'ALTER TABLE "feedback" ADD COLUMN IF NOT EXISTS "last_error" TEXT',
+    'CREATE INDEX IF NOT EXISTS "idx_feedback__status" ON "feedback" ("status")',
+]
+
+
+def setup(create_tables: bool = True):
+    """Maps the entities, and unless `create_tables` is False also creates tables and runs migrations"""
     # set_sql_debug(True)
-    db.generate_mapping(create_tables=True)
+    if not create_tables:
+        db.generate_mapping(create_tables=False)
+        return
+    db.generate_mapping(create_tables=True, check_tables=False)
+    migrate()
+    db.check_tables()
+
+
+@db_session
+def migrate():
+    for statement in MIGRATIONS:
+        db.execute(statement)
 
 
 @db_session
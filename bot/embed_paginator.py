@@ -1,46 +1,101 @@
+import typing
+
 import discord
 
+# Discord embed limits
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_EMBED_LENGTH = 6000
 
-class PaginatedEmbed(discord.Embed):
-    def __init__(self, max_size=1024, **kwargs):
-        super().__init__(**kwargs)
-        self._pages = [self]
-        self.max_size = max_size
+# room left in the title for the " <page>/<pages>" suffix
+PAGE_SUFFIX_LENGTH = 12
+# Discord rejects fields with an empty name
+EMPTY_NAME = "\u200b"
+
+Field = tuple[str, str, bool]
+
+
+def pack_fields(
+    items: typing.Iterable[Field], reserved: int = 0, max_length: int = MAX_EMBED_LENGTH
+) -> list[list[Field]]:
+    """
+    Packs (name, line, inline) items into pages of fields in a single pass.
 
-    def add_field(self, **args):
-        super().add_field(**args)
+    Consecutive lines with the same name and inline flag are joined into one field, which is continued
+    under the same name once it's full. Every page has at most MAX_FIELDS fields, every field value at most
+    MAX_FIELD_VALUE characters and the fields of a page plus `reserved` (title, footer etc.) at most
+    `max_length` characters. Lines longer than a field value are split. Discord rejects empty values, so
+    blank lines are only kept inside a field and empty names are replaced with a zero width space.
+    """
+    pages: list[list[Field]] = []
+    fields: list[Field] = []
+    page_length = reserved
 
-        if len(self) >= self.max_size:
+    name = None
+    inline = False
+    lines: list[str] = []
+    value_length = 0
 
-            copy = self.copy()
-            fields = [f for f in self._fields]
-            copy._fields = []
+    for (item_name, line, item_inline) in items:
+        item_name = item_name[:MAX_FIELD_NAME] if item_name.strip() else EMPTY_NAME
+        for start in range(0, max(len(line), 1), MAX_FIELD_VALUE):
+            chunk = line[start : start + MAX_FIELD_VALUE]
+            if lines and item_name == name and item_inline == inline:
+                added = len(chunk) + 1
+                if value_length + added <= MAX_FIELD_VALUE and page_length + added <= max_length:
+                    lines.append(chunk)
+                    value_length += added
+                    page_length += added
+                    continue
 
-            last_field = self.fields[-1]
-            self.remove_field(-1)
+            if not chunk.strip():
+                # a field can't start with a blank line
+                continue
 
-            copy.add_field(name=last_field.name, value=last_field.value, inline=last_field.inline)
+            if lines:
+                fields.append((name, "\n".join(lines), inline))
 
-            self._pages += self._split_embed(copy)
+            added = len(item_name) + len(chunk)
+            if len(fields) == MAX_FIELDS or (fields and page_length + added > max_length):
+                pages.append(fields)
+                fields = []
+                page_length = reserved
 
-    def _split_embed(self, embed: discord.Embed):
-        if len(embed) < self.max_size:
-            return [embed]
+            (name, inline, lines, value_length) = (item_name, item_inline, [chunk], len(chunk))
+            page_length += added
 
-        copy = embed.copy()
-        copy._fields = []
-        last_field = embed.fields[-1]
-        lines = last_field.value.split("\n")
-        embed.remove_field(-1)
+    if lines:
+        fields.append((name, "\n".join(lines), inline))
+    if fields or not pages:
+        pages.append(fields)
+
+    return pages
+
+
+class PaginatedEmbed(discord.Embed):
+    """Embed whose fields are split into as many pages as needed to fit Discord limits"""
+
+    def __init__(self, max_size=MAX_EMBED_LENGTH, **kwargs):
+        super().__init__(**kwargs)
+        self.max_size = max_size
+        self._items: list[Field] = []
 
-        embed.add_field(name=last_field.name, value="\n".join(lines[: len(lines) // 2]), inline=last_field.inline)
-        copy.add_field(name=last_field.name, value="\n".join(lines[len(lines) // 2 :]), inline=last_field.inline)
+    def add_field(self, *, name, value, inline=True):
+        for line in str(value).split("\n"):
+            self._items.append((str(name), line, inline))
+        return self
 
-        return [embed] + self._split_embed(copy)
+    def pages(self) -> list[discord.Embed]:
+        base = self.copy()
+        base._fields = []
 
-    def pages(self):
-        n = len(self._pages)
-        for i, e in enumerate(self._pages):
-            e.title += f" {i+1}/{n}"
+        packed = pack_fields(self._items, len(base) + PAGE_SUFFIX_LENGTH, self.max_size)
+        pages = []
+        for (i, fields) in enumerate(packed):
+            page = base.copy()
+            page.title = f"{self.title or ''} {i+1}/{len(packed)}"
+            page._fields = [{"name": name, "value": value, "inline": inline} for (name, value, inline) in fields]
+            pages.append(page)
 
-        return self._pages
+        return pages
@@ -1,51 +1,180 @@
+import asyncio
+import logging
 import smtplib
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-import discord
+from pony.orm import commit, db_session
 
-from bot.config import config
 import bot.db
-from pony.orm import db_session, commit
+from bot import metrics
+from bot.command_sync import backoff
+from bot.config import config
+
+SMTP_TIMEOUT = 30
 
 
 class Feedback:
+    """
+    Delivers feedback by email from an outbox in the Feedback table.
+
+    Submitting only stores the feedback, a background worker sends pending feedbacks over a reused SMTP
+    connection which is reopened once the server drops it. Failed deliveries are retried with a backoff
+    until `max_attempts`. With `digest_size` above 1 feedback is sent every `interval` seconds in digests.
+    Pending rows are locked while sent, so several replicas can run workers against the same outbox.
+    """
+
     def __init__(self):
-        mailserver = smtplib.SMTP(config.smtp.host, 587)
-        # identify ourselves to smtp gmail client
-        mailserver.ehlo()
-        # secure our email with tls encryption
-        mailserver.starttls()
-        # re-identify ourselves as an encrypted connection
-        mailserver.ehlo()
-        mailserver.login(config.smtp.email, config.smtp.password)
-        self.mailserver = mailserver
+        self.logger = logging.getLogger("wikibot.feedback")
+        self.digest_size = max(config.smtp.digest_size, 1)
+        self.interval = config.smtp.interval
+        self.max_attempts = config.smtp.max_attempts
+        self.sent = 0
+        self.failed = 0
+
+        self._smtp: smtplib.SMTP = None
+        # smtplib is blocking and not thread safe, so all SMTP work happens on a single thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wikibot-smtp")
+        self._loop: asyncio.AbstractEventLoop = None
+        self._wake: asyncio.Event = None
+        self._worker: asyncio.Task = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._worker = loop.create_task(self._work())
+
+    async def submit(self, member_id: int, member_nick: str, guild_id: int, guild_name: str, message: str) -> int:
+        """Stores the feedback in the outbox, it's sent by the worker later"""
+        feedback_id = await bot.db.run(
+            bot.db.add_feedback, str(member_id), member_nick, str(guild_id), guild_name, message
+        )
+        if self._wake is not None:
+            self._wake.set()
+        return feedback_id
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._disconnect)
+        self._executor.shutdown(wait=False)
+
+    async def _work(self):
+        failures = 0
+        while True:
+            if self.digest_size > 1:
+                await asyncio.sleep(self.interval)
+            else:
+                try:
+                    # pending feedback left by a failure or another replica is picked up by the next poll
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+
+            try:
+                while await self._loop.run_in_executor(self._executor, self._deliver_pending):
+                    pass
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                self.logger.error("Failed to deliver feedback: %s", e, exc_info=True)
+                await asyncio.sleep(backoff(failures))
+                self._wake.set()
 
     @db_session
-    def send_feedback(
-        self,
-        member_id: int,
-        member_nick: str,
-        guild_id: int,
-        guild_name: str,
-        message: str,
-    ):
-        feedback = bot.db.Feedback(user_id=str(member_id), user_name=member_nick, guild=str(guild_id), message=message)
+    def _deliver_pending(self) -> int:
+        """Sends one email with up to digest_size pending feedbacks, returns how many were delivered"""
+        pending = list(bot.db.pending_feedback(self.digest_size))
+        if not pending:
+            return 0
+
+        try:
+            with metrics.SMTP_SECONDS.time():
+                self._send(self._message(pending))
+        except (smtplib.SMTPException, OSError) as e:
+            for feedback in pending:
+                feedback.attempts += 1
+                feedback.last_error = str(e)
+                if feedback.attempts >= self.max_attempts:
+                    feedback.status = bot.db.FEEDBACK_FAILED
+                    self.failed += 1
+                    metrics.FEEDBACK.inc("failed")
+                    self.logger.critical("Giving up on feedback %d: %s", feedback.id, e)
+            commit()
+            raise
+
+        now = datetime.utcnow()
+        for feedback in pending:
+            feedback.status = bot.db.FEEDBACK_SENT
+            feedback.sent_at = now
         commit()
 
+        self.sent += len(pending)
+        metrics.FEEDBACK.inc("sent", amount=len(pending))
+        return len(pending)
+
+    def _message(self, feedbacks: list) -> MIMEMultipart:
         msg = MIMEMultipart()
         msg["From"] = config.smtp.from_email
         msg["To"] = config.smtp.email
-        msg["Subject"] = f"WikiBot: Feedback from {member_nick} from {guild_name}"
-        message = (
-            f"Guild ID: {guild_id}, Guild Name: {guild_name}"
-            + f"\nMember ID: {member_id}, Member Name: {member_nick}"
-            + f"\nFeedback: {message}"
+
+        if len(feedbacks) == 1:
+            f = feedbacks[0]
+            msg["Subject"] = f"WikiBot: Feedback from {f.user_name} from {f.guild_name}"
+        else:
+            msg["Subject"] = f"WikiBot: {len(feedbacks)} feedbacks"
+
+        msg.attach(MIMEText("\n\n".join(self._format(f) for f in feedbacks)))
+        return msg
+
+    def _format(self, feedback) -> str:
+        return (
+            f"Guild ID: {feedback.guild.id}, Guild Name: {feedback.guild_name}"
+            + f"\nMember ID: {feedback.user_id}, Member Name: {feedback.user_name}"
+            + f"\nSent at: {feedback.created_at:%Y-%m-%d %H:%M:%S} UTC"
+            + f"\nFeedback: {feedback.message}"
         )
 
-        msg.attach(MIMEText(message))
+    def _send(self, msg: MIMEMultipart):
+        for attempt in range(2):
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                self._smtp.sendmail(config.smtp.from_email, config.smtp.email, msg.as_string())
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                # servers drop idle connections, so a stale connection gets one more try on a fresh one
+                self._disconnect()
+                if attempt:
+                    raise
+
+    def _connect(self) -> smtplib.SMTP:
+        mailserver = smtplib.SMTP(config.smtp.host, config.smtp.port, timeout=SMTP_TIMEOUT)
+        # identify ourselves to smtp gmail client
+        mailserver.ehlo()
+        if config.smtp.starttls:
+            # secure our email with tls encryption
+            mailserver.starttls()
+            # re-identify ourselves as an encrypted connection
+            mailserver.ehlo()
+        if config.smtp.password:
+            mailserver.login(config.smtp.email, config.smtp.password)
+        return mailserver
 
-        self.mailserver.sendmail(config.smtp.from_email, config.smtp.email, msg.as_string())
+    def _disconnect(self):
+        if self._smtp is None:
+            return
 
-    def close(self):
-        self.mailserver.quit()
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
@@ -0,0 +1,177 @@
+"""
+Records gateway dispatch events to a gzipped JSON lines file, for replaying with benchmarks/replay.py.
+
+Every line is `[milliseconds since the recording started, event name, sanitized payload]`. Interaction
+tokens, user names, nicknames, avatars, presences, message text and free text options are removed and user
+IDs are replaced with stable fake IDs, while guild, channel and message IDs, command names, /wiki topics and
+text lengths are kept.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+import typing
+
+# huge and only sent on connect
+SKIPPED_EVENTS = {"READY", "GUILD_CREATE", "GUILD_MEMBERS_CHUNK", "RESUMED"}
+FLUSH_INTERVAL = 5
+FLUSH_SIZE = 1000
+FAKE_USER_ID_BASE = 100000000000000000
+STRING_OPTION_TYPE = 3
+USER_OPTION_TYPE = 6
+# the /wiki option naming the topic, which replay needs to seed and answer it
+TOPIC_OPTION = "topic"
+# personal fields of member, presence and user update events
+DROPPED_FIELDS = ("nick", "avatar", "activities", "client_status", "game", "referenced_message", "message_reference")
+
+
+class Sanitizer:
+    """Strips personal data from gateway payloads and maps user IDs to fake ones consistently"""
+
+    def __init__(self, prefixes: typing.Iterable[str] = (), wiki_command: str = None):
+        self.prefixes = tuple(prefixes)
+        self.wiki_command = wiki_command
+        self._users: dict[str, str] = {}
+
+    def user_id(self, user_id) -> str:
+        fake = self._users.get(str(user_id))
+        if fake is None:
+            fake = self._users[str(user_id)] = str(FAKE_USER_ID_BASE + len(self._users))
+        return fake
+
+    def user(self, user: dict) -> dict:
+        return {
+            "id": self.user_id(user["id"]),
+            "username": "user",
+            "discriminator": "0000",
+            "avatar": None,
+            "bot": user.get("bot", False),
+        }
+
+    def member(self, member: dict) -> dict:
+        member = {k: v for (k, v) in member.items() if k not in ("nick", "avatar")}
+        if "user" in member:
+            member["user"] = self.user(member["user"])
+        return member
+
+    def content(self, content: str) -> str:
+        # prefixed commands and aliases keep their first word, so they are dispatched the same way
+        if content.startswith(self.prefixes):
+            (command, _, rest) = content.partition(" ")
+            return command + (" " + "x" * len(rest) if rest else "")
+        return "x" * len(content)
+
+    def options(self, options: list, keep_topic: bool = False) -> list:
+        sanitized = []
+        for option in options:
+            option = dict(option)
+            if "value" in option:
+                if option.get("type") == USER_OPTION_TYPE:
+                    option["value"] = self.user_id(option["value"])
+                elif option.get("type") == STRING_OPTION_TYPE and not (keep_topic and option["name"] == TOPIC_OPTION):
+                    option["value"] = "x" * len(str(option["value"]))
+            if "options" in option:
+                option["options"] = self.options(option["options"], keep_topic)
+            sanitized.append(option)
+        return sanitized
+
+    def event(self, event: str, d: dict) -> dict:
+        d = dict(d)
+        if "token" in d:
+            d["token"] = "redacted"
+        if "user_id" in d:
+            d["user_id"] = self.user_id(d["user_id"])
+        for key in ("author", "user"):
+            if isinstance(d.get(key), dict):
+                d[key] = self.user(d[key])
+        if isinstance(d.get("member"), dict):
+            d["member"] = self.member(d["member"])
+        if isinstance(d.get("content"), str):
+            d["content"] = self.content(d["content"])
+        for key in ("embeds", "attachments", "mentions"):
+            if key in d:
+                d[key] = []
+        for key in DROPPED_FIELDS:
+            d.pop(key, None)
+
+        if event == "INTERACTION_CREATE":
+            if isinstance(d.get("message"), dict):
+                # the message a component belongs to
+                d["message"] = self.event("MESSAGE_CREATE", d["message"])
+            if isinstance(d.get("data"), dict):
+                data = d["data"] = {k: v for (k, v) in d["data"].items() if k != "resolved"}
+                if "options" in data:
+                    data["options"] = self.options(data["options"], data.get("name") == self.wiki_command)
+                if "values" in data:
+                    # chosen select menu options
+                    data["values"] = ["x" * len(str(v)) for v in data["values"]]
+        return d
+
+
+class GatewayRecorder:
+    """Samples raw gateway events from on_socket_response and appends them to a recording"""
+
+    def __init__(
+        self, path: str, sample_rate: float = 1.0, prefixes: typing.Iterable[str] = (), wiki_command: str = None
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.sanitizer = Sanitizer(prefixes, wiki_command)
+        self.recorded = 0
+        self.logger = logging.getLogger("wikibot.recorder")
+
+        self._started = time.monotonic()
+        self._buffer: list[str] = []
+        self._flusher: asyncio.Task = None
+        self._writing = asyncio.Lock()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._flusher = loop.create_task(self._flush_periodically())
+        self.logger.info("Recording gateway events to %s", self.path)
+
+    async def on_socket_response(self, msg: dict):
+        event = msg.get("t")
+        if msg.get("op") != 0 or event is None or event in SKIPPED_EVENTS:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        try:
+            d = self.sanitizer.event(event, msg["d"])
+        except (KeyError, TypeError, AttributeError) as e:
+            self.logger.debug("Not recording malformed %s event: %s", event, e)
+            return
+
+        offset = int((time.monotonic() - self._started) * 1000)
+        self._buffer.append(json.dumps([offset, event, d], separators=(",", ":")))
+        self.recorded += 1
+        if len(self._buffer) >= FLUSH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        lines, self._buffer = self._buffer, []
+        async with self._writing:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.flush()
+
+    def _write(self, lines: list[str]):
+        # every flush appends a gzip member, gzip readers treat them as one stream
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except OSError as e:
+                self.logger.error("Failed to write gateway recording: %s", e, exc_info=True)
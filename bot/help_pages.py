@@ -0,0 +1,79 @@
+import typing
+from collections import OrderedDict
+
+import discord
+
+from bot.embed_paginator import PaginatedEmbed
+
+HelpKey = tuple[str, bool]
+Section = tuple[str, str]
+
+HELP_COLOR = discord.Color.from_rgb(225, 225, 225)
+
+
+def render_help_pages(
+    title: str,
+    footer: dict,
+    sections: typing.Iterable[Section],
+    topics_name: str,
+    topic_lines: typing.Iterable[str],
+) -> list[discord.Embed]:
+    embed = PaginatedEmbed(title=title, color=HELP_COLOR)
+    embed.set_footer(**footer)
+    for (name, value) in sections:
+        embed.add_field(name=name, value=value, inline=False)
+    embed.add_field(name=topics_name, value="\n".join(topic_lines) or "No commands available", inline=False)
+
+    return embed.pages()
+
+
+class HelpPages:
+    """
+    Rendered /wiki-help pages per guild and permission level, dropped when the guild's topics change.
+
+    Renders racing an invalidation are not cached: every guild has a version which is bumped on
+    invalidation and a render is only stored if the version didn't change while it was running.
+    """
+
+    def __init__(self, max_guilds: int):
+        self.max_guilds = max_guilds
+        self.hits = 0
+        self.misses = 0
+        self._pages: "OrderedDict[HelpKey, tuple[str, list[discord.Embed]]]" = OrderedDict()
+        self._versions: dict[str, int] = {}
+
+    def get(self, guild_id: str, guild_name: str, manager: bool) -> typing.Union[list[discord.Embed], None]:
+        key = (guild_id, manager)
+        entry = self._pages.get(key)
+        # pages are titled with the guild name
+        if entry is None or entry[0] != guild_name:
+            self.misses += 1
+            return None
+
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def version(self, guild_id: str) -> int:
+        return self._versions.get(guild_id, 0)
+
+    def put(self, guild_id: str, guild_name: str, manager: bool, pages: list[discord.Embed], version: int):
+        if version != self.version(guild_id):
+            return
+
+        key = (guild_id, manager)
+        self._pages.pop(key, None)
+        self._pages[key] = (guild_name, pages)
+        while len(self._pages) > self.max_guilds * 2:
+            self._pages.popitem(last=False)
+
+    def invalidate(self, guild_id: str):
+        self._versions[guild_id] = self.version(guild_id) + 1
+        self._pages.pop((guild_id, False), None)
+        self._pages.pop((guild_id, True), None)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._pages)}
+
+    def __len__(self):
+        return len(self._pages)
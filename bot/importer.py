@@ -0,0 +1,73 @@
+import typing
+from collections import namedtuple
+
+from bot.cache import TopicRecord
+
+DIFF_FIELDS = ("desc", "content", "alias")
+# Changing content doesn't change /wiki commands, so it doesn't need a resync
+SYNC_FIELDS = ("desc", "alias")
+
+TopicChange = namedtuple("TopicChange", ["old", "new", "fields"])
+
+
+class ImportDiff:
+    """Difference between an uploaded CSV and the topics currently stored for the guild"""
+
+    def __init__(self):
+        self.added: list[TopicRecord] = []
+        self.changed: list[TopicChange] = []
+        self.unchanged: list[TopicRecord] = []
+        self.missing: list[TopicRecord] = []
+
+    @property
+    def writes(self) -> list[TopicRecord]:
+        return self.added + [c.new for c in self.changed]
+
+    @property
+    def needs_sync(self) -> bool:
+        return bool(self.added) or any(f in SYNC_FIELDS for c in self.changed for f in c.fields)
+
+    def summary(self) -> str:
+        return (
+            f"**{len(self.added)}** added, **{len(self.changed)}** changed, "
+            + f"**{len(self.unchanged)}** unchanged and **{len(self.missing)}** not in the file"
+        )
+
+    def details(self) -> list[str]:
+        return (
+            [f"+ `{t.group}/{t.key}`" for t in self.added]
+            + [f"~ `{c.new.group}/{c.new.key}`: {', '.join(c.fields)}" for c in self.changed]
+            + [f"- `{t.group}/{t.key}`" for t in self.missing]
+        )
+
+
+def parse_rows(guild_id: str, rows: typing.Iterable[list[str]]) -> dict[tuple[str, str], TopicRecord]:
+    topics = {}
+    for row in rows:
+        record = TopicRecord(
+            guild_id, str.lower(row[0]), str.lower(row[1]), row[2], row[3], row[4] if len(row) == 5 else ""
+        )
+        # the last row wins, same as upserting rows one by one
+        topics[(record.group, record.key)] = record
+
+    return topics
+
+
+def diff_topics(existing: typing.Iterable[TopicRecord], uploaded: dict[tuple[str, str], TopicRecord]) -> ImportDiff:
+    diff = ImportDiff()
+    current = {(t.group, t.key): t for t in existing}
+
+    for (k, new) in uploaded.items():
+        old = current.pop(k, None)
+        if old is None:
+            diff.added.append(new)
+            continue
+
+        fields = [f for f in DIFF_FIELDS if (getattr(old, f) or "") != (getattr(new, f) or "")]
+        if fields:
+            diff.changed.append(TopicChange(old, new, fields))
+        else:
+            diff.unchanged.append(old)
+
+    diff.missing = list(current.values())
+    return diff
@@ -0,0 +1,142 @@
+"""
+Routes /wiki interactions straight from the bot's event dispatch.
+
+A socket_response listener costs a task for every gateway event, and almost all of them are messages,
+typing and presence events. The router checks the event name synchronously inside Bot.dispatch instead,
+so other events cost a dict lookup, and only starts a task for /wiki interactions. Their group, key and
+options are parsed once into a WikiInvocation which is handed to the handler.
+"""
+import asyncio
+import logging
+import typing
+
+INTERACTION_CREATE = "INTERACTION_CREATE"
+SOCKET_RESPONSE = "socket_response"
+APPLICATION_COMMAND_AUTOCOMPLETE = 4
+STRING_OPTION = 3
+TOPIC_OPTION = "topic"
+
+
+class WikiInvocation:
+    """A parsed /wiki <group> <key> or /wiki topic:<group/key> interaction"""
+
+    __slots__ = ("interaction", "group", "key", "hidden", "reply_to")
+
+    def __init__(self, interaction: dict, group: str, key: str):
+        self.interaction = interaction
+        self.group = group
+        self.key = key
+        self.hidden = False
+        self.reply_to = None
+
+    def __repr__(self):
+        return f"<WikiInvocation {self.group}/{self.key} hidden={self.hidden} reply_to={self.reply_to}>"
+
+
+def parse_wiki_interaction(d: dict) -> typing.Union[WikiInvocation, None]:
+    """Parses the INTERACTION_CREATE payload of a /wiki command, None if it names no topic"""
+    options = d["data"].get("options")
+    if not options:
+        return None
+
+    first = options[0]
+    if first["type"] == STRING_OPTION or "value" in first:
+        # autocomplete mode: /wiki topic:<group/key> [reply_to] [hidden], options come in any order
+        topic = None
+        args = options
+    else:
+        subcommands = first.get("options")
+        if not subcommands:
+            return None
+        subcommand = subcommands[0]
+        topic = (first["name"], subcommand["name"])
+        args = subcommand.get("options") or ()
+
+    hidden = False
+    reply_to = None
+    for option in args:
+        name = option["name"]
+        if name == TOPIC_OPTION:
+            (group, _, key) = str(option.get("value", "")).partition("/")
+            topic = (group, key)
+        elif name == "hidden":
+            hidden = option.get("value", False)
+        elif name == "reply_to":
+            reply_to = option.get("value")
+
+    if topic is None:
+        return None
+    invocation = WikiInvocation(d, *topic)
+    invocation.hidden = hidden
+    invocation.reply_to = reply_to
+    return invocation
+
+
+class InteractionRouter:
+    """Hooks into bot.dispatch and starts a handler task only for interactions of `command`"""
+
+    def __init__(
+        self,
+        bot,
+        command: str,
+        on_invocation: typing.Callable[[WikiInvocation], typing.Awaitable],
+        on_autocomplete: typing.Callable[[dict], typing.Awaitable],
+    ):
+        self.bot = bot
+        self.command = command
+        self.on_invocation = on_invocation
+        self.on_autocomplete = on_autocomplete
+        self._dispatch: typing.Callable = None
+        self.logger = logging.getLogger("wikibot.router")
+        # the loop only keeps weak references to tasks
+        self._tasks: set[asyncio.Task] = set()
+
+    def install(self):
+        dispatch = self._dispatch = self.bot.dispatch
+        route = self.route
+        logger = self.logger
+
+        def routing_dispatch(event, *args, **kwargs):
+            if event == SOCKET_RESPONSE:
+                # a malformed payload must not keep the event from discord.py's own dispatch
+                try:
+                    route(args[0])
+                except Exception:
+                    logger.exception("Failed to route gateway event")
+            dispatch(event, *args, **kwargs)
+
+        self.bot.dispatch = routing_dispatch
+
+    def uninstall(self):
+        if self._dispatch is not None:
+            self.bot.dispatch = self._dispatch
+            self._dispatch = None
+
+    def route(self, msg: dict) -> typing.Union[asyncio.Task, None]:
+        """Starts the handler of a /wiki interaction and returns its task, ignores everything else"""
+        if msg.get("t") != INTERACTION_CREATE:
+            return None
+
+        d = msg["d"]
+        data = d.get("data")
+        if data is None or data.get("name") != self.command:
+            return None
+
+        if d["type"] == APPLICATION_COMMAND_AUTOCOMPLETE:
+            return self._spawn(self.on_autocomplete(d))
+
+        invocation = parse_wiki_interaction(d)
+        if invocation is None:
+            return None
+        return self._spawn(self.on_invocation(invocation))
+
+    def _spawn(self, coro: typing.Awaitable) -> asyncio.Task:
+        task = self.bot.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("Interaction handler failed", exc_info=task.exception())
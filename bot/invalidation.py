@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+import typing
+import uuid
+
+import redis.asyncio as redis
+
+from bot import metrics
+from bot.cache import topic_cache
+from bot.config import config
+
+CHANNEL = "wikibot:topics"
+VERSION_KEY = "topic_version_"
+RECONNECT_DELAY = 5
+
+# called with (guild_id, group, key), group and key are None when the whole guild changed
+TopicListener = typing.Callable[[str, typing.Union[str, None], typing.Union[str, None]], typing.Awaitable]
+
+
+class TopicInvalidator:
+    """
+    Keeps topic caches of all bot replicas consistent over Redis pub/sub.
+
+    Every topic change bumps a per-guild version and publishes (guild, group, key, version).
+    Replicas evict the topic, or the whole guild if they notice a skipped version, and then
+    notify listeners so other per-guild state of that topic or guild gets reloaded too.
+    """
+
+    def __init__(self, client: redis.Redis = None, owns_guild: typing.Callable[[str], bool] = None):
+        self._r = client or redis.Redis(host=config.redis.host, port=6379, db=0)
+        self._owns_guild = owns_guild or (lambda guild_id: True)
+        self.origin = uuid.uuid4().hex
+        self.logger = logging.getLogger("wikibot.invalidation")
+        self.listeners: list[TopicListener] = []
+        self.reloads = 0
+
+        self._versions: dict[str, int] = {}
+        self._subscriber: asyncio.Task = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._subscriber = loop.create_task(self._subscribe())
+
+    async def publish(self, guild_id: str, group: str = None, key: str = None):
+        """Tells other replicas about a committed change. Without group and key the whole guild is invalidated."""
+        try:
+            with metrics.REDIS_SECONDS.time("invalidation_publish"):
+                version = await self._r.incr(VERSION_KEY + guild_id)
+                self._versions[guild_id] = max(version, self._versions.get(guild_id, 0))
+                await self._r.publish(
+                    CHANNEL, json.dumps([self.origin, guild_id, group, key, version], separators=(",", ":"))
+                )
+        except redis.RedisError as e:
+            self.logger.warning("Failed to publish invalidation for guild %s: %s", guild_id, e, exc_info=True)
+
+    async def close(self):
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+        await self._r.close()
+
+    async def _subscribe(self):
+        while True:
+            try:
+                async with self._r.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    # changes published while we weren't subscribed are lost
+                    self._reset()
+
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self._handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except redis.RedisError as e:
+                self.logger.warning("Lost invalidation subscription: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _handle(self, data: bytes):
+        try:
+            (origin, guild_id, group, key, version) = json.loads(data)
+        except ValueError:
+            self.logger.warning("Malformed invalidation message: %s", data)
+            return
+
+        if not self._owns_guild(guild_id):
+            return
+
+        last = self._versions.get(guild_id)
+        self._versions[guild_id] = max(version, last or 0)
+        if origin == self.origin:
+            return
+
+        if group is None or key is None or (last is not None and version > last + 1):
+            if group is not None and key is not None:
+                self.reloads += 1
+                self.logger.info("Missed invalidations for guild %s, reloading it", guild_id)
+            topic_cache.invalidate_guild(guild_id)
+            await self._notify(guild_id, None, None)
+        else:
+            topic_cache.invalidate(guild_id, group, key)
+            await self._notify(guild_id, group, key)
+
+    def _reset(self):
+        topic_cache.clear()
+        self._versions.clear()
+
+    async def _notify(self, guild_id: str, group: typing.Union[str, None], key: typing.Union[str, None]):
+        for listener in self.listeners:
+            try:
+                await listener(guild_id, group, key)
+            except Exception as e:
+                self.logger.error("Invalidation listener failed for guild %s: %s", guild_id, e, exc_info=True)
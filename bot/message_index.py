@@ -0,0 +1,68 @@
+import time
+import typing
+from collections import OrderedDict
+
+import discord
+
+
+class RecentMessages:
+    """
+    Remembers the latest default message of recent authors per channel from gateway events,
+    so reply targets can be found without fetching channel history.
+    Bounded by the number of channels, authors per channel and message age.
+    """
+
+    def __init__(self, max_channels: int, max_authors: int, ttl: float):
+        self.max_channels = max_channels
+        self.max_authors = max_authors
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._channels: "OrderedDict[int, OrderedDict[int, tuple[int, float]]]" = OrderedDict()
+
+    def add(self, message: discord.Message):
+        if message.type != discord.MessageType.default:
+            return
+
+        channel_id = message.channel.id
+        authors = self._channels.get(channel_id)
+        if authors is None:
+            authors = self._channels[channel_id] = OrderedDict()
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(channel_id)
+
+        authors.pop(message.author.id, None)
+        authors[message.author.id] = (message.id, time.monotonic())
+        if len(authors) > self.max_authors:
+            authors.popitem(last=False)
+
+    def latest(self, channel_id: int, author_id: int) -> typing.Union[int, None]:
+        """Returns id of the author's latest message in the channel if it's still remembered"""
+        entry = self._channels.get(channel_id, {}).get(author_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry[0]
+
+    def forget(self, channel_id: int, message_id: int):
+        authors = self._channels.get(channel_id)
+        if authors is None:
+            return
+
+        for (author_id, (latest_id, _)) in authors.items():
+            if latest_id == message_id:
+                del authors[author_id]
+                return
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "channels": len(self._channels),
+        }
@@ -0,0 +1,211 @@
+"""
+Minimal in-process metrics served in the Prometheus text format.
+
+Metrics are plain dicts keyed by label values and updated from the event loop, so recording one is a dict
+update and a bisect for histograms. Values which already live elsewhere (cache stats, guild count) are
+registered as callbacks and only read when the endpoint is scraped.
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import time
+import typing
+
+from aiohttp import web
+
+logger = logging.getLogger("wikibot.metrics")
+
+# seconds, from a cache hit to a slow Discord request
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: dict[Labels, float] = {}
+        self._function: typing.Callable[[], typing.Union[float, dict[Labels, float]]] = None
+        REGISTRY.append(self)
+
+    def set_function(self, function: typing.Callable[[], typing.Union[float, dict[Labels, float]]]):
+        """Reads the value from `function` on every scrape, which returns a number or a dict keyed by labels"""
+        self._function = function
+
+    def samples(self) -> typing.Iterable[tuple[str, Labels, float]]:
+        if self._function is None:
+            values = list(self._values.items())
+        else:
+            value = self._function()
+            values = list(value.items()) if isinstance(value, dict) else [((), value)]
+
+        for (labels, value) in values:
+            yield (self.name, labels, value)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for (name, labels, value) in self.samples():
+            lines.append(f"{name}{self._format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+    def _format_labels(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(str(v))}"' for (n, v) in zip(self.label_names, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: typing.Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # per labels: a count per bucket plus +Inf, and the sum of observed values
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def time(self, *labels: str) -> "Timer":
+        return Timer(self, labels)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for (labels, counts) in list(self._counts.items()):
+            cumulative = 0
+            for (bound, count) in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._format_labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {_format_value(self._sums[labels])}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Timer:
+    """Observes the time spent in a with block"""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if isinstance(value, int) or float(value).is_integer() else repr(float(value))
+
+
+REGISTRY: list[Metric] = []
+
+INTERACTION_SECONDS = Histogram(
+    "wikibot_interaction_seconds", "Time from receiving an interaction to finishing its handler", ["handler"]
+)
+HANDLER_ERRORS = Counter("wikibot_handler_errors_total", "Exceptions raised by interaction handlers", ["handler"])
+DB_SECONDS = Histogram("wikibot_db_seconds", "Time of DB calls including the wait for a DB thread", ["query"])
+REDIS_SECONDS = Histogram("wikibot_redis_seconds", "Time of Redis calls", ["operation"])
+DISCORD_SECONDS = Histogram("wikibot_discord_request_seconds", "Time of Discord REST requests", ["route"])
+SMTP_SECONDS = Histogram("wikibot_smtp_seconds", "Time of sending a feedback email")
+CACHE_REQUESTS = Counter("wikibot_cache_requests_total", "Lookups of in-memory caches", ["cache", "result"])
+COMMAND_SYNCS = Counter("wikibot_command_syncs_total", "Guild /wiki command syncs", ["result"])
+RATE_LIMITS = Counter("wikibot_rate_limits_total", "429 responses from Discord", ["scope"])
+FEEDBACK = Counter("wikibot_feedback_total", "Feedback deliveries", ["result"])
+LOOP_LAG = Gauge("wikibot_event_loop_lag_seconds", "How late the event loop ran a timer")
+GUILDS = Gauge("wikibot_guilds", "Guilds the bot is in")
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def instrumented(handler: str):
+    """Records latency and exceptions of an interaction handler"""
+
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(handler)
+                raise
+            finally:
+                INTERACTION_SECONDS.observe(time.perf_counter() - started, handler)
+
+        return wrapper
+
+    return decorate
+
+
+def instrument_http(http):
+    """Times every request of a discord.py HTTPClient, labelled by the route template"""
+    request = http.request
+
+    @functools.wraps(request)
+    async def timed_request(route, **kwargs):
+        with DISCORD_SECONDS.time(f"{route.method} {route.path}"):
+            return await request(route, **kwargs)
+
+    http.request = timed_request
+
+
+async def monitor_loop_lag(interval: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(max(loop.time() - expected, 0.0))
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def serve(host: str, port: int, lag_interval: float) -> web.AppRunner:
+    """Serves GET /metrics and starts the event loop lag monitor"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    asyncio.get_running_loop().create_task(monitor_loop_lag(lag_interval))
+    logger.info("Serving metrics on %s:%d", host, port)
+    return runner
@@ -0,0 +1,261 @@
+"""
+On-demand sampling profiler for a running bot.
+
+A profile samples the Python stacks of all threads every `interval` seconds from a dedicated thread, so the
+event loop keeps running while it's profiled. Samples are attributed to the innermost frame of a known
+package, which tells time spent in Pony, discord.py, embed building or the bot apart. At the same time
+tracemalloc traces allocations, and the snapshots taken at the start and the end are compared to find what
+grew during the profile.
+
+Every profile writes a summary and the sampled stacks in the collapsed format understood by flamegraph.pl
+and speedscope.
+"""
+import asyncio
+import datetime
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# frames kept per traced allocation
+TRACEMALLOC_FRAMES = 10
+LOOP_THREAD = "event-loop"
+
+# the innermost frame of one of these files means a thread is waiting for work
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+# checked in order, so embed building wins over the rest of discord and bot
+PACKAGES = (
+    (
+        "embeds",
+        (
+            os.path.join("bot", "embed_paginator.py"),
+            os.path.join("bot", "help_pages.py"),
+            os.path.join("discord", "embeds.py"),
+        ),
+    ),
+    ("pony", (os.path.join("pony", ""),)),
+    ("discord_slash", (os.path.join("discord_slash", ""),)),
+    ("discord", (os.path.join("discord", ""),)),
+    ("aiohttp", (os.path.join("aiohttp", ""), os.path.join("yarl", ""), os.path.join("multidict", ""))),
+    ("redis", (os.path.join("redis", ""),)),
+    ("psycopg2", (os.path.join("psycopg2", ""),)),
+    ("asyncio", (os.path.join("asyncio", ""),)),
+    ("bot", (os.path.join("bot", ""),)),
+)
+
+# (file, line where the function starts, function)
+Function = tuple[str, int, str]
+Stack = tuple[Function, ...]
+
+
+class Profile(typing.NamedTuple):
+    started_at: datetime.datetime
+    seconds: float
+    interval: float
+    # samples per (thread name, stack from the outermost frame)
+    stacks: Counter
+    memory: list[tracemalloc.StatisticDiff]
+    traced_peak: int
+
+    def samples(self, thread: str = None) -> int:
+        return sum(n for ((name, _), n) in self.stacks.items() if thread is None or name == thread)
+
+    def busy(self, loop: bool) -> Counter:
+        """Samples of threads doing work by their stack, on the event loop or on any other thread"""
+        return Counter(
+            {key: n for (key, n) in self.stacks.items() if (key[0] == LOOP_THREAD) == loop and not is_idle(key[1])}
+        )
+
+    def by_package(self, loop: bool) -> Counter:
+        packages = Counter()
+        for ((_, stack), n) in self.busy(loop).items():
+            packages[package(stack)] += n
+        return packages
+
+    def by_function(self, loop: bool) -> Counter:
+        """Samples where the function was the innermost frame"""
+        functions = Counter()
+        for ((_, stack), n) in self.busy(loop).items():
+            functions[stack[-1]] += n
+        return functions
+
+    def summary(self, top: int) -> str:
+        loop_samples = self.samples(LOOP_THREAD)
+        loop_busy = sum(self.busy(True).values())
+        lines = [
+            f"Profiled {self.seconds:.0f}s from {self.started_at:%Y-%m-%d %H:%M:%S} UTC, "
+            f"{loop_samples} samples every {self.interval * 1000:.0f}ms",
+            f"Event loop busy: {_share(loop_busy, loop_samples)}",
+        ]
+
+        other_busy = sum(self.busy(False).values())
+        for (title, loop, total) in (("event loop", True, loop_busy), ("other threads", False, other_busy)):
+            if not total:
+                continue
+            lines.append("")
+            lines.append(f"Busy samples on the {title} by package:")
+            for (name, n) in self.by_package(loop).most_common(top):
+                lines.append(f"  {_share(n, total):>6} {name}")
+            lines.append(f"Top functions on the {title}:")
+            for (function, n) in self.by_function(loop).most_common(top):
+                lines.append(f"  {_share(n, total):>6} {format_function(function)}")
+
+        lines.append("")
+        lines.append(f"Memory allocated during the profile and still alive, peak {_format_size(self.traced_peak)}:")
+        for stat in self.memory[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"  {_format_size(stat.size_diff, sign=True):>10} {stat.count_diff:+8d} blocks "
+                f"{_short_path(frame.filename)}:{frame.lineno}"
+            )
+        return "\n".join(lines)
+
+    def collapsed(self) -> str:
+        """Stacks as `thread;outer;...;inner count` lines"""
+        return "\n".join(
+            ";".join([thread] + [format_function(f) for f in stack]) + f" {n}"
+            for ((thread, stack), n) in self.stacks.most_common()
+        )
+
+
+def is_idle(stack: Stack) -> bool:
+    return not stack or stack[-1][0].endswith(IDLE_FILES)
+
+
+def package(stack: Stack) -> str:
+    for (i, (filename, _, _)) in enumerate(reversed(stack)):
+        for (name, paths) in PACKAGES:
+            # every task runs under asyncio, so it only counts when asyncio itself is running
+            if any(path in filename for path in paths) and (name != "asyncio" or i == 0):
+                return name
+    return "other"
+
+
+def format_function(function: Function) -> str:
+    (filename, lineno, name) = function
+    return f"{name} ({_short_path(filename)}:{lineno})"
+
+
+def _short_path(filename: str) -> str:
+    # site-packages/discord/http.py -> discord/http.py
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return filename[len(path) + 1 :]
+    return filename
+
+
+def _share(n: int, total: int) -> str:
+    return f"{n / total * 100:.1f}%" if total else "-"
+
+
+def _format_size(size: int, sign: bool = False) -> str:
+    prefix = ("+" if size >= 0 else "-") if sign else ""
+    size = abs(size)
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{prefix}{size:.0f}{unit}" if unit == "B" else f"{prefix}{size:.1f}{unit}"
+        size /= 1024
+    return f"{prefix}{size:.1f}GiB"
+
+
+def _stack(frame) -> Stack:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class Profiler:
+    """Runs one profile at a time and writes its results to `directory`"""
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.logger = logging.getLogger("wikibot.profiler")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wikibot-profiler")
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float) -> tuple[Profile, list[str]]:
+        """Profiles the process for `seconds`, returns the profile and the files it was written to"""
+        if self._running:
+            raise RuntimeError("A profile is already running")
+
+        self._running = True
+        try:
+            loop = asyncio.get_running_loop()
+            loop_thread = threading.get_ident()
+            self.logger.info("Profiling for %.0f seconds", seconds)
+            profile = await loop.run_in_executor(self._executor, self._run, loop_thread, seconds)
+            files = await loop.run_in_executor(self._executor, self._write, profile)
+        finally:
+            self._running = False
+
+        self.logger.info("Profile written to %s", ", ".join(files))
+        return (profile, files)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _run(self, loop_thread: int, seconds: float) -> Profile:
+        started_at = datetime.datetime.utcnow()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        try:
+            before = tracemalloc.take_snapshot()
+            stacks = self._sample(loop_thread, seconds)
+            after = tracemalloc.take_snapshot()
+            (_, traced_peak) = tracemalloc.get_traced_memory()
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+
+        ignored = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        memory = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+        memory = [stat for stat in memory if stat.size_diff > 0]
+        return Profile(started_at, seconds, self.interval, stacks, memory, traced_peak)
+
+    def _sample(self, loop_thread: int, seconds: float) -> Counter:
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for (thread_id, frame) in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                    names[loop_thread] = LOOP_THREAD
+                stacks[(names.get(thread_id, str(thread_id)), _stack(frame))] += 1
+            # sleeping releases the GIL, so the sampled threads run in between
+            time.sleep(self.interval)
+        return stacks
+
+    def _write(self, profile: Profile) -> list[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        name = os.path.join(self.directory, f"profile-{os.getpid()}-{profile.started_at:%Y%m%d%H%M%S}")
+        files = [name + ".txt", name + ".collapsed"]
+        with open(files[0], "w") as f:
+            f.write(profile.summary(top=50) + "\n")
+        with open(files[1], "w") as f:
+            f.write(profile.collapsed() + "\n")
+        return files
@@ -1,9 +1,13 @@
 import csv
 import datetime
 import functools
+import hashlib
 import io
 import json
 import logging
+import signal
+import tempfile
+import time
 import typing
 from collections import defaultdict
 import asyncio
@@ -14,66 +18,146 @@ import discord.ext.commands
 import discord_slash.error
 from discord.ext import commands
 from discord_slash import SlashCommand, SlashCommandOptionType, SlashContext, cog_ext
+from discord_slash.http import CustomRoute
 from discord_slash.utils import manage_commands
 import discord_slash.model
-from pony.orm import commit, db_session, select
 
-from bot import db
-from bot.analytics import Analytics
+from bot import db, metrics
+from bot.aliases import AliasIndex
+from bot.analytics import ALL_TIME, Analytics
+from bot.cache import TopicRecord, topic_cache
+from bot.command_sync import PRIORITY_EDITED, PRIORITY_JOINED, PRIORITY_STARTUP, CommandRegistrar, SyncScheduler
 from bot.config import config
-from bot.db import Guild, Topic, guild_topics, mark_guild_disabled
+from bot.db import mark_guild_disabled
 from bot.feedback import Feedback
-from bot.util import check_has_permissions, Context, parse_wiki_topic_args
-from bot.embed_paginator import PaginatedEmbed
+from bot.util import check_has_permissions, check_is_owner, Context, owns_guild, parse_wiki_topic_args
+from bot.help_pages import HelpPages, render_help_pages
+from bot.interaction_router import InteractionRouter, WikiInvocation
+from bot.invalidation import TopicInvalidator
+from bot.message_index import RecentMessages
+from bot.profiler import Profiler
+from bot.topic_index import TopicIndex, topic_path
 
 MAX_SUBCOMMANDS_ERROR_CODE = 50035
+MAX_MESSAGE_LENGTH = 2000
+# interaction tokens expire after 15 minutes
+MAX_PROFILE_SECONDS = 300
+MAX_PROFILE_TOP = 25
+
+AUTOCOMPLETE_RESULT = 8
+
+WIKI_MODE_SUBCOMMANDS = "subcommands"
+WIKI_MODE_AUTOCOMPLETE = "autocomplete"
 
 WIKI_COMMAND = config.command_prefix + "wiki"
 WIKI_FEEDBACK_COMMAND = WIKI_COMMAND + "-feedback"
 WIKI_HELP_COMMAND = WIKI_COMMAND + "-help"
+WIKI_SEARCH_COMMAND = WIKI_COMMAND + "-search"
 WIKI_MANAGEMENT_COMMAND = WIKI_COMMAND + "-mgmt"
 
 MANAGE_CHANNELS = discord.Permissions()
 MANAGE_CHANNELS.manage_channels = True
 
+# not listed in the help of guild managers
+OWNER_SUBCOMMANDS = {"profile"}
+
 
 class Slash(commands.Cog):
     def __init__(self, bot: discord.ext.commands.Bot):
         self.bot = bot
         self.slash = bot.slash
 
+        self.aliases = AliasIndex()
+        self.topic_index = TopicIndex()
+        self.help_pages = HelpPages(config.cache.help_guilds)
+        self.recent_messages = RecentMessages(
+            config.cache.recent_channels, config.cache.recent_authors, config.cache.recent_ttl
+        )
+        self.registrar = CommandRegistrar(config.discord_token)
+        self.sync_scheduler = SyncScheduler(self.__sync_wiki_command)
+        self.sync_scheduler.start(self.bot.loop)
+        self.invalidator = TopicInvalidator(owns_guild=lambda guild_id: owns_guild(self.bot, int(guild_id)))
+        self.invalidator.listeners.append(self._reload_topics)
+        self.invalidator.start(self.bot.loop)
         self.bot.loop.create_task(self._setup_wiki_commands())
 
         self.analytics = Analytics()
+        self.analytics.start(self.bot.loop)
         self.logger = logging.getLogger("wikibot.slash")
+        metrics.CACHE_REQUESTS.set_function(self._cache_requests)
         self.feedback = Feedback()
+        self.feedback.start(self.bot.loop)
+
+        self.router = InteractionRouter(self.bot, WIKI_COMMAND, self._invoke_wiki, self._autocomplete)
+        self.router.install()
+
+        self._closed = False
+        self.profiler = Profiler(config.profiling.directory, config.profiling.interval)
+        try:
+            self.bot.loop.add_signal_handler(signal.SIGUSR1, self._profile_on_signal)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # there is no SIGUSR1 on Windows, and signal handlers can only be set from the main thread
+            self.logger.info("Profiling on SIGUSR1 isn't available")
 
     def cog_unload(self):
-        self.feedback.close()
+        self.router.uninstall()
+        if hasattr(signal, "SIGUSR1"):
+            self.bot.loop.remove_signal_handler(signal.SIGUSR1)
+        self.profiler.close()
+        # when the bot shuts down, HelpBotEvents.close already awaited this before the loop stops
+        self.bot.loop.create_task(self.close())
+
+    async def close(self):
+        """Flushes buffered analytics and stops the background workers, safe to call more than once"""
+        if self._closed:
+            return
+        self._closed = True
+
+        closes = [
+            self.analytics.close(),
+            self.feedback.close(),
+            self.sync_scheduler.close(),
+            self.registrar.close(),
+            self.invalidator.close(),
+        ]
+        for result in await asyncio.gather(*closes, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.logger.error("Failed to shut down cleanly: %s", result, exc_info=result)
 
     # Handle wiki topics
-    @commands.Cog.listener()
-    async def on_socket_response(self, msg):
-        if msg["t"] != "INTERACTION_CREATE":
-            return
+    async def _invoke_wiki(self, invocation: WikiInvocation):
+        ctx = Context(SlashContext(self.slash.req, invocation.interaction, self.bot, self.logger))
+
+        self.logger.info("Calling %s/%s for guild %s", invocation.group, invocation.key, ctx.guild.id)
+        try:
+            await self._topic_handler(ctx, invocation.group, invocation.key, invocation.hidden, invocation.reply_to)
+        except Exception as ex:
+            await self.on_slash_command_error(ctx, ex)
 
-        d = msg["d"]
-        if d["data"]["name"] != WIKI_COMMAND:
+    @metrics.instrumented("autocomplete")
+    async def _autocomplete(self, d: dict):
+        guild_id = d.get("guild_id")
+        if guild_id is None:
             return
-        ctx = Context(SlashContext(self.slash.req, d, self.bot, self.logger))
-
-        if "options" in d["data"] and d["data"]["options"]:
-            subgroup = d["data"]["options"][0]
-            wiki_group = subgroup["name"]
-            if "options" in subgroup and subgroup["options"]:
-                subcommand = subgroup["options"][0]
-                wiki_key = subcommand["name"]
-                args = {o["name"]: o["value"] for o in subcommand["options"]} if "options" in subcommand else {}
-                self.logger.info("Calling %s/%s for guild %s", wiki_group, wiki_key, ctx.guild.id)
-                try:
-                    await self._topic_handler(ctx, wiki_group, wiki_key, **args)
-                except Exception as ex:
-                    await self.on_slash_command_error(ctx, ex)
+
+        if guild_id not in self.topic_index:
+            await self._reload_guild_topics(guild_id)
+
+        focused = next((o for o in d["data"].get("options", []) if o.get("focused")), None)
+        choices = self.topic_index.complete(guild_id, str(focused["value"]) if focused else "")
+        try:
+            await self.bot.http.request(
+                CustomRoute(
+                    "POST",
+                    "/interactions/{interaction_id}/{token}/callback",
+                    interaction_id=d["id"],
+                    token=d["token"],
+                ),
+                json={"type": AUTOCOMPLETE_RESULT, "data": {"choices": choices}},
+            )
+        except discord.HTTPException as e:
+            # the user kept typing and Discord already moved on to a newer interaction
+            self.logger.debug("Failed to answer autocomplete for guild %s: %s", guild_id, e)
 
     async def on_slash_command_error(self, ctx: Context, ex: Exception):
         self.logger.error(ex, exc_info=True)
@@ -81,12 +165,42 @@ class Slash(commands.Cog):
             f"Failed to process you command. Please try later or if the issue persist report it via `/{WIKI_COMMAND}-feedback` command"
         )
 
-    async def on_command_error(self, err: commands.CommandError):
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx: commands.Context, err: commands.CommandError):
         if isinstance(err, commands.CommandNotFound):
-            self.logger.warn("Command not found error: %s", err, exc_info=True)
+            # topic aliases aren't commands, they are answered by on_message
+            self.logger.debug("Command not found error: %s", err)
         else:
             self.logger.error("Command error: %s", err, exc_info=True)
 
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild is None:
+            return
+
+        self.recent_messages.add(message)
+        if message.author.bot:
+            return
+
+        prefix = await self.bot.get_prefix(message)
+        for p in [prefix] if isinstance(prefix, str) else prefix:
+            if message.content.startswith(p):
+                break
+        else:
+            return
+
+        alias = message.content[len(p) :].split(maxsplit=1)
+        if not alias or self.bot.get_command(alias[0]) is not None:
+            return
+
+        content = self.aliases.resolve(str(message.guild.id), alias[0])
+        if content is not None:
+            await message.channel.send(content)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.recent_messages.forget(payload.channel_id, payload.message_id)
+
     @commands.command(name=WIKI_COMMAND)
     async def _fallback_wiki_command(self, ctx: commands.Context, *args):
         wiki_group, wiki_key, command_args = parse_wiki_topic_args(args)
@@ -100,33 +214,40 @@ class Slash(commands.Cog):
         my_ctx = Context(ctx)
 
         try:
-            await self._topic_handler(my_ctx, wiki_group, wiki_key, **command_args)
+            await self._topic_handler(
+                my_ctx, wiki_group, wiki_key, command_args.get("hidden", False), command_args.get("reply_to")
+            )
         except Exception as ex:
             await self.on_slash_command_error(my_ctx, ex)
 
-    @db_session
     async def _setup_wiki_commands(self):
-        tasks: list[typing.Coroutine] = []
-        for guild in Guild.select(disabled=False):
-            tasks.append(self.__sync_wiki_command(int(guild.id)))
+        await self.bot.wait_until_ready()
+
+        # sync_all_commands overwrites the commands of dev guilds, so it has to finish before /wiki is registered
         try:
             await self.slash.sync_all_commands()
         except Exception as ex:
             self.logger.warn("Failed to sync slash commands: %s", ex, exc_info=True)
 
-        result = await asyncio.gather(*tasks, return_exceptions=True)
-        for res in result:
-            if isinstance(res, Exception):
-                self.logger.critical("Failed to sync wiki commands: %s", res, exc_info=True)
-
+        for guild_id in await db.run(db.enabled_guild_ids):
+            # other clusters sync guilds of their shards
+            if owns_guild(self.bot, int(guild_id)):
+                self.sync_scheduler.schedule(int(guild_id), PRIORITY_STARTUP)
+        await self.sync_scheduler.join()
         self.logger.info("Syncing done.")
 
-    @db_session
-    async def _topic_handler(self, ctx: Context, group: str, key: str, **args):
-        hidden = args["hidden"] if "hidden" in args else False
-        reply_to = args["reply_to"] if "reply_to" in args else None
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        self.sync_scheduler.schedule(guild.id, PRIORITY_JOINED)
 
-        topic = Topic.select(guild=str(ctx.guild.id), group=group, key=key).first()
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.topic_index.forget_guild(str(guild.id))
+        self.help_pages.invalidate(str(guild.id))
+
+    @metrics.instrumented("topic")
+    async def _topic_handler(self, ctx: Context, group: str, key: str, hidden: bool = False, reply_to=None):
+        topic = await db.fetch_topic(str(ctx.guild.id), group, key)
         if topic is None:
             await ctx.send(content=f"Sorry we don't have anything about {group}/{key}", hidden=hidden)
             return
@@ -134,13 +255,9 @@ class Slash(commands.Cog):
         content = topic.content
 
         if reply_to:
-            reply_id = int(reply_to)
             try:
-                async for msg in ctx.channel.history(limit=10):
-                    if msg.author.id == reply_id and msg.type == discord.MessageType.default:
-                        await msg.reply(content=content)
-                        await ctx.send("Replied!", hidden=True)
-                        break
+                if await self._reply_to_author(ctx, int(reply_to), content):
+                    await ctx.send("Replied!", hidden=True)
             except (
                 discord.Forbidden,
                 discord.HTTPException,
@@ -161,6 +278,24 @@ class Slash(commands.Cog):
             f"{group}/{key}",
         )
 
+    async def _reply_to_author(self, ctx: Context, author_id: int, content: str) -> bool:
+        message_id = self.recent_messages.latest(ctx.channel.id, author_id)
+        self.logger.debug("Recent messages index: %s", self.recent_messages.stats())
+        if message_id is not None:
+            try:
+                await ctx.channel.get_partial_message(message_id).reply(content=content)
+                return True
+            except discord.NotFound:
+                self.recent_messages.forget(ctx.channel.id, message_id)
+
+        # fall back to the channel history for authors who haven't posted since we started
+        async for msg in ctx.channel.history(limit=10):
+            if msg.author.id == author_id and msg.type == discord.MessageType.default:
+                await msg.reply(content=content)
+                return True
+
+        return False
+
     @cog_ext.cog_subcommand(
         base=WIKI_MANAGEMENT_COMMAND,
         name="upsert",
@@ -199,12 +334,16 @@ class Slash(commands.Cog):
             ),
         ],
     )
+    @metrics.instrumented("upsert")
     @check_has_permissions(manage_channels=True)
-    @db_session
     async def _topic_upsert(
         self, ctx: SlashContext, group: str, key: str, description: str, content: str, alias: str = ""
     ):
-        topic, new = db.upsert_topic(str(ctx.guild.id), group, key, description, content, alias)
+        topic, new = await db.run(db.save_topic, str(ctx.guild.id), group, key, description, content, alias)
+        self.aliases.update(topic)
+        self.topic_index.update(topic)
+        self.help_pages.invalidate(topic.guild_id)
+        await self.invalidator.publish(topic.guild_id, topic.group, topic.key)
 
         author_id = ctx.author_id
         self.logger.info(
@@ -217,10 +356,7 @@ class Slash(commands.Cog):
             author_id,
         )
 
-        # TODO: remove this and figure out how to make @db_session work with async
-        commit()
-
-        self.bot.loop.create_task(self.__sync_wiki_command(ctx.guild.id))
+        self._schedule_edited(ctx.guild.id)
 
         action = "added" if new else "modified"
         try:
@@ -261,14 +397,17 @@ class Slash(commands.Cog):
             ),
         ],
     )
+    @metrics.instrumented("delete")
     @check_has_permissions(manage_channels=True)
-    @db_session
     async def _topic_delete(self, ctx: SlashContext, group: str, key: str):
-        topic = Topic.select(
-            lambda t: t.guild.id == str(ctx.guild.id) and t.group == str.lower(group) and t.key == str.lower(key)
-        ).first()
-
-        if topic is None:
+        deleted = await db.run(db.delete_topic, str(ctx.guild.id), group, key)
+        self.aliases.remove(str(ctx.guild.id), str.lower(group), str.lower(key))
+        self.topic_index.remove(str(ctx.guild.id), str.lower(group), str.lower(key))
+        if deleted:
+            self.help_pages.invalidate(str(ctx.guild.id))
+            await self.invalidator.publish(str(ctx.guild.id), str.lower(group), str.lower(key))
+
+        if not deleted:
             await ctx.send(
                 content=f"**{group}/{key}** is not in the database.",
                 hidden=True,
@@ -277,13 +416,10 @@ class Slash(commands.Cog):
 
         author_id = ctx.author_id
         self.logger.info(
-            f"deleting topic: {ctx.guild.id} /{WIKI_COMMAND} {group} {key} by member: {author_id}",
+            f"deleted topic: {ctx.guild.id} /{WIKI_COMMAND} {group} {key} by member: {author_id}",
         )
-        topic.delete()
-        # TODO: remove this and figure out how to make @db_session work with async
-        commit()
 
-        self.bot.loop.create_task(self.__sync_wiki_command(ctx.guild.id))
+        self._schedule_edited(ctx.guild.id)
 
         await ctx.send(content=f"**{group}/{key}** was deleted.", hidden=True)
 
@@ -292,13 +428,28 @@ class Slash(commands.Cog):
         name="analytics",
         description="Get commands usage analytics",
         guild_ids=config.dev_guild_ids,
+        options=[
+            manage_commands.create_option(
+                name="period",
+                description="Count only views within the period",
+                option_type=SlashCommandOptionType.STRING,
+                required=False,
+                choices=[
+                    manage_commands.create_choice(value="24h", name="Last 24 hours"),
+                    manage_commands.create_choice(value="7d", name="Last 7 days"),
+                    manage_commands.create_choice(value="30d", name="Last 30 days"),
+                    manage_commands.create_choice(value=ALL_TIME, name="All time"),
+                ],
+            ),
+        ],
     )
+    @metrics.instrumented("analytics")
     @check_has_permissions(manage_channels=True)
-    @db_session
-    async def _analytics(self, ctx: SlashContext):
-        views = self.analytics.retreive(ctx.guild.id)
+    async def _analytics(self, ctx: SlashContext, period: str = ALL_TIME):
+        views = await self.analytics.retreive(ctx.guild.id, period)
 
-        embed = discord.Embed(title="Wiki Analytics", color=discord.Color.from_rgb(225, 225, 225))
+        title = "Wiki Analytics" if period == ALL_TIME else f"Wiki Analytics for the last {period}"
+        embed = discord.Embed(title=title, color=discord.Color.from_rgb(225, 225, 225))
         embed.set_footer(text=self.bot.user, icon_url=self.bot.user.avatar_url)
         for (command, view_count) in views:
             embed.add_field(name=command, value=str(view_count), inline=False)
@@ -312,6 +463,7 @@ class Slash(commands.Cog):
         description=f"Show help with `/{WIKI_MANAGEMENT_COMMAND} import` commands",
         guild_ids=config.dev_guild_ids,
     )
+    @metrics.instrumented("bulk_help")
     @check_has_permissions(manage_channels=True)
     async def _bulk_help(self, ctx: SlashContext):
         await ctx.send(
@@ -320,7 +472,8 @@ class Slash(commands.Cog):
             + "\nTo import your topics you should create a CSV file and upload it to Discord in the same channel where you are going to use the import command."
             + f"\nThen you have to use the `/{WIKI_COMMAND} bulk import` command to import the topics."
             + "\nWikiBot will search the latest 5 messages in the channel and select the latest your message and try to download your CSV file."
-            + "\nThen it will import all provided topics. Be careful! It will override the description and content of all topics currently created.",
+            + "\nThen it will import all provided topics. Be careful! It will override the description and content of all topics currently created."
+            + "\nSet the `dry_run` option to see which topics would be added or changed without importing anything.",
             hidden=True,
         )
 
@@ -330,10 +483,18 @@ class Slash(commands.Cog):
         name="export",
         description=f"Export all existing topics to CSV file",
         guild_ids=config.dev_guild_ids,
+        options=[
+            manage_commands.create_option(
+                name="compress",
+                description="Compress the CSV file with gzip",
+                option_type=SlashCommandOptionType.BOOLEAN,
+                required=False,
+            ),
+        ],
     )
+    @metrics.instrumented("bulk_export")
     @check_has_permissions(manage_channels=True)
-    @db_session
-    async def _bulk_export(self, ctx: SlashContext):
+    async def _bulk_export(self, ctx: SlashContext, compress: bool = False):
         await ctx.defer()
 
         author_id = ctx.author_id
@@ -342,22 +503,15 @@ class Slash(commands.Cog):
             author_id,
         )
 
-        csvoutput = io.StringIO()
-        csvwriter = csv.writer(csvoutput, quoting=csv.QUOTE_MINIMAL)
-        csvwriter.writerow(["group", "key", "desc", "content", "alias"])
-        count = 0
-
-        for t in guild_topics(str(ctx.guild.id)):
-            csvwriter.writerow([t.group, t.key, t.desc, t.content])
-            count += 1
+        with tempfile.TemporaryFile() as export:
+            count = await db.run(db.export_topics, str(ctx.guild.id), export, compress)
+            export.seek(0)
 
-        await ctx.send(
-            content=f"We successfuly exported **{count}** topcs!",
-            file=discord.File(
-                io.BytesIO(str.encode(csvoutput.getvalue())),
-                filename=f"wiki_topics_{datetime.datetime.utcnow()}.csv",
-            ),
-        )
+            extension = "csv.gz" if compress else "csv"
+            await ctx.send(
+                content=f"We successfuly exported **{count}** topcs!",
+                file=discord.File(export, filename=f"wiki_topics_{datetime.datetime.utcnow()}.{extension}"),
+            )
 
     @cog_ext.cog_subcommand(
         base=WIKI_MANAGEMENT_COMMAND,
@@ -365,10 +519,18 @@ class Slash(commands.Cog):
         name="import",
         description=f"Import topics from CSV file",
         guild_ids=config.dev_guild_ids,
+        options=[
+            manage_commands.create_option(
+                name="dry_run",
+                description="Only show what would change without importing anything",
+                option_type=SlashCommandOptionType.BOOLEAN,
+                required=False,
+            ),
+        ],
     )
+    @metrics.instrumented("bulk_import")
     @check_has_permissions(manage_channels=True)
-    @db_session
-    async def _bulk_import(self, ctx: SlashContext):
+    async def _bulk_import(self, ctx: SlashContext, dry_run: bool = False):
         await ctx.defer()
 
         author_id = ctx.author_id
@@ -410,25 +572,26 @@ class Slash(commands.Cog):
                 hidden=True,
             )
 
-        added = 0
-        updated = 0
-
         csvreader = csv.reader(io.StringIO(csvcontent.read().decode("utf-8")), quoting=csv.QUOTE_MINIMAL)
-        for row in csvreader:
-            topic, new = db.upsert_topic(
-                str(ctx.guild.id), row[0], row[1], row[2], row[3], row[4] if len(row) == 5 else ""
+        diff = await db.run(db.import_topics, str(ctx.guild.id), list(csvreader), dry_run)
+
+        if dry_run:
+            return await ctx.send(
+                content=truncate_lines(f"Dry run: {diff.summary()}.", diff.details(), MAX_MESSAGE_LENGTH),
             )
-            if new:
-                added += 1
-            else:
-                updated += 1
 
-        # TODO: remove this and figure out how to make @db_session work with async
-        commit()
-        self.bot.loop.create_task(self.__sync_wiki_command(ctx.guild.id))
+        for topic in diff.writes:
+            self.aliases.update(topic)
+            self.topic_index.update(topic)
+        if diff.writes:
+            self.help_pages.invalidate(str(ctx.guild.id))
+            await self.invalidator.publish(str(ctx.guild.id))
+
+        if diff.needs_sync:
+            self._schedule_edited(ctx.guild.id)
 
         await ctx.send(
-            content=f"Import was successfuly finished! **{added}** added and **{updated}** updated.",
+            content=f"Import was successfuly finished! {diff.summary()}.",
         )
 
     @cog_ext.cog_slash(
@@ -444,7 +607,7 @@ class Slash(commands.Cog):
         ],
         guild_ids=config.dev_guild_ids,
     )
-    @db_session
+    @metrics.instrumented("feedback")
     async def _feedback(self, ctx: SlashContext, feedback: str):
         self.logger.info(
             f"member: %d:%s gave feedback",
@@ -453,64 +616,86 @@ class Slash(commands.Cog):
         )
 
         try:
-            self.feedback.send_feedback(ctx.author_id, ctx.author.display_name, ctx.guild.id, ctx.guild.name, feedback)
+            await self.feedback.submit(ctx.author_id, ctx.author.display_name, ctx.guild.id, ctx.guild.name, feedback)
         except Exception as e:
-            self.logger.critical("Failed to send feeback: %s", e, exc_info=True)
+            self.logger.critical("Failed to save feeback: %s", e, exc_info=True)
+            await ctx.send("Sorry, we couldn't save your feedback. Please try later.", hidden=True)
+            return
 
         await ctx.send("Thank you for your feedback!", hidden=True)
 
-    @cog_ext.cog_slash(
-        name=WIKI_HELP_COMMAND,
-        description=f"Get help about WikiBot commands",
+    @cog_ext.cog_subcommand(
+        base=WIKI_MANAGEMENT_COMMAND,
+        name="profile",
+        description="Profile where WikiBot spends time and memory",
         guild_ids=config.dev_guild_ids,
+        options=[
+            manage_commands.create_option(
+                name="seconds",
+                description=f"How long to profile, up to {MAX_PROFILE_SECONDS} seconds",
+                option_type=SlashCommandOptionType.INTEGER,
+                required=False,
+            ),
+            manage_commands.create_option(
+                name="top",
+                description=f"Number of functions and allocations to show, up to {MAX_PROFILE_TOP}",
+                option_type=SlashCommandOptionType.INTEGER,
+                required=False,
+            ),
+        ],
     )
-    @db_session
-    async def _help(self, ctx: SlashContext):
-        author = ctx.author
+    @metrics.instrumented("profile")
+    @check_is_owner()
+    async def _profile(self, ctx: SlashContext, seconds: int = 30, top: int = 10):
+        if self.profiler.running:
+            await ctx.send("A profile is already running, try again later.", hidden=True)
+            return
 
-        embed = PaginatedEmbed(title=f"Help for {ctx.guild.name}", color=discord.Color.from_rgb(225, 225, 225))
-        embed.set_footer(text=self.bot.user, icon_url=self.bot.user.avatar_url)
-        embed.add_field(
-            name=":information_source: General",
-            value=f"`/{WIKI_COMMAND} <group> <key>`: Get wiki content of the specified topic"
-            + f"\n`/{WIKI_FEEDBACK_COMMAND}`: {self.slash.commands[WIKI_FEEDBACK_COMMAND].description}"
-            + f"\n`/{WIKI_HELP_COMMAND}`: {self.slash.commands[WIKI_HELP_COMMAND].description}",
-            inline=False,
+        await ctx.defer(hidden=True)
+        self.logger.info("profiling by request of member: %d", ctx.author_id)
+        try:
+            (profile, files) = await self.profiler.profile(min(max(seconds, 1), MAX_PROFILE_SECONDS))
+        except RuntimeError:
+            # another profile started while the interaction was deferred
+            await ctx.send("A profile is already running, try again later.", hidden=True)
+            return
+
+        summary = profile.summary(min(max(top, 1), MAX_PROFILE_TOP))
+        content = truncate_lines(
+            f"Written to {', '.join(files)}\n```", summary.splitlines(), MAX_MESSAGE_LENGTH - len("\n```")
         )
-        if isinstance(author, discord.Member) and author.guild_permissions >= MANAGE_CHANNELS:
-            help = ""
-            for (name, x) in self.slash.subcommands[WIKI_MANAGEMENT_COMMAND].items():
-                if isinstance(x, discord_slash.model.CogSubcommandObject):
-                    help += f"`/{WIKI_MANAGEMENT_COMMAND} {name}`: {x.description}\n"
-                else:
-                    for (subname, x) in self.slash.subcommands[WIKI_MANAGEMENT_COMMAND][name].items():
-                        help += f"`/{WIKI_MANAGEMENT_COMMAND} {name} {subname}`: {x.description}\n"
+        await ctx.send(content=content + "\n```", hidden=True)
 
-            embed.add_field(
-                name=":wrench: Settings",
-                value=help,
-                inline=False,
-            )
+    def _profile_on_signal(self):
+        if self.profiler.running:
+            self.logger.warning("Ignoring SIGUSR1, a profile is already running")
+            return
 
-        embed.add_field(
-            name=f":grey_question: Available /{WIKI_COMMAND} commands",
-            value="\n".join([f"`/{WIKI_COMMAND} {t.group} {t.key}`: {t.desc}" for t in guild_topics(str(ctx.guild.id))])
-            or "No commands available",
-            inline=False,
-        )
+        self.bot.loop.create_task(self._log_profile(config.profiling.signal_seconds))
 
-        for e in embed.pages():
-            await author.send(embed=e)
-        await ctx.send("Check your DMs for help!", hidden=True)
+    async def _log_profile(self, seconds: float):
+        try:
+            (profile, _) = await self.profiler.profile(seconds)
+        except RuntimeError:
+            # the profiler only counts as running once the task of an earlier signal started
+            self.logger.warning("Ignoring SIGUSR1, a profile is already running")
+            return
+        self.logger.info("Profile summary:\n%s", profile.summary(top=MAX_PROFILE_TOP))
 
-    @db_session
-    async def __sync_wiki_command(self, guild_id: int):
-        aliases = []
-        subcommand_options = [
+    @cog_ext.cog_slash(
+        name=WIKI_SEARCH_COMMAND,
+        description=f"Search topics by key, description and content",
+        options=[
             manage_commands.create_option(
-                name="reply_to",
-                description="Reply to the last message of specified user",
-                option_type=SlashCommandOptionType.USER,
+                name="query",
+                description="Words to search for",
+                option_type=SlashCommandOptionType.STRING,
+                required=True,
+            ),
+            manage_commands.create_option(
+                name="page",
+                description="Page of the results",
+                option_type=SlashCommandOptionType.INTEGER,
                 required=False,
             ),
             manage_commands.create_option(
@@ -519,65 +704,149 @@ class Slash(commands.Cog):
                 option_type=SlashCommandOptionType.BOOLEAN,
                 required=False,
             ),
-        ]
-        command = {
-            "cmd_name": WIKI_COMMAND,
-            "description": "Get wiki for your specified topic",
-            "options": [],
-        }
-        groups = defaultdict(list)
-        for topic in guild_topics(str(guild_id)):
-            groups[topic.group].append(
-                {
-                    "name": topic.key,
-                    "description": topic.desc,
-                    "type": SlashCommandOptionType.SUB_COMMAND,
-                    "options": subcommand_options,
-                }
+        ],
+        guild_ids=config.dev_guild_ids,
+    )
+    @metrics.instrumented("search")
+    async def _search(self, ctx: SlashContext, query: str, page: int = 1, hidden: bool = False):
+        page = max(page, 1)
+        started = time.perf_counter()
+        topics, total = await db.run(db.search_topics, str(ctx.guild.id), query, page - 1)
+        self.logger.info(
+            "searched %d topics for guild %s in %.1fms", total, ctx.guild.id, (time.perf_counter() - started) * 1000
+        )
+
+        if not topics:
+            await ctx.send(content=f"Sorry we don't have anything about {query}", hidden=hidden)
+            return
+
+        pages = (total + db.SEARCH_PAGE_SIZE - 1) // db.SEARCH_PAGE_SIZE
+        embed = discord.Embed(title=f"Search results for {query}", color=discord.Color.from_rgb(225, 225, 225))
+        embed.set_footer(text=f"Page {page}/{pages}, {total} topics found")
+        for t in topics:
+            embed.add_field(
+                name=f"/{WIKI_COMMAND} {wiki_usage(t.group, t.key)}", value=t.desc or t.content[:100], inline=False
             )
-            if topic.alias:
-                aliases.append(topic)
-
-        for (group, topics) in groups.items():
-            subgroup = {
-                "name": group,
-                "description": "No Description.",
-                "type": SlashCommandOptionType.SUB_COMMAND_GROUP,
-                "options": topics,
-            }
-            command["options"].append(subgroup)
-
-        cmd_check = self._create_command_check(guild_id)
-        for topic in aliases:
-            cmd = commands.Command(
-                self._create_wiki_bot_command_callback(topic),
-                name=topic.alias,
-                description=topic.desc,
-                help=topic.desc,
-                checks=[cmd_check],
-                cog=self,
+
+        await ctx.send(embed=embed, hidden=hidden)
+
+    @cog_ext.cog_slash(
+        name=WIKI_HELP_COMMAND,
+        description=f"Get help about WikiBot commands",
+        guild_ids=config.dev_guild_ids,
+    )
+    @metrics.instrumented("help")
+    async def _help(self, ctx: SlashContext):
+        author = ctx.author
+        manager = isinstance(author, discord.Member) and author.guild_permissions >= MANAGE_CHANNELS
+
+        pages = self.help_pages.get(str(ctx.guild.id), ctx.guild.name, manager)
+        if pages is None:
+            pages = await self._render_help(ctx.guild, manager)
+        self.logger.debug("Help pages cache: %s", self.help_pages.stats())
+
+        for e in pages:
+            await author.send(embed=e)
+        await ctx.send("Check your DMs for help!", hidden=True)
+
+    async def _render_help(self, guild: discord.Guild, manager: bool) -> list[discord.Embed]:
+        guild_id = str(guild.id)
+        version = self.help_pages.version(guild_id)
+        topics = await db.run(db.guild_topic_records, guild_id)
+
+        sections = [
+            (
+                ":information_source: General",
+                f"`/{WIKI_COMMAND} {wiki_usage()}`: Get wiki content of the specified topic"
+                + f"\n`/{WIKI_FEEDBACK_COMMAND}`: {self.slash.commands[WIKI_FEEDBACK_COMMAND].description}"
+                + f"\n`/{WIKI_HELP_COMMAND}`: {self.slash.commands[WIKI_HELP_COMMAND].description}"
+                + f"\n`/{WIKI_SEARCH_COMMAND} <query>`: {self.slash.commands[WIKI_SEARCH_COMMAND].description}",
             )
-            self.bot.remove_command(topic.alias)
-            self.bot.add_command(cmd)
+        ]
+        if manager:
+            help = ""
+            for (name, x) in self.slash.subcommands[WIKI_MANAGEMENT_COMMAND].items():
+                if name in OWNER_SUBCOMMANDS:
+                    continue
+                if isinstance(x, discord_slash.model.CogSubcommandObject):
+                    help += f"`/{WIKI_MANAGEMENT_COMMAND} {name}`: {x.description}\n"
+                else:
+                    for (subname, x) in self.slash.subcommands[WIKI_MANAGEMENT_COMMAND][name].items():
+                        help += f"`/{WIKI_MANAGEMENT_COMMAND} {name} {subname}`: {x.description}\n"
+            sections.append((":wrench: Settings", help))
+
+        pages = render_help_pages(
+            f"Help for {guild.name}",
+            {"text": self.bot.user, "icon_url": self.bot.user.avatar_url},
+            sections,
+            f":grey_question: Available /{WIKI_COMMAND} commands",
+            (f"`/{WIKI_COMMAND} {wiki_usage(t.group, t.key)}`: {t.desc}" for t in topics),
+        )
+        self.help_pages.put(guild_id, guild.name, manager, pages, version)
+        return pages
+
+    async def __sync_wiki_command(self, guild_id: int):
+        topics = await db.run(db.guild_topic_records, str(guild_id))
+        command = build_wiki_command(topics)
+        self.aliases.replace_guild(str(guild_id), topics)
+        self.topic_index.replace_guild(str(guild_id), topics)
+        self.help_pages.invalidate(str(guild_id))
+
+        fingerprint = command_fingerprint(command)
+        # dev guilds also get commands from sync_all_commands which may overwrite /wiki, so always sync them
+        if guild_id not in (config.dev_guild_ids or []):
+            if fingerprint == await db.run(db.guild_commands_hash, str(guild_id)):
+                self.logger.debug("Commands for guild %s are up to date", guild_id)
+                metrics.COMMAND_SYNCS.inc("unchanged")
+                return
 
         try:
-            await self.slash.req.add_slash_command(guild_id=guild_id, **command)
+            await self.registrar.add_slash_command(self.slash.req.application_id, guild_id, **command)
         except discord.Forbidden as e:
             self.logger.warn("Not syncing commands for guild: %s, Reason: %s", guild_id, e)
-            mark_guild_disabled(str(guild_id))
+            metrics.COMMAND_SYNCS.inc("forbidden")
+            await db.run(mark_guild_disabled, str(guild_id))
+            return
 
-    def _create_wiki_bot_command_callback(self, topic: Topic):
-        async def callback(ctx: commands.Context):
-            if str(ctx.guild.id) == topic.guild.id:
-                await ctx.send(topic.content)
+        await db.run(db.set_guild_commands_hash, str(guild_id), fingerprint)
+        metrics.COMMAND_SYNCS.inc("synced")
 
-        return callback
+    async def _reload_topics(self, guild_id: str, group: typing.Union[str, None], key: typing.Union[str, None]):
+        """Reloads a topic changed by another replica, or all topics of the guild without group and key"""
+        if group is None or key is None:
+            await self._reload_guild_topics(guild_id)
+            return
 
-    def _create_command_check(self, guild_id: int):
-        async def is_for_guild(ctx: commands.Context):
-            return ctx.guild.id == guild_id
+        # the topic cache entry is already evicted, so this reads the committed topic
+        topic = await db.fetch_topic(guild_id, group, key)
+        if topic is None:
+            self.aliases.remove(guild_id, group, key)
+            self.topic_index.remove(guild_id, group, key)
+        else:
+            self.aliases.update(topic)
+            self.topic_index.update(topic)
+        self.help_pages.invalidate(guild_id)
+
+    async def _reload_guild_topics(self, guild_id: str):
+        topics = await db.run(db.guild_topic_records, guild_id)
+        self.aliases.replace_guild(guild_id, topics)
+        self.topic_index.replace_guild(guild_id, topics)
+        self.help_pages.invalidate(guild_id)
+
+    def _cache_requests(self) -> dict[tuple[str, str], int]:
+        return {
+            ("topic", "hit"): topic_cache.hits,
+            ("topic", "miss"): topic_cache.misses,
+            ("recent_messages", "hit"): self.recent_messages.hits,
+            ("recent_messages", "miss"): self.recent_messages.misses,
+            ("help", "hit"): self.help_pages.hits,
+            ("help", "miss"): self.help_pages.misses,
+        }
 
-        return is_for_guild
+    def _schedule_edited(self, guild_id: int):
+        # the autocomplete /wiki command doesn't list topics, so edits never change it
+        if config.wiki_mode != WIKI_MODE_AUTOCOMPLETE:
+            self.sync_scheduler.schedule(guild_id, PRIORITY_EDITED, delay=config.sync.debounce)
 
     def __delete_wiki_command(self, guild_id: int, group: str, key: str):
         command = None
@@ -594,6 +863,104 @@ class Slash(commands.Cog):
                 del self.slash.subcommands[WIKI_COMMAND][group][key]
 
 
+def wiki_usage(group: str = "<group>", key: str = "<key>") -> str:
+    if config.wiki_mode == WIKI_MODE_AUTOCOMPLETE:
+        return f"topic:{topic_path(group, key)}"
+    return f"{group} {key}"
+
+
+def build_wiki_command(topics: typing.Iterable[TopicRecord]) -> dict:
+    """Builds /wiki command payload for add_slash_command. Only group, key and description affect it."""
+    if config.wiki_mode == WIKI_MODE_AUTOCOMPLETE:
+        return build_autocomplete_wiki_command()
+
+    subcommand_options = [
+        manage_commands.create_option(
+            name="reply_to",
+            description="Reply to the last message of specified user",
+            option_type=SlashCommandOptionType.USER,
+            required=False,
+        ),
+        manage_commands.create_option(
+            name="hidden",
+            description="Make the response be visible only by you",
+            option_type=SlashCommandOptionType.BOOLEAN,
+            required=False,
+        ),
+    ]
+    command = {
+        "cmd_name": WIKI_COMMAND,
+        "description": "Get wiki for your specified topic",
+        "options": [],
+    }
+    groups = defaultdict(list)
+    for topic in topics:
+        groups[topic.group].append(
+            {
+                "name": topic.key,
+                "description": topic.desc,
+                "type": SlashCommandOptionType.SUB_COMMAND,
+                "options": subcommand_options,
+            }
+        )
+
+    for (group, subcommands) in groups.items():
+        subgroup = {
+            "name": group,
+            "description": "No Description.",
+            "type": SlashCommandOptionType.SUB_COMMAND_GROUP,
+            "options": subcommands,
+        }
+        command["options"].append(subgroup)
+
+    return command
+
+
+def build_autocomplete_wiki_command() -> dict:
+    """Builds /wiki command with a single autocompleted topic option, which is the same for every guild"""
+    return {
+        "cmd_name": WIKI_COMMAND,
+        "description": "Get wiki for your specified topic",
+        "options": [
+            {
+                "name": "topic",
+                "description": "Topic as group/key, start typing to search",
+                "type": SlashCommandOptionType.STRING,
+                "required": True,
+                "autocomplete": True,
+            },
+            manage_commands.create_option(
+                name="reply_to",
+                description="Reply to the last message of specified user",
+                option_type=SlashCommandOptionType.USER,
+                required=False,
+            ),
+            manage_commands.create_option(
+                name="hidden",
+                description="Make the response be visible only by you",
+                option_type=SlashCommandOptionType.BOOLEAN,
+                required=False,
+            ),
+        ],
+    }
+
+
+def command_fingerprint(command: dict) -> str:
+    return hashlib.sha256(json.dumps(command, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def truncate_lines(header: str, lines: list[str], max_length: int) -> str:
+    """Joins lines under the header, replacing the ones which don't fit with a counter"""
+    content = header
+    for (i, line) in enumerate(lines):
+        more = f"\n...and {len(lines) - i} more"
+        if len(content) + len(line) + 1 + len(more) > max_length:
+            return content + more
+        content += "\n" + line
+
+    return content
+
+
 def parse_command_args(args: list[str]) -> dict[str, object]:
     ret = {}
     for arg in args:
@@ -0,0 +1,116 @@
+import bisect
+import typing
+
+from bot.cache import TopicRecord
+
+# Discord limits for autocomplete responses
+MAX_CHOICES = 25
+MAX_CHOICE_LENGTH = 100
+
+
+def topic_path(group: str, key: str) -> str:
+    return f"{group}/{key}"
+
+
+class GuildTopics:
+    """Sorted `group/key` paths of one guild, plus `key` alone so topics can be found without their group"""
+
+    __slots__ = ("paths", "keys", "descriptions")
+
+    def __init__(self):
+        self.paths: list[str] = []
+        self.keys: list[tuple[str, str]] = []
+        self.descriptions: dict[str, str] = {}
+
+    def add(self, group: str, key: str, desc: str):
+        path = topic_path(group, key)
+        if path not in self.descriptions:
+            bisect.insort(self.paths, path)
+            bisect.insort(self.keys, (key, path))
+        self.descriptions[path] = desc or ""
+
+    @classmethod
+    def build(cls, topics: typing.Iterable[TopicRecord]) -> "GuildTopics":
+        guild = cls()
+        for topic in topics:
+            guild.descriptions[topic_path(topic.group, topic.key)] = topic.desc or ""
+        guild.paths = sorted(guild.descriptions)
+        guild.keys = sorted((path.split("/", 1)[1], path) for path in guild.paths)
+        return guild
+
+    def remove(self, group: str, key: str):
+        path = topic_path(group, key)
+        if self.descriptions.pop(path, None) is None:
+            return
+
+        del self.paths[bisect.bisect_left(self.paths, path)]
+        del self.keys[bisect.bisect_left(self.keys, (key, path))]
+
+    def complete(self, prefix: str, limit: int) -> list[str]:
+        found = []
+        i = bisect.bisect_left(self.paths, prefix)
+        while i < len(self.paths) and len(found) < limit and self.paths[i].startswith(prefix):
+            found.append(self.paths[i])
+            i += 1
+
+        if len(found) < limit and "/" not in prefix:
+            seen = set(found)
+            i = bisect.bisect_left(self.keys, (prefix,))
+            while i < len(self.keys) and len(found) < limit and self.keys[i][0].startswith(prefix):
+                if self.keys[i][1] not in seen:
+                    found.append(self.keys[i][1])
+                i += 1
+
+        return found
+
+    def __len__(self):
+        return len(self.paths)
+
+
+class TopicIndex:
+    """
+    Per-guild prefix index of topics answering /wiki autocomplete interactions from memory.
+    Lookups are a binary search, so they stay well inside Discord's 3 second window for any guild size.
+    """
+
+    def __init__(self):
+        self._guilds: dict[str, GuildTopics] = {}
+
+    def __contains__(self, guild_id: str) -> bool:
+        return guild_id in self._guilds
+
+    def update(self, topic: TopicRecord):
+        # guilds which aren't loaded yet get all their topics from replace_guild on first use
+        guild = self._guilds.get(topic.guild_id)
+        if guild is not None:
+            guild.add(topic.group, topic.key, topic.desc)
+
+    def remove(self, guild_id: str, group: str, key: str):
+        guild = self._guilds.get(guild_id)
+        if guild is not None:
+            guild.remove(group, key)
+
+    def replace_guild(self, guild_id: str, topics: typing.Iterable[TopicRecord]):
+        self._guilds[guild_id] = GuildTopics.build(topics)
+
+    def forget_guild(self, guild_id: str):
+        self._guilds.pop(guild_id, None)
+
+    def complete(self, guild_id: str, prefix: str, limit: int = MAX_CHOICES) -> list[dict]:
+        """Returns autocomplete choices for topics whose `group/key` or `key` starts with the prefix"""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+
+        choices = []
+        for path in guild.complete(prefix.strip().lower(), limit):
+            desc = guild.descriptions[path]
+            name = f"{path}: {desc}" if desc else path
+            if len(name) > MAX_CHOICE_LENGTH:
+                name = name[: MAX_CHOICE_LENGTH - 1] + "…"
+            choices.append({"name": name, "value": path})
+
+        return choices
+
+    def __len__(self):
+        return sum(len(g) for g in self._guilds.values())
@@ -31,6 +31,23 @@ def check_has_permissions(**kwargs):
     return decorate
 
 
+def check_is_owner():
+    """Allows the command only to the owner of the bot application, or its team members"""
+
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(self, ctx: SlashContext, *args, **kwargs):
+            if await self.bot.is_owner(discord.Object(id=ctx.author_id)):
+                return await func(self, ctx, *args, **kwargs)
+
+            self.logger.info("Denied owner command to member: %d", ctx.author_id)
+            return await ctx.send(content="Only the owner of WikiBot can use this command!", hidden=True)
+
+        return wrapper
+
+    return decorate
+
+
 class Context:
     def __init__(self, context: typing.Union[commands.Context, SlashContext]):
         self.context = context
@@ -58,3 +75,16 @@ def parse_wiki_topic_args(args):
         return args[0], args[1], []
 
     return args[0], args[1], args[2:]
+
+
+def guild_shard_id(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+
+def owns_guild(bot: commands.Bot, guild_id: int) -> bool:
+    """Whether the guild belongs to one of the shards run by this process"""
+    shard_ids = getattr(bot, "shard_ids", None)
+    if not bot.shard_count or shard_ids is None:
+        return True
+
+    return guild_shard_id(guild_id, bot.shard_count) in shard_ids
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import pytest
+
+# bot.db binds when it's imported, without a Postgres tests use a scratch SQLite file
+if not os.getenv("POSTGRES_HOST"):
+    os.environ.setdefault("WIKIBOT_DB_SQLITE", os.path.join(tempfile.mkdtemp(prefix="wikibot-test-"), "wikibot.sqlite"))
+
+
+@pytest.fixture(scope="session")
+def db():
+    from bot import db
+    from bot.config import config
+
+    if config.db.sqlite:
+        # migrations are Postgres only
+        db.db.generate_mapping(create_tables=True)
+    else:
+        db.setup()
+    return db
+
+
+@pytest.fixture
+def postgres(db):
+    from bot.config import config
+
+    if config.db.sqlite:
+        # some tests touch every guild, so point POSTGRES_* at a scratch database
+        pytest.skip("needs the Postgres configured by POSTGRES_* variables")
+    return db
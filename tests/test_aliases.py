@@ -0,0 +1,51 @@
+from bot.aliases import AliasIndex
+from bot.cache import TopicRecord
+
+
+def topic(guild_id: str, key: str, alias: str, content: str = None) -> TopicRecord:
+    return TopicRecord(guild_id, "group", key, "desc", content or f"content of {key}", alias)
+
+
+def test_aliases_are_per_guild():
+    index = AliasIndex()
+    index.update(topic("1", "a", "faq"))
+    index.update(topic("2", "b", "faq"))
+
+    assert index.resolve("1", "faq") == "content of a"
+    assert index.resolve("2", "faq") == "content of b"
+    assert index.resolve("3", "faq") is None
+
+
+def test_shared_alias_survives_removing_one_topic():
+    index = AliasIndex()
+    index.update(topic("1", "a", "faq"))
+    index.update(topic("1", "b", "faq"))
+    assert index.resolve("1", "faq") == "content of b"
+
+    index.remove("1", "group", "b")
+    assert index.resolve("1", "faq") == "content of a"
+
+    index.remove("1", "group", "a")
+    assert index.resolve("1", "faq") is None
+    assert len(index) == 0
+
+
+def test_changing_alias_of_one_topic_keeps_the_other():
+    index = AliasIndex()
+    index.update(topic("1", "a", "faq"))
+    index.update(topic("1", "b", "faq"))
+    index.update(topic("1", "b", "rules"))
+
+    assert index.resolve("1", "faq") == "content of a"
+    assert index.resolve("1", "rules") == "content of b"
+
+
+def test_replace_guild():
+    index = AliasIndex()
+    index.update(topic("1", "a", "faq"))
+    index.update(topic("2", "a", "faq"))
+    index.replace_guild("1", [topic("1", "c", "new")])
+
+    assert index.resolve("1", "faq") is None
+    assert index.resolve("1", "new") == "content of c"
+    assert index.resolve("2", "faq") == "content of a"
@@ -0,0 +1,120 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from bot import analytics as analytics_module
+from bot.analytics import DAY, HOUR, Analytics
+
+GUILD_ID = "1"
+# noon of some day, so the 24h window reaches into the previous day
+NOW = 19700 * DAY + 12 * HOUR
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock(NOW)
+    monkeypatch.setattr(analytics_module.time, "time", clock.time)
+    return clock
+
+
+def run(test):
+    """Runs the test coroutine with an Analytics on an empty fake Redis"""
+
+    async def main():
+        client = fakeredis.aioredis.FakeRedis()
+        analytics = Analytics(client)
+        try:
+            return await test(analytics, client)
+        finally:
+            await analytics.close()
+
+    return asyncio.run(main())
+
+
+def test_flush_writes_lifetime_hourly_and_daily_buckets(clock):
+    async def test(analytics: Analytics, client):
+        for _ in range(3):
+            analytics.view(GUILD_ID, "python/lists")
+        analytics.view(GUILD_ID, "python/dicts")
+        await analytics.flush()
+
+        hour = NOW // HOUR
+        day = NOW // DAY
+        assert await client.zscore("view_1:all", "python/lists") == 3
+        assert await client.zscore(f"view_1:h:{hour}", "python/lists") == 3
+        assert await client.zscore(f"view_1:d:{day}", "python/dicts") == 1
+        assert 0 < await client.ttl(f"view_1:h:{hour}") <= analytics_module.HOURLY_TTL
+        assert analytics_module.HOURLY_TTL < await client.ttl(f"view_1:d:{day}") <= analytics_module.DAILY_TTL
+        assert await client.ttl("view_1:all") == -1
+
+        # nothing is written twice
+        await analytics.flush()
+        assert await client.zscore("view_1:all", "python/lists") == 3
+
+    run(test)
+
+
+def test_retreive_windows(clock):
+    async def test(analytics: Analytics, client):
+        views = {"now": 0, "yesterday": 30 * HOUR, "last-week": 5 * DAY, "last-month": 20 * DAY, "ancient": 40 * DAY}
+        for (count, (topic, age)) in enumerate(views.items(), start=1):
+            clock.now = NOW - age
+            for _ in range(count):
+                analytics.view(GUILD_ID, topic)
+        clock.now = NOW
+        await analytics.flush()
+
+        assert await analytics.retreive(GUILD_ID, "24h") == [("now", 1)]
+        assert await analytics.retreive(GUILD_ID, "7d") == [("last-week", 3), ("yesterday", 2), ("now", 1)]
+        assert await analytics.retreive(GUILD_ID, "30d") == [
+            ("last-month", 4),
+            ("last-week", 3),
+            ("yesterday", 2),
+            ("now", 1),
+        ]
+        assert await analytics.retreive(GUILD_ID) == [
+            ("ancient", 5),
+            ("last-month", 4),
+            ("last-week", 3),
+            ("yesterday", 2),
+            ("now", 1),
+        ]
+        assert await analytics.retreive(GUILD_ID, "30d", top=2) == [("last-month", 4), ("last-week", 3)]
+        # the union is a short lived scratch key
+        assert 0 < await client.ttl("view_1:w:30d") <= analytics_module.WINDOW_TTL
+
+    run(test)
+
+
+def test_retreive_flushes_buffered_views(clock):
+    async def test(analytics: Analytics, client):
+        analytics.view(GUILD_ID, "python/lists")
+        assert await analytics.retreive(GUILD_ID, "24h") == [("python/lists", 1)]
+
+    run(test)
+
+
+def test_legacy_hash_is_migrated_once(clock):
+    async def test(analytics: Analytics, client):
+        await client.hset("view_1", mapping={"python/lists": 5, "python/dicts": 2})
+        analytics.view(GUILD_ID, "python/lists")
+
+        assert await analytics.retreive(GUILD_ID) == [("python/lists", 6), ("python/dicts", 2)]
+        assert not await client.exists("view_1", "view_1:legacy")
+
+        # another replica finds nothing left to migrate
+        other = Analytics(client)
+        assert await other.retreive(GUILD_ID) == [("python/lists", 6), ("python/dicts", 2)]
+        # migrated views only count towards the lifetime totals
+        assert await analytics.retreive(GUILD_ID, "24h") == [("python/lists", 1)]
+
+    run(test)
@@ -0,0 +1,47 @@
+from bot.cache import MISSING, TopicCache, TopicRecord
+
+
+def record(content: str) -> TopicRecord:
+    return TopicRecord("1", "group", "key", "desc", content, "")
+
+
+def test_put_and_get():
+    cache = TopicCache(1024 * 1024)
+    cache.put("1", "group", "key", record("content"))
+    cache.put("1", "group", "other", None)
+
+    assert cache.get("1", "group", "key").content == "content"
+    assert cache.get("1", "group", "other") is MISSING
+    assert cache.get("1", "group", "unknown") is None
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = TopicCache(1024 * 1024)
+    version = cache.version("1")
+    # a save commits and invalidates while the old record is being read
+    cache.invalidate("1", "group", "key")
+    cache.put("1", "group", "key", record("stale"), version)
+
+    assert cache.get("1", "group", "key") is None
+
+
+def test_put_after_guild_invalidation_or_clear_is_dropped():
+    cache = TopicCache(1024 * 1024)
+    version = cache.version("1")
+    cache.invalidate_guild("1")
+    cache.put("1", "group", "key", record("stale"), version)
+    assert cache.get("1", "group", "key") is None
+
+    version = cache.version("1")
+    cache.clear()
+    cache.put("1", "group", "key", record("stale"), version)
+    assert cache.get("1", "group", "key") is None
+
+
+def test_other_guilds_are_not_affected():
+    cache = TopicCache(1024 * 1024)
+    version = cache.version("1")
+    cache.invalidate("2", "group", "key")
+    cache.put("1", "group", "key", record("fresh"), version)
+
+    assert cache.get("1", "group", "key").content == "fresh"
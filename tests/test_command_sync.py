@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import time
+
+import aiohttp
+import discord
+import pytest
+from aiohttp import web
+
+from bot import command_sync
+from bot.command_sync import CommandRegistrar
+
+PATH = "/applications/1/guilds/2/commands"
+
+
+class StubDiscord:
+    """Answers requests with scripted (status, headers, body) responses and records when they arrived"""
+
+    def __init__(self, responses: list):
+        self.responses = list(responses)
+        self.requests: list[float] = []
+        self.authorization = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(time.monotonic())
+        self.authorization = request.headers.get("Authorization")
+        response = self.responses.pop(0) if self.responses else (200, {}, {"id": "3"})
+        if response == "disconnect":
+            # drop the connection without answering
+            request.transport.close()
+            return web.Response()
+        (status, headers, body) = response
+        return web.json_response(body, status=status, headers=headers)
+
+
+@contextlib.asynccontextmanager
+async def serve(stub: StubDiscord, max_retries: int = 3):
+    app = web.Application()
+    app.router.add_route("*", "/{path:.*}", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    registrar = CommandRegistrar("token", f"http://127.0.0.1:{port}", max_retries=max_retries, global_rate=1000)
+    try:
+        yield registrar
+    finally:
+        await registrar.close()
+        await runner.cleanup()
+
+
+def request(stub: StubDiscord) -> tuple[CommandRegistrar, dict]:
+    async def run():
+        async with serve(stub) as registrar:
+            return (registrar, await registrar.request("POST", PATH, {"name": "wiki"}, 2))
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(command_sync, "backoff", lambda attempt: 0.01)
+
+
+def test_success():
+    stub = StubDiscord([(200, {}, {"id": "3"})])
+    (_, data) = request(stub)
+    assert data == {"id": "3"}
+    assert stub.authorization == "Bot token"
+
+
+def test_waits_for_the_bucket_to_reset():
+    headers = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.3", "X-RateLimit-Bucket": "abc"}
+    stub = StubDiscord([(200, headers, {}), (200, {}, {})])
+
+    async def twice():
+        async with serve(stub, max_retries=0) as registrar:
+            await registrar.request("POST", PATH, {}, 2)
+            await registrar.request("POST", PATH, {}, 2)
+        return registrar
+
+    registrar = asyncio.run(twice())
+    assert stub.requests[1] - stub.requests[0] >= 0.25
+    assert registrar.rate_limited == 0
+
+
+def test_retries_after_a_route_rate_limit():
+    stub = StubDiscord([(429, {}, {"retry_after": 0.2, "global": False}), (200, {}, {"id": "3"})])
+    (registrar, data) = request(stub)
+    assert data == {"id": "3"}
+    assert registrar.rate_limited == 1
+    assert stub.requests[1] - stub.requests[0] >= 0.15
+
+
+def test_retries_after_a_global_rate_limit():
+    stub = StubDiscord([(429, {"X-RateLimit-Global": "true"}, {"retry_after": 0.2}), (200, {}, {"id": "3"})])
+    (registrar, data) = request(stub)
+    assert data == {"id": "3"}
+    assert registrar.rate_limited == 1
+    assert stub.requests[1] - stub.requests[0] >= 0.15
+    # the global bucket blocks every route, not only this one
+    assert registrar.global_bucket._blocked_until > 0
+
+
+def test_retries_server_errors_and_dropped_connections():
+    stub = StubDiscord([(502, {}, {}), "disconnect", (200, {}, {"id": "3"})])
+    (_, data) = request(stub)
+    assert data == {"id": "3"}
+    assert len(stub.requests) == 3
+
+
+@pytest.mark.parametrize(("status", "error"), [(403, discord.Forbidden), (404, discord.NotFound)])
+def test_maps_client_errors_without_retrying(status, error):
+    stub = StubDiscord([(status, {}, {"message": "no", "code": 0})])
+    with pytest.raises(error):
+        request(stub)
+    assert len(stub.requests) == 1
+
+
+def test_gives_up_after_max_retries():
+    stub = StubDiscord([(500, {}, {})] * 4)
+    with pytest.raises(discord.HTTPException, match="Gave up on POST"):
+        request(stub)
+    assert len(stub.requests) == 4
+
+
+def test_raises_the_connection_error_when_nothing_answered():
+    stub = StubDiscord(["disconnect"] * 4)
+    with pytest.raises(aiohttp.ClientError):
+        request(stub)
+    assert len(stub.requests) == 4
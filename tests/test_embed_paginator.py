@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from bot.embed_paginator import (
+    MAX_EMBED_LENGTH,
+    MAX_FIELD_NAME,
+    MAX_FIELD_VALUE,
+    MAX_FIELDS,
+    PaginatedEmbed,
+    pack_fields,
+)
+
+TRIALS = 300
+
+
+def check_limits(pages: list, reserved: int = 0):
+    assert pages
+    for fields in pages:
+        assert len(fields) <= MAX_FIELDS
+        assert reserved + sum(len(name) + len(value) for (name, value, _) in fields) <= MAX_EMBED_LENGTH
+        for (name, value, _) in fields:
+            assert 0 < len(name) <= MAX_FIELD_NAME and name.strip()
+            assert 0 < len(value) <= MAX_FIELD_VALUE and value.strip()
+
+
+def random_line(rnd: random.Random) -> str:
+    kind = rnd.random()
+    if kind < 0.15:
+        return ""
+    if kind < 0.2:
+        return " " * rnd.randint(1, 5)
+    if kind < 0.3:
+        # longer than a field value, up to several fields
+        return "".join(rnd.choice("abc ") for _ in range(rnd.randint(MAX_FIELD_VALUE, 3 * MAX_FIELD_VALUE)))
+    return "x" * rnd.randint(1, 200)
+
+
+def random_name(rnd: random.Random) -> str:
+    kind = rnd.random()
+    if kind < 0.1:
+        return ""
+    if kind < 0.2:
+        return "n" * rnd.randint(MAX_FIELD_NAME, 2 * MAX_FIELD_NAME)
+    return f"name{rnd.randint(0, 3)}"
+
+
+@pytest.mark.parametrize("seed", range(TRIALS))
+def test_pack_fields_respects_discord_limits(seed):
+    rnd = random.Random(seed)
+    items = [(random_name(rnd), random_line(rnd), rnd.random() < 0.3) for _ in range(rnd.randint(0, 120))]
+    reserved = rnd.choice([0, 100, 1000])
+
+    pages = pack_fields(items, reserved)
+
+    check_limits(pages, reserved)
+    # nothing but whitespace is lost, and the order is kept
+    text = "".join(line for (_, line, _) in items if line.strip())
+    packed = "".join(value.replace("\n", "") for fields in pages for (_, value, _) in fields)
+    assert packed.replace(" ", "") == text.replace(" ", "")
+
+
+def test_empty_values_and_names():
+    pages = pack_fields([("empty", "", False), ("blank", "   ", False), ("", "value", False)])
+
+    assert pages == [[("\u200b", "value", False)]]
+    assert pack_fields([]) == [[]]
+
+
+def test_line_longer_than_a_field_is_split():
+    pages = pack_fields([("name", "x" * (MAX_FIELD_VALUE * 2 + 1), False)])
+
+    check_limits(pages)
+    assert [len(value) for (_, value, _) in pages[0]] == [MAX_FIELD_VALUE, MAX_FIELD_VALUE, 1]
+
+
+def test_long_name_is_truncated():
+    pages = pack_fields([("n" * 1000, "value", False)])
+
+    assert pages[0][0][0] == "n" * MAX_FIELD_NAME
+
+
+def test_exactly_max_fields_fit_one_page():
+    items = [(f"name{i}", "value", False) for i in range(MAX_FIELDS)]
+    assert len(pack_fields(items)) == 1
+    assert [len(p) for p in pack_fields(items + [("last", "value", False)])] == [MAX_FIELDS, 1]
+
+
+def test_exactly_max_length_fits_one_page():
+    # 6 fields of a 4 character name and 996 characters fill 6000 exactly
+    items = [(f"nam{i}", "x" * 996, False) for i in range(6)]
+    assert len(pack_fields(items)) == 1
+
+    items[-1] = ("nam5", "x" * 997, False)
+    assert len(pack_fields(items)) == 2
+
+
+def test_paginated_embed_pages_fit_discord_limits():
+    rnd = random.Random(0)
+    embed = PaginatedEmbed(title="Help")
+    embed.set_footer(text="WikiBot")
+    embed.add_field(name="Topics", value="\n".join(random_line(rnd) for _ in range(500)), inline=False)
+
+    pages = embed.pages()
+    assert len(pages) > 1
+    for page in pages:
+        assert len(page) <= MAX_EMBED_LENGTH
+        assert len(page.fields) <= MAX_FIELDS
+        assert all(f.value.strip() and len(f.value) <= MAX_FIELD_VALUE for f in page.fields)
@@ -0,0 +1,88 @@
+import tempfile
+import tracemalloc
+
+from pony.orm import db_session, delete
+
+from bot.cache import TopicRecord
+
+GUILD_ID = "test-export"
+CONTENT = "x" * 400
+# generous for CSV and gzip buffers, a materialized export of 20000 topics needs over 10 MiB
+MAX_PEAK_BYTES = 1024 * 1024
+
+
+class LazyCursor:
+    """A server-side cursor stand-in which creates rows only while they are iterated"""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.itersize = None
+
+    def execute(self, query, params):
+        pass
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield (f"group{i % 20}", f"key{i}", f"Topic {i}", CONTENT, "")
+
+    def close(self):
+        pass
+
+
+class LazyConnection:
+    def __init__(self, count: int):
+        self.count = count
+
+    def cursor(self, name: str = None):
+        return LazyCursor(self.count)
+
+
+def export_peak(db, compress: bool) -> tuple[int, int]:
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        try:
+            count = db.export_topics(GUILD_ID, out, compress)
+            (_, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return (count, peak)
+
+
+def test_export_memory_doesnt_grow_with_topics(db, monkeypatch):
+    peaks = {}
+    for count in (1000, 20000):
+        monkeypatch.setattr(db.db, "get_connection", lambda: LazyConnection(count))
+        for compress in (False, True):
+            (exported, peak) = export_peak(db, compress)
+            assert exported == count
+            assert peak < MAX_PEAK_BYTES
+            peaks[(count, compress)] = peak
+
+    for compress in (False, True):
+        # 20 times the topics may only cost constant buffers, not memory per topic
+        assert peaks[(20000, compress)] < peaks[(1000, compress)] + 256 * 1024
+
+
+def test_postgres_export_memory_is_bounded(postgres):
+    with db_session:
+        postgres.upsert_guild(GUILD_ID, "Export test")
+
+    try:
+        for count in (1000, 20000):
+            with db_session:
+                delete(t for t in postgres.Topic if t.guild.id == GUILD_ID)
+                postgres.bulk_upsert_topics(
+                    [
+                        TopicRecord(GUILD_ID, f"group{i % 20}", f"key{i}", f"Topic {i}", CONTENT, "")
+                        for i in range(count)
+                    ]
+                )
+            for compress in (False, True):
+                with db_session:
+                    (exported, peak) = export_peak(postgres, compress)
+                assert exported == count
+                assert peak < MAX_PEAK_BYTES
+    finally:
+        with db_session:
+            delete(t for t in postgres.Topic if t.guild.id == GUILD_ID)
+            delete(g for g in postgres.Guild if g.id == GUILD_ID)
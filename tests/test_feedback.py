@@ -0,0 +1,185 @@
+import asyncio
+import smtplib
+from email import message_from_string
+
+import pytest
+from pony.orm import db_session, delete
+
+from bot import feedback as feedback_module
+from bot.config import config
+from bot.feedback import Feedback
+
+GUILD_ID = "test-feedback"
+
+
+class StubServer:
+    """Stands in for an SMTP server, `drop_after` messages per connection and `fail` sends are refused"""
+
+    def __init__(self, drop_after: int = 0, fail: int = 0):
+        self.drop_after = drop_after
+        self.fail = fail
+        self.connections = 0
+        self.messages: list = []
+
+    def connect(self, host: str, port: int, timeout: float) -> "StubSMTP":
+        self.connections += 1
+        return StubSMTP(self)
+
+
+class StubSMTP:
+    def __init__(self, server: StubServer):
+        self.server = server
+        self.sent = 0
+        self.connected = True
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user: str, password: str):
+        pass
+
+    def sendmail(self, from_addr: str, to_addrs: str, msg: str):
+        if not self.connected or (self.server.drop_after and self.sent >= self.server.drop_after):
+            # like a server closing an idle connection
+            self.connected = False
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if self.server.fail:
+            self.server.fail -= 1
+            raise smtplib.SMTPDataError(554, b"Rejected")
+        self.sent += 1
+        self.server.messages.append(message_from_string(msg))
+
+    def quit(self):
+        if not self.connected:
+            raise smtplib.SMTPServerDisconnected("please run connect() first")
+
+    def close(self):
+        self.connected = False
+
+
+@pytest.fixture
+def smtp(monkeypatch, db):
+    monkeypatch.setattr(
+        feedback_module,
+        "config",
+        config._replace(
+            smtp=config.smtp._replace(
+                host="localhost", email="to@example.com", from_email="from@example.com", starttls=False, password=None
+            )
+        ),
+    )
+    with db_session:
+        db.upsert_guild(GUILD_ID, "Feedback guild")
+    yield monkeypatch
+    with db_session:
+        delete(f for f in db.Feedback if f.guild.id == GUILD_ID)
+
+
+def serve(monkeypatch, server: StubServer, **smtp_config):
+    monkeypatch.setattr(smtplib, "SMTP", server.connect)
+    monkeypatch.setattr(
+        feedback_module,
+        "config",
+        feedback_module.config._replace(smtp=feedback_module.config.smtp._replace(**smtp_config)),
+    )
+    return Feedback()
+
+
+def add(db, count: int) -> list[int]:
+    with db_session:
+        return [db.add_feedback("1", "Member", GUILD_ID, "Feedback guild", f"feedback {i}") for i in range(count)]
+
+
+def statuses(db, ids: list[int]) -> list[tuple[str, int]]:
+    with db_session:
+        return [(db.Feedback[i].status, db.Feedback[i].attempts) for i in ids]
+
+
+def deliver(worker: Feedback) -> int:
+    return worker._executor.submit(worker._deliver_pending).result()
+
+
+def test_delivers_over_one_connection(smtp, db):
+    server = StubServer()
+    worker = serve(smtp, server)
+    ids = add(db, 2)
+
+    assert deliver(worker) == 1
+    assert deliver(worker) == 1
+    assert deliver(worker) == 0
+
+    assert server.connections == 1
+    assert [m["Subject"] for m in server.messages] == ["WikiBot: Feedback from Member from Feedback guild"] * 2
+    assert "feedback 1" in server.messages[1].get_payload()[0].get_payload()
+    assert statuses(db, ids) == [(db.FEEDBACK_SENT, 0)] * 2
+    assert worker.sent == 2
+
+
+def test_reconnects_after_the_server_drops_the_connection(smtp, db):
+    server = StubServer(drop_after=1)
+    worker = serve(smtp, server)
+    ids = add(db, 3)
+
+    assert [deliver(worker) for _ in range(3)] == [1, 1, 1]
+    assert server.connections == 3
+    assert len(server.messages) == 3
+    assert statuses(db, ids) == [(db.FEEDBACK_SENT, 0)] * 3
+
+
+def test_gives_up_after_max_attempts(smtp, db):
+    server = StubServer(fail=10)
+    worker = serve(smtp, server, max_attempts=3)
+    ids = add(db, 1)
+
+    for attempt in range(1, 4):
+        with pytest.raises(smtplib.SMTPDataError):
+            deliver(worker)
+        assert statuses(db, ids) == [(db.FEEDBACK_PENDING if attempt < 3 else db.FEEDBACK_FAILED, attempt)]
+
+    # failed feedback isn't retried
+    assert deliver(worker) == 0
+    assert worker.failed == 1
+    assert not server.messages
+
+
+def test_sends_digests(smtp, db):
+    server = StubServer()
+    worker = serve(smtp, server, digest_size=3)
+    ids = add(db, 5)
+
+    assert [deliver(worker) for _ in range(3)] == [3, 2, 0]
+    assert [m["Subject"] for m in server.messages] == ["WikiBot: 3 feedbacks", "WikiBot: 2 feedbacks"]
+    assert statuses(db, ids) == [(db.FEEDBACK_SENT, 0)] * 5
+
+
+def test_worker_retries_with_backoff(smtp, db):
+    server = StubServer(fail=2)
+    worker = serve(smtp, server, interval=60)
+    delays = []
+
+    def backoff(attempt: int) -> float:
+        delays.append(attempt)
+        return 0.01
+
+    smtp.setattr(feedback_module, "backoff", backoff)
+
+    async def run():
+        worker.start(asyncio.get_running_loop())
+        try:
+            feedback_id = await worker.submit(1, "Member", GUILD_ID, "Feedback guild", "feedback")
+            for _ in range(200):
+                if worker.sent:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await worker.close()
+        return feedback_id
+
+    feedback_id = asyncio.run(run())
+    # submitting wakes the worker, it doesn't wait for the 60s poll
+    assert worker.sent == 1
+    assert delays == [1, 2]
+    assert statuses(db, [feedback_id]) == [(db.FEEDBACK_SENT, 2)]
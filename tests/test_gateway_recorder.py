@@ -0,0 +1,136 @@
+import json
+
+from bot.gateway_recorder import Sanitizer
+
+SECRETS = [
+    "secret-token",
+    "Alice Smith",
+    "alice#1234",
+    "alice-nick",
+    "avatarhash",
+    "my email is alice@example.com",
+    "please help me with my password",
+    "private content of a topic",
+    "search words",
+    "Playing something personal",
+    "desktop",
+    "chosen value",
+    "111111111111111111",
+]
+USER_ID = "111111111111111111"
+
+
+def user() -> dict:
+    return {"id": USER_ID, "username": "Alice Smith", "discriminator": "alice#1234", "avatar": "avatarhash"}
+
+
+def member() -> dict:
+    return {"user": user(), "nick": "alice-nick", "avatar": "avatarhash", "roles": []}
+
+
+def interaction(name: str, options: list, interaction_type: int = 2) -> dict:
+    return {
+        "id": "900",
+        "type": interaction_type,
+        "token": "secret-token",
+        "guild_id": "1",
+        "channel_id": "2",
+        "member": member(),
+        "data": {"id": "3", "name": name, "options": options, "resolved": {"users": {USER_ID: user()}}},
+    }
+
+
+EVENTS = [
+    (
+        "MESSAGE_CREATE",
+        {
+            "id": "10",
+            "channel_id": "2",
+            "guild_id": "1",
+            "author": user(),
+            "member": member(),
+            "content": "please help me with my password",
+            "embeds": [{"title": "private content of a topic"}],
+            "mentions": [user()],
+            "referenced_message": {"content": "my email is alice@example.com"},
+        },
+    ),
+    ("INTERACTION_CREATE", interaction("wiki-feedback", [{"name": "feedback", "type": 3, "value": SECRETS[5]}])),
+    (
+        "INTERACTION_CREATE",
+        interaction(
+            "wiki-mgmt",
+            [
+                {
+                    "name": "upsert",
+                    "type": 1,
+                    "options": [
+                        {"name": "group", "type": 3, "value": "group"},
+                        {"name": "content", "type": 3, "value": "private content of a topic"},
+                    ],
+                }
+            ],
+        ),
+    ),
+    ("INTERACTION_CREATE", interaction("wiki-search", [{"name": "query", "type": 3, "value": "search words"}])),
+    (
+        "INTERACTION_CREATE",
+        {
+            **interaction("other", []),
+            "message": {"id": "11", "content": "my email is alice@example.com", "author": user()},
+            "data": {"custom_id": "menu", "values": ["chosen value"]},
+        },
+    ),
+    ("GUILD_MEMBER_UPDATE", {"guild_id": "1", "user": user(), "nick": "alice-nick", "avatar": "avatarhash"}),
+    (
+        "PRESENCE_UPDATE",
+        {
+            "guild_id": "1",
+            "user": {"id": USER_ID},
+            "status": "online",
+            "activities": [{"name": "Playing something personal"}],
+            "client_status": {"desktop": "online"},
+        },
+    ),
+    ("TYPING_START", {"channel_id": "2", "guild_id": "1", "user_id": USER_ID, "member": member()}),
+]
+
+
+def test_no_personal_strings_are_recorded():
+    sanitizer = Sanitizer(["$"], "wiki")
+    recorded = json.dumps([sanitizer.event(event, d) for (event, d) in EVENTS])
+
+    for secret in SECRETS:
+        assert secret not in recorded
+
+
+def test_lengths_and_ids_are_kept():
+    sanitizer = Sanitizer(["$"], "wiki")
+    (_, d) = EVENTS[1]
+    option = sanitizer.event("INTERACTION_CREATE", d)["data"]["options"][0]
+    assert option["value"] == "x" * len(SECRETS[5])
+
+    message = sanitizer.event(*EVENTS[0])
+    assert message["id"] == "10" and message["channel_id"] == "2"
+    assert message["author"]["id"] == sanitizer.user_id(USER_ID) != USER_ID
+
+
+def test_wiki_topics_are_kept_for_replay():
+    sanitizer = Sanitizer(["$"], "wiki")
+    options = [{"name": "hidden", "type": 5, "value": True}, {"name": "topic", "type": 3, "value": "python/lists"}]
+    d = sanitizer.event("INTERACTION_CREATE", interaction("wiki", options))
+    assert d["data"]["options"][1]["value"] == "python/lists"
+
+    options = [{"name": "topic", "type": 3, "value": "pyth", "focused": True}]
+    d = sanitizer.event("INTERACTION_CREATE", interaction("wiki", options, interaction_type=4))
+    assert d["data"]["options"][0]["value"] == "pyth"
+
+    # other commands don't get that exception
+    d = sanitizer.event("INTERACTION_CREATE", interaction("other", [{"name": "topic", "type": 3, "value": "secret"}]))
+    assert d["data"]["options"][0]["value"] == "xxxxxx"
+
+
+def test_prefixed_commands_keep_their_first_word():
+    sanitizer = Sanitizer(["$"], "wiki")
+    assert sanitizer.content("$faq some private words") == "$faq " + "x" * len("some private words")
+    assert sanitizer.content("hello") == "xxxxx"
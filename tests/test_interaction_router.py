@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from bot.interaction_router import InteractionRouter, parse_wiki_interaction
+
+
+def interaction(options: list, interaction_type: int = 2) -> dict:
+    return {"id": "1", "type": interaction_type, "token": "token", "data": {"name": "wiki", "options": options}}
+
+
+def test_subcommand_mode():
+    options = [
+        {
+            "name": "python",
+            "type": 2,
+            "options": [{"name": "lists", "type": 1, "options": [{"name": "hidden", "type": 5, "value": True}]}],
+        }
+    ]
+    invocation = parse_wiki_interaction(interaction(options))
+    assert (invocation.group, invocation.key, invocation.hidden, invocation.reply_to) == ("python", "lists", True, None)
+
+
+def test_autocomplete_mode_options_in_any_order():
+    options = [
+        {"name": "hidden", "type": 5, "value": True},
+        {"name": "reply_to", "type": 6, "value": "42"},
+        {"name": "topic", "type": 3, "value": "python/lists"},
+    ]
+    invocation = parse_wiki_interaction(interaction(options))
+    assert (invocation.group, invocation.key, invocation.hidden, invocation.reply_to) == ("python", "lists", True, "42")
+
+
+def test_autocomplete_mode_without_topic():
+    assert parse_wiki_interaction(interaction([{"name": "hidden", "type": 5, "value": True}])) is None
+    assert parse_wiki_interaction(interaction([])) is None
+
+
+def test_string_option_without_value():
+    invocation = parse_wiki_interaction(interaction([{"name": "topic", "type": 3}]))
+    assert (invocation.group, invocation.key) == ("", "")
+
+
+class Bot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.dispatched = []
+
+    def dispatch(self, event, *args):
+        self.dispatched.append(event)
+
+
+def test_malformed_payloads_are_logged_and_still_dispatched(caplog):
+    loop = asyncio.new_event_loop()
+    try:
+        bot = Bot(loop)
+        router = InteractionRouter(bot, "wiki", None, None)
+        router.install()
+        with caplog.at_level(logging.ERROR, "wikibot.router"):
+            bot.dispatch("socket_response", {"t": "INTERACTION_CREATE", "d": {"data": {"name": "wiki"}}})
+        assert bot.dispatched == ["socket_response"]
+        assert "Failed to route gateway event" in caplog.text
+    finally:
+        loop.close()
+
+
+def test_handler_exceptions_are_logged(caplog):
+    async def fail(invocation):
+        raise RuntimeError("handler failed")
+
+    async def run():
+        router = InteractionRouter(Bot(asyncio.get_running_loop()), "wiki", fail, None)
+        task = router.route(
+            {"t": "INTERACTION_CREATE", "d": interaction([{"name": "topic", "type": 3, "value": "a/b"}])}
+        )
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return router
+
+    with caplog.at_level(logging.ERROR, "wikibot.router"):
+        router = asyncio.run(run())
+    assert not router._tasks
+    assert "handler failed" in caplog.text
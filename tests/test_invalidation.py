@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import fakeredis.aioredis
+
+from bot.cache import TopicRecord, topic_cache
+from bot.invalidation import TopicInvalidator
+
+GUILD_ID = "test-invalidation"
+
+
+def message(guild_id: str, group, key, version: int, origin: str = "other") -> bytes:
+    return json.dumps([origin, guild_id, group, key, version]).encode()
+
+
+def handle(*messages: bytes) -> tuple[TopicInvalidator, list]:
+    calls = []
+
+    async def listener(guild_id, group, key):
+        calls.append((guild_id, group, key))
+
+    async def run():
+        invalidator = TopicInvalidator(fakeredis.aioredis.FakeRedis())
+        invalidator.listeners.append(listener)
+        for data in messages:
+            await invalidator._handle(data)
+        await invalidator.close()
+        return invalidator
+
+    return (asyncio.run(run()), calls)
+
+
+def cache(group: str, key: str):
+    topic_cache.put(GUILD_ID, group, key, TopicRecord(GUILD_ID, group, key, "desc", "content", ""))
+
+
+def test_topic_invalidation_only_reloads_the_topic():
+    cache("python", "lists")
+    cache("python", "dicts")
+    (invalidator, calls) = handle(message(GUILD_ID, "python", "lists", 1), message(GUILD_ID, "python", "dicts", 2))
+
+    assert calls == [(GUILD_ID, "python", "lists"), (GUILD_ID, "python", "dicts")]
+    assert topic_cache.get(GUILD_ID, "python", "lists") is None
+    assert invalidator.reloads == 0
+
+
+def test_guild_invalidation_reloads_the_guild():
+    cache("python", "lists")
+    (_, calls) = handle(message(GUILD_ID, None, None, 1))
+
+    assert calls == [(GUILD_ID, None, None)]
+    assert topic_cache.get(GUILD_ID, "python", "lists") is None
+
+
+def test_version_gap_reloads_the_guild():
+    cache("python", "dicts")
+    (invalidator, calls) = handle(message(GUILD_ID, "python", "lists", 1), message(GUILD_ID, "python", "sets", 3))
+
+    assert calls == [(GUILD_ID, "python", "lists"), (GUILD_ID, None, None)]
+    assert topic_cache.get(GUILD_ID, "python", "dicts") is None
+    assert invalidator.reloads == 1
+
+
+def test_own_changes_are_ignored():
+    async def run():
+        invalidator = TopicInvalidator(fakeredis.aioredis.FakeRedis())
+        calls = []
+
+        async def listener(*args):
+            calls.append(args)
+
+        invalidator.listeners.append(listener)
+        await invalidator._handle(message(GUILD_ID, "python", "lists", 1, origin=invalidator.origin))
+        await invalidator.close()
+        return calls
+
+    assert asyncio.run(run()) == []
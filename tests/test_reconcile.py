@@ -0,0 +1,34 @@
+from pony.orm import db_session, delete
+
+PREFIX = "test-reconcile-"
+
+
+def test_unavailable_guilds_dont_abort_reconcile(postgres):
+    db = postgres
+    with db_session:
+        db.upsert_guild(PREFIX + "stored", "Stored name")
+        db.upsert_guild(PREFIX + "left", "Left guild")
+
+    try:
+        # discord.py lists unavailable guilds with name None
+        guilds = [(PREFIX + "stored", None), (PREFIX + "unavailable", None), (PREFIX + "available", "Available")]
+        with db_session:
+            (changed, disabled) = db.reconcile_guilds(guilds)
+
+        assert changed == 2
+        assert disabled >= 1
+        with db_session:
+            assert db.Guild[PREFIX + "stored"].name == "Stored name"
+            assert db.Guild[PREFIX + "unavailable"].name == ""
+            assert db.Guild[PREFIX + "available"].name == "Available"
+            assert db.Guild[PREFIX + "left"].disabled
+
+        # once available, the guild gets its name
+        with db_session:
+            db.reconcile_guilds([(PREFIX + "stored", None), (PREFIX + "unavailable", "Back")])
+        with db_session:
+            assert db.Guild[PREFIX + "stored"].name == "Stored name"
+            assert db.Guild[PREFIX + "unavailable"].name == "Back"
+    finally:
+        with db_session:
+            delete(g for g in db.Guild if g.id.startswith(PREFIX))
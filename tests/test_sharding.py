@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from pony.orm import db_session, delete
+
+from bot.cluster import cluster_shards
+from bot.util import guild_shard_id, owns_guild
+
+SHARD_COUNT = 4
+# snowflakes from January 2015, before Discord launched, so they never collide with real guilds
+BASE = 10**9
+
+
+def guild_id(shard: int, n: int = 0) -> int:
+    return ((BASE + n * SHARD_COUNT + shard) << 22) | 12345
+
+
+def test_guild_shard_id():
+    assert guild_shard_id(guild_id(3), 1) == 0
+    for shard in range(SHARD_COUNT):
+        assert guild_shard_id(guild_id(shard, 7), SHARD_COUNT) == shard
+
+
+def test_owns_guild_only_for_own_shards():
+    bot = SimpleNamespace(shard_count=SHARD_COUNT, shard_ids=cluster_shards(1, 2, SHARD_COUNT))
+    assert bot.shard_ids == [1, 3]
+    assert [owns_guild(bot, guild_id(shard)) for shard in range(SHARD_COUNT)] == [False, True, False, True]
+
+
+def test_clusters_own_every_guild_exactly_once():
+    bots = [SimpleNamespace(shard_count=SHARD_COUNT, shard_ids=cluster_shards(i, 3, SHARD_COUNT)) for i in range(3)]
+    for n in range(50):
+        assert sum(owns_guild(bot, guild_id(n % SHARD_COUNT, n)) for bot in bots) == 1
+
+
+def test_unsharded_bot_owns_every_guild():
+    assert owns_guild(SimpleNamespace(shard_count=None, shard_ids=None), guild_id(3))
+    # an AutoShardedBot running all shards
+    assert owns_guild(SimpleNamespace(shard_count=SHARD_COUNT, shard_ids=None), guild_id(3))
+
+
+def test_reconcile_only_disables_guilds_of_own_shards(postgres):
+    db = postgres
+    ids = {shard: [str(guild_id(shard, n)) for n in range(2)] for shard in range(SHARD_COUNT)}
+    all_ids = [i for shard_ids in ids.values() for i in shard_ids]
+    with db_session:
+        for i in all_ids:
+            db.upsert_guild(i, f"Guild {i}")
+
+    try:
+        # the cluster of shards 1 and 3 only sees the first guild of shard 1
+        with db_session:
+            (_, disabled) = db.reconcile_guilds([(ids[1][0], "Guild")], SHARD_COUNT, [1, 3])
+
+        # other guilds of shards 1 and 3 in the scratch database are disabled as well
+        assert disabled >= 3
+        with db_session:
+            states = {i: db.Guild[i].disabled for i in all_ids}
+        assert [i for i in all_ids if states[i]] == [ids[1][1], *ids[3]]
+    finally:
+        with db_session:
+            delete(g for g in db.Guild if g.id in all_ids)
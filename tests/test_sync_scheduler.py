@@ -0,0 +1,125 @@
+import asyncio
+
+from bot.command_sync import DEBOUNCE_MAX_FACTOR, PRIORITY_EDITED, PRIORITY_JOINED, PRIORITY_STARTUP, SyncScheduler
+
+DELAY = 0.05
+
+
+class FakeSync:
+    """Records synced guilds, syncs of guilds in `blocked` wait until they are released"""
+
+    def __init__(self):
+        self.synced: list[int] = []
+        self.times: list[float] = []
+        self.blocked: dict[int, asyncio.Event] = {}
+        self.started: dict[int, asyncio.Event] = {}
+
+    async def __call__(self, guild_id: int):
+        self.synced.append(guild_id)
+        self.times.append(asyncio.get_running_loop().time())
+        self.started.setdefault(guild_id, asyncio.Event()).set()
+        if guild_id in self.blocked:
+            await self.blocked[guild_id].wait()
+
+    def block(self, guild_id: int):
+        self.blocked[guild_id] = asyncio.Event()
+
+    def release(self, guild_id: int):
+        self.blocked.pop(guild_id).set()
+
+    async def wait_started(self, guild_id: int):
+        await self.started.setdefault(guild_id, asyncio.Event()).wait()
+
+
+def run(test, workers: int = 2):
+    async def main():
+        sync = FakeSync()
+        scheduler = SyncScheduler(sync, workers)
+        scheduler.start(asyncio.get_running_loop())
+        try:
+            await test(scheduler, sync)
+        finally:
+            await scheduler.close()
+        return sync
+
+    return asyncio.run(main())
+
+
+def test_burst_of_edits_syncs_once():
+    async def test(scheduler: SyncScheduler, sync: FakeSync):
+        for _ in range(10):
+            scheduler.schedule(1, PRIORITY_EDITED, DELAY / 10)
+            await asyncio.sleep(DELAY / 100)
+        await asyncio.sleep(DELAY)
+        await scheduler.join()
+
+    assert run(test).synced == [1]
+
+
+def test_debounce_is_capped():
+    async def test(scheduler: SyncScheduler, sync: FakeSync):
+        started = asyncio.get_running_loop().time()
+        # edits keep coming for longer than the cap
+        while asyncio.get_running_loop().time() - started < DELAY * DEBOUNCE_MAX_FACTOR * 2:
+            scheduler.schedule(1, PRIORITY_EDITED, DELAY)
+            await asyncio.sleep(DELAY / 5)
+        assert sync.synced
+        assert sync.times[0] - started <= DELAY * (DEBOUNCE_MAX_FACTOR + 1)
+
+    run(test)
+
+
+def test_schedule_during_sync_runs_one_trailing_sync():
+    async def test(scheduler: SyncScheduler, sync: FakeSync):
+        sync.block(1)
+        scheduler.schedule(1)
+        await sync.wait_started(1)
+
+        # edits while the sync is running
+        for _ in range(3):
+            scheduler.schedule(1)
+        await asyncio.sleep(DELAY)
+        assert sync.synced == [1]
+
+        sync.release(1)
+        await scheduler.join()
+
+    assert run(test).synced == [1, 1]
+
+
+def test_higher_priority_reschedule_wins():
+    async def test(scheduler: SyncScheduler, sync: FakeSync):
+        # keep the only worker busy while the queue fills up
+        sync.block(1)
+        scheduler.schedule(1)
+        await sync.wait_started(1)
+
+        scheduler.schedule(2, PRIORITY_STARTUP)
+        scheduler.schedule(3, PRIORITY_STARTUP)
+        scheduler.schedule(4, PRIORITY_EDITED)
+        scheduler.schedule(3, PRIORITY_JOINED)
+        # a lower priority doesn't demote a queued guild
+        scheduler.schedule(4, PRIORITY_STARTUP)
+
+        sync.release(1)
+        await scheduler.join()
+
+    # the stale startup entry of guild 3 is skipped
+    assert run(test, workers=1).synced == [1, 3, 4, 2]
+
+
+def test_debounced_priority_is_kept():
+    async def test(scheduler: SyncScheduler, sync: FakeSync):
+        sync.block(1)
+        scheduler.schedule(1)
+        await sync.wait_started(1)
+
+        scheduler.schedule(2, PRIORITY_STARTUP)
+        scheduler.schedule(3, PRIORITY_JOINED, DELAY)
+        scheduler.schedule(3, PRIORITY_STARTUP, DELAY)
+        await asyncio.sleep(DELAY * 2)
+
+        sync.release(1)
+        await scheduler.join()
+
+    assert run(test, workers=1).synced == [1, 3, 2]
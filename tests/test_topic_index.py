@@ -0,0 +1,40 @@
+from bot.cache import TopicRecord
+from bot.topic_index import TopicIndex
+
+
+def topic(guild_id: str, group: str, key: str) -> TopicRecord:
+    return TopicRecord(guild_id, group, key, f"About {key}", "content", "")
+
+
+def values(choices: list[dict]) -> list[str]:
+    return [c["value"] for c in choices]
+
+
+def test_complete_by_path_and_key():
+    index = TopicIndex()
+    index.replace_guild("1", [topic("1", "python", "lists"), topic("1", "python", "dicts"), topic("1", "go", "maps")])
+
+    assert values(index.complete("1", "python/")) == ["python/dicts", "python/lists"]
+    assert values(index.complete("1", "ma")) == ["go/maps"]
+    assert index.complete("2", "") == []
+
+
+def test_update_of_unloaded_guild_leaves_it_to_be_loaded():
+    index = TopicIndex()
+    index.update(topic("1", "python", "lists"))
+
+    # otherwise autocomplete would never load the guild's other topics
+    assert "1" not in index
+
+    index.replace_guild("1", [topic("1", "python", "lists"), topic("1", "python", "dicts")])
+    index.update(topic("1", "go", "maps"))
+    assert values(index.complete("1", "")) == ["go/maps", "python/dicts", "python/lists"]
+
+
+def test_remove():
+    index = TopicIndex()
+    index.replace_guild("1", [topic("1", "python", "lists"), topic("1", "python", "dicts")])
+    index.remove("1", "python", "lists")
+    index.remove("2", "python", "lists")
+
+    assert values(index.complete("1", "python")) == ["python/dicts"]